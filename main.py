@@ -4,12 +4,24 @@
 # Questo file è il punto di ingresso del sistema esperto.
 # Viene importato il modulo del sistema esperto e vengono
 # configurati gli avvisi e il logging per le librerie utilizzate.
+#
+# Con l'opzione --profile-startup non avvia il sistema ma riporta il
+# tempo di importazione di ciascun modulo, all'avvio e sui percorsi
+# che caricano le librerie più pesanti.
+#
+# Con --profile-rules, al termine della sessione viene stampato il
+# profilo delle regole eseguite (tempi di calcolo e di attesa); con
+# --trace-rules FILE ogni regola eseguita viene aggiunta al file JSONL.
 # ===================================================================
 
 # -------------------------------------------------------------------
 # Import
 # -------------------------------------------------------------------
+import argparse
 import logging
+import os
+import subprocess
+import sys
 
 # -------------------------------------------------------------------
 # Configurazione dei warning e del logging
@@ -20,18 +32,82 @@ logging.getLogger("pgmpy").setLevel(logging.ERROR)
 logging.getLogger('experta').setLevel(logging.WARNING)
 
 # -------------------------------------------------------------------
-# Importa il modulo del sistema esperto
+# Fasi misurate da --profile-startup: moduli importati all'avvio e,
+# in seguito, da ciascun percorso (solo i moduli non ancora caricati)
+# -------------------------------------------------------------------
+FASI_AVVIO = [
+    ("avvio", ["src.SistemaEsperto.sistemaEsperto"]),
+    ("allerta meteo (reti compilate)", ["src.ReteBayesiana.posteriori"]),
+    ("raccomandazione (ontologia)", ["src.Ontologia.indiceOntologia", "owlready2"]),
+    ("ricerca online", ["requests", "geopy.geocoders"]),
+    ("rete appresa dal dataset", ["src.ReteBayesiana.retiBayesiane"]),
+]
+
+# -------------------------------------------------------------------
+# Funzione per misurare i tempi di importazione dei moduli.
+# Esegue un nuovo interprete con "-X importtime" e restituisce, per
+# ogni fase, la lista (modulo, tempo proprio ms, tempo cumulativo ms,
+# livello di annidamento).
+# -------------------------------------------------------------------
+def misura_importazioni(fasi=FASI_AVVIO):
+    codice = "import sys\n"
+    for nome, moduli in fasi:
+        codice += "sys.stderr.write('@@fase %s\\n')\n" % nome
+        codice += "".join("import %s\n" % modulo for modulo in moduli)
+    processo = subprocess.run([sys.executable, "-X", "importtime", "-c", codice],
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True)
+    risultati = {}
+    fase = None
+    for riga in processo.stderr.splitlines():
+        if riga.startswith("@@fase "):
+            fase = riga[len("@@fase "):]
+            risultati[fase] = []
+        elif riga.startswith("import time:") and fase is not None and "|" in riga:
+            proprio, cumulativo, modulo = riga[len("import time:"):].split("|")
+            if not proprio.strip().isdigit():
+                continue        # Riga di intestazione
+            livello = (len(modulo) - len(modulo.lstrip())) // 2
+            risultati[fase].append((modulo.strip(), int(proprio) / 1000, int(cumulativo) / 1000, livello))
+    if processo.returncode != 0:
+        print(processo.stderr.strip().splitlines()[-1])
+    return risultati
+
+# -------------------------------------------------------------------
+# Funzione per stampare il profilo di avvio (--profile-startup).
 # -------------------------------------------------------------------
-from src.SistemaEsperto import sistemaEsperto
+def profila_avvio(moduli_mostrati=10):
+    risultati = misura_importazioni()
+    print("====================== PROFILO DI AVVIO ============================")
+    for fase, moduli in risultati.items():
+        # Il totale della fase è la somma dei moduli importati al primo livello
+        totale = sum(cumulativo for _, _, cumulativo, livello in moduli if livello == 0)
+        print(f"\n{fase}: {totale:.1f} ms ({len(moduli)} moduli)")
+        for modulo, proprio, cumulativo, _ in sorted(moduli, key=lambda m: -m[2])[:moduli_mostrati]:
+            print(f"  {cumulativo:9.1f} ms  {proprio:8.1f} ms  {modulo}")
+    print("\n(colonne: tempo cumulativo, tempo proprio, modulo)")
+    print("====================================================================")
 
 # -------------------------------------------------------------------
 # Funzione per avviare il sistema esperto.
 # -------------------------------------------------------------------
-def avvia_sistema():
-    sistemaEsperto.avvia_sistema_esperto()
+def avvia_sistema(profilo_regole=False, traccia_regole=None):
+    from src.SistemaEsperto import sistemaEsperto
+    sistemaEsperto.avvia_sistema_esperto(profilo_regole, traccia_regole)
 
 # -------------------------------------------------------------------
 # Punto di ingresso dell'applicazione.
 # -------------------------------------------------------------------
 if __name__ == '__main__':
-    avvia_sistema()
+    parser = argparse.ArgumentParser(description="Sistema esperto per la raccomandazione delle attività")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="riporta i tempi di importazione dei moduli senza avviare il sistema")
+    parser.add_argument("--profile-rules", action="store_true",
+                        help="stampa al termine il profilo delle regole eseguite")
+    parser.add_argument("--trace-rules", metavar="FILE",
+                        help="aggiunge al file JSONL una riga per ogni regola eseguita")
+    argomenti = parser.parse_args()
+    if argomenti.profile_startup:
+        profila_avvio()
+    else:
+        avvia_sistema(argomenti.profile_rules, argomenti.trace_rules)
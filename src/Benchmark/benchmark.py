@@ -0,0 +1,302 @@
+# ==============================================================================
+# benchmark.py
+#
+# Questo modulo misura i tempi dei percorsi più usati del sistema:
+#
+# - genera_cpd_consiglio (generazione del CPD di "Consiglio", comune ai due rami);
+# - costruzione delle reti bayesiane;
+# - inferenza + ottieni_risultato_query per tutte le 125 combinazioni di evidenze;
+# - impara_dataset sui due CSV (con e senza la cache delle reti apprese), su
+#   reti già costruite;
+# - caricamento dell'ontologia (snapshot SQLite e analisi del file OWL);
+# - ricerca della raccomandazione di stampa_risultato, fallback compresi;
+# - griglie del rischio delle reti (con il ricalcolo dei parametri appresi);
+# - interrogazioni della rete unificata con evidenze parziali (albero di giunzione).
+#
+# Per ogni caso riporta media, p50 e p99 dei tempi (ms) e il picco di memoria
+# allocata (misurato con tracemalloc in un passaggio separato, per non alterare
+# i tempi). I risultati sono scritti in JSON, con le versioni di Python e delle
+# librerie, e possono essere confrontati con un file di riferimento salvato in
+# precedenza. Le risorse (dataset, ontologia, reti) sono preparate solo per i
+# casi selezionati con --filtro.
+#
+# Uso:
+#   python -m src.Benchmark.benchmark --output risultati.json
+#   python -m src.Benchmark.benchmark --confronta riferimento.json --soglia 10
+# ==============================================================================
+
+import argparse
+import contextlib
+import functools
+import gc
+import io
+import itertools
+import json
+import logging
+import platform
+import sys
+import time
+import tracemalloc
+from importlib import metadata
+
+# ==============================================================================
+# Funzione: percentile()
+# Percentile (0-100) di una lista ordinata, con interpolazione lineare.
+# ==============================================================================
+def percentile(valori_ordinati, p):
+    if len(valori_ordinati) == 1:
+        return valori_ordinati[0]
+    posizione = (len(valori_ordinati) - 1) * p / 100
+    inferiore = int(posizione)
+    superiore = min(inferiore + 1, len(valori_ordinati) - 1)
+    return valori_ordinati[inferiore] + (valori_ordinati[superiore] - valori_ordinati[inferiore]) * (posizione - inferiore)
+
+# ==============================================================================
+# Funzione: misura()
+# Esegue la funzione "ripetizioni" volte (dopo "riscaldamento" esecuzioni non
+# misurate) e restituisce le statistiche dei tempi e il picco di memoria.
+# ==============================================================================
+def misura(funzione, ripetizioni, riscaldamento=1):
+    for _ in range(riscaldamento):
+        funzione()
+    tempi = []
+    gc.collect()
+    for _ in range(ripetizioni):
+        inizio = time.perf_counter()
+        funzione()
+        tempi.append((time.perf_counter() - inizio) * 1000)
+    tempi.sort()
+
+    # Passaggio separato per la memoria: tracemalloc rallenta le allocazioni
+    gc.collect()
+    tracemalloc.start()
+    funzione()
+    _, picco = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "ripetizioni": ripetizioni,
+        "media_ms": sum(tempi) / len(tempi),
+        "p50_ms": percentile(tempi, 50),
+        "p99_ms": percentile(tempi, 99),
+        "min_ms": tempi[0],
+        "picco_memoria_kb": picco / 1024,
+    }
+
+# ==============================================================================
+# Funzione: casi_benchmark()
+# Restituisce la lista dei casi (nome, prepara, ripetizioni): "prepara" carica
+# le risorse del caso (condivise tra i casi che le usano) e restituisce la
+# funzione da misurare, così che vengano preparati solo i casi eseguiti.
+# "scala" moltiplica il numero di ripetizioni.
+# ==============================================================================
+def casi_benchmark(scala=1.0):
+    from src.ClassiSupporto import calcoloConsiglio
+    from src.Ontologia import indiceOntologia
+
+    def ripetizioni(n):
+        return max(3, int(n * scala))
+
+    @functools.lru_cache(maxsize=None)
+    def classe_rete(ramo):
+        from src.ReteBayesiana import retiBayesiane
+        return getattr(retiBayesiane, calcoloConsiglio.CLASSI_RETI[ramo])
+
+    @functools.lru_cache(maxsize=None)
+    def dataset(ramo):
+        import pandas
+        return pandas.read_csv(calcoloConsiglio.PERCORSI_DATASET[ramo])
+
+    def prepara_genera_cpd():
+        from src.ReteBayesiana import retiBayesiane
+        return retiBayesiane.genera_cpd_consiglio
+
+    casi = [("genera_cpd_consiglio", prepara_genera_cpd, ripetizioni(200))]
+    for ramo in ["freddo", "caldo"]:
+        def prepara_costruzione(ramo=ramo):
+            return classe_rete(ramo)
+
+        def prepara_inferenze(ramo=ramo):
+            from src.ReteBayesiana import retiBayesiane
+            rete = classe_rete(ramo)()
+            evidenze = [dict(zip(rete.Evidenze, valori)) for valori in itertools.product(retiBayesiane.STATI, repeat=3)]
+
+            def inferenze():
+                for evidenza in evidenze:
+                    retiBayesiane.ottieni_risultato_query(rete.inferenza(evidenza))
+            return inferenze
+
+        # La rete è costruita fuori dalla misura (vedi costruzione_rete): si misura
+        # solo l'apprendimento, che ne sostituisce i parametri a ogni esecuzione
+        def prepara_impara(ramo=ramo, usa_cache=False):
+            rete, righe = classe_rete(ramo)(), dataset(ramo)
+            return lambda: rete.impara_dataset(righe, "bayes", usa_cache=usa_cache)
+
+        casi.append((f"costruzione_rete[{ramo}]", prepara_costruzione, ripetizioni(50)))
+        casi.append((f"inferenza_125_combinazioni[{ramo}]", prepara_inferenze, ripetizioni(50)))
+        casi.append((f"impara_dataset[{ramo}]", prepara_impara, ripetizioni(20)))
+        casi.append((f"impara_dataset_cache[{ramo}]", functools.partial(prepara_impara, ramo, True), ripetizioni(50)))
+
+    def prepara_ontologia_owl():
+        from owlready2 import World
+        return lambda: World().get_ontology(indiceOntologia._iri_file(indiceOntologia.PERCORSO_ONTOLOGIA)).load()
+
+    def prepara_ontologia_snapshot():
+        return lambda: indiceOntologia.IndiceOntologia(indiceOntologia.carica_ontologia())
+    casi.append(("carica_ontologia[owl]", prepara_ontologia_owl, ripetizioni(10)))
+    casi.append(("carica_ontologia_e_indice[snapshot]", prepara_ontologia_snapshot, ripetizioni(10)))
+
+    combinazioni = list(itertools.product(indiceOntologia.ATTIVITA, ["si", "no"], indiceOntologia.FASCE_ORARIE,
+                                          indiceOntologia.TEMPERATURE, indiceOntologia.METEO))
+
+    def prepara_ricerche():
+        indice = indiceOntologia.ottieni_indice()
+
+        def ricerche():
+            for combinazione in combinazioni:
+                indice.risolvi(*combinazione)
+        return ricerche
+
+    def prepara_stampe():
+        from src.ClassiSupporto import interfacciaConUtente
+        indiceOntologia.ottieni_indice()
+
+        def stampe():
+            with contextlib.redirect_stdout(io.StringIO()):
+                for combinazione in combinazioni:
+                    interfacciaConUtente.stampa_risultato(*combinazione)
+        return stampe
+    casi.append((f"risolvi_raccomandazione_{len(combinazioni)}_combinazioni", prepara_ricerche, ripetizioni(200)))
+    casi.append((f"stampa_risultato_{len(combinazioni)}_combinazioni", prepara_stampe, ripetizioni(100)))
+
+    def prepara_griglie():
+        from src.ClassiSupporto import grigliaRischio
+
+        def griglie_rischio():
+            # Come dopo una modifica dei dataset: i parametri appresi vengono ricalcolati
+            grigliaRischio._posteriori_apprese.clear()
+            grigliaRischio.sintesi(grigliaRischio.calcola_griglie())
+        return griglie_rischio
+    casi.append(("griglie_rischio_e_sensibilita", prepara_griglie, ripetizioni(100)))
+
+    # Tutte le combinazioni di evidenze parziali su fascia, meteo, ramo e indoor,
+    # tranne quelle impossibili (ramo "normale" con i rovesci)
+    valori_nodi = {"Fascia": indiceOntologia.FASCE_ORARIE, "Meteo": indiceOntologia.METEO,
+                   "Ramo": indiceOntologia.TEMPERATURE, "Indoor": ["si", "no"]}
+    interrogazioni = [{nodo: valore for nodo, valore in zip(valori_nodi, valori) if valore is not None}
+                      for valori in itertools.product(*[stati + [None] for stati in valori_nodi.values()])]
+    interrogazioni = [evidenze for evidenze in interrogazioni
+                      if not (evidenze.get("Meteo") == "rovesci" and evidenze.get("Ramo") == "normale")]
+
+    def prepara_rete_unificata():
+        unificata = calcoloConsiglio.rete_unificata()
+
+        def rete_unificata():
+            # Cache dei messaggi vuota: misura anche il calcolo dei messaggi
+            unificata._messaggi.clear()
+            for evidenze in interrogazioni:
+                unificata.rischio_effettivo(evidenze)
+        return rete_unificata
+    casi.append((f"rete_unificata_{len(interrogazioni)}_interrogazioni", prepara_rete_unificata, ripetizioni(50)))
+    return casi
+
+# ==============================================================================
+# Funzione: versione_libreria()
+# Versione installata di una libreria (senza importarla), oppure None.
+# ==============================================================================
+def versione_libreria(nome):
+    try:
+        return metadata.version(nome)
+    except metadata.PackageNotFoundError:
+        return None
+
+# Librerie di cui si registra la versione: un aggiornamento può cambiare i tempi
+LIBRERIE = ["pandas", "bnlearn", "pgmpy", "owlready2"]
+
+# ==============================================================================
+# Funzione: esegui_benchmark()
+# Esegue i casi (eventualmente filtrati per sottostringa del nome) e restituisce
+# il dizionario dei risultati, con la descrizione dell'ambiente.
+# ==============================================================================
+def esegui_benchmark(scala=1.0, filtro=None, verbose=True):
+    import numpy
+    logging.getLogger("pgmpy").setLevel(logging.ERROR)
+    risultati = {
+        "ambiente": {
+            "python": platform.python_version(),
+            "piattaforma": platform.platform(),
+            "numpy": numpy.__version__,
+            "librerie": {nome: versione_libreria(nome) for nome in LIBRERIE},
+            "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "casi": {},
+    }
+    for nome, prepara, ripetizioni in casi_benchmark(scala):
+        if filtro and filtro not in nome:
+            continue
+        risultati["casi"][nome] = misura(prepara(), ripetizioni)
+        if verbose:
+            caso = risultati["casi"][nome]
+            print(f"{nome:48s} media {caso['media_ms']:9.3f} ms  p50 {caso['p50_ms']:9.3f} ms  "
+                  f"p99 {caso['p99_ms']:9.3f} ms  memoria {caso['picco_memoria_kb']:9.1f} KB")
+    return risultati
+
+# ==============================================================================
+# Funzione: confronta()
+# Confronta i risultati con un riferimento: per ogni caso comune riporta il
+# rapporto dei p50 e segnala le regressioni oltre la soglia (in percentuale).
+# Restituisce la lista dei casi peggiorati.
+# ==============================================================================
+def confronta(risultati, riferimento, soglia=10.0):
+    peggiorati = []
+    print("\n========================== CONFRONTO ===============================")
+    # Le differenze di ambiente spiegano variazioni che non sono regressioni del codice
+    ambiente, ambiente_base = risultati.get("ambiente", {}), riferimento.get("ambiente", {})
+    versioni = dict(python=ambiente.get("python"), numpy=ambiente.get("numpy"), **ambiente.get("librerie", {}))
+    versioni_base = dict(python=ambiente_base.get("python"), numpy=ambiente_base.get("numpy"),
+                         **ambiente_base.get("librerie", {}))
+    for libreria, versione in versioni.items():
+        if versioni_base.get(libreria) != versione:
+            print(f"Attenzione: {libreria} {versioni_base.get(libreria) or 'non registrato'} -> {versione} "
+                  f"rispetto al riferimento")
+    for nome, caso in risultati["casi"].items():
+        base = riferimento.get("casi", {}).get(nome)
+        if base is None:
+            print(f"{nome:48s} (assente nel riferimento)")
+            continue
+        rapporto = caso["p50_ms"] / base["p50_ms"] if base["p50_ms"] > 0 else float("inf")
+        variazione = (rapporto - 1) * 100
+        esito = "PEGGIORATO" if variazione > soglia else ("migliorato" if variazione < -soglia else "invariato")
+        if esito == "PEGGIORATO":
+            peggiorati.append(nome)
+        print(f"{nome:48s} p50 {base['p50_ms']:9.3f} -> {caso['p50_ms']:9.3f} ms  "
+              f"({variazione:+7.1f}%, x{rapporto:.2f})  {esito}")
+    print("====================================================================")
+    return peggiorati
+
+# ==============================================================================
+# Funzione: main()
+# Esegue il benchmark dalla riga di comando.
+# ==============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dei percorsi principali del sistema")
+    parser.add_argument("--output", help="file JSON in cui salvare i risultati")
+    parser.add_argument("--confronta", metavar="RIFERIMENTO", help="file JSON di riferimento da confrontare")
+    parser.add_argument("--soglia", type=float, default=10.0, help="variazione percentuale del p50 tollerata")
+    parser.add_argument("--scala", type=float, default=1.0, help="moltiplicatore del numero di ripetizioni")
+    parser.add_argument("--filtro", help="esegue solo i casi il cui nome contiene questo testo")
+    parser.add_argument("--fallisci-se-peggiore", action="store_true",
+                        help="termina con codice 1 se qualche caso supera la soglia")
+    argomenti = parser.parse_args(argv)
+
+    risultati = esegui_benchmark(argomenti.scala, argomenti.filtro)
+    if argomenti.output:
+        with open(argomenti.output, "w", encoding="utf-8") as f:
+            json.dump(risultati, f, indent=2)
+    if argomenti.confronta:
+        with open(argomenti.confronta, encoding="utf-8") as f:
+            peggiorati = confronta(risultati, json.load(f), argomenti.soglia)
+        if peggiorati and argomenti.fallisci_se_peggiore:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# ==============================================================================
+# cacheGeocoding.py
+#
+# Questo modulo implementa una cache persistente delle ricerche di Nominatim
+# (nome della città -> coordinate), posta davanti a geocodifica:
+#
+# - i nomi sono normalizzati (maiuscole/minuscole, accenti e spazi), così che
+#   "Bari", " bari " e "BARÌ" condividono la stessa voce;
+# - le coordinate trovate non scadono (le città non si spostano);
+# - le città non trovate sono memorizzate come voci negative, con una scadenza
+#   configurabile, per non ripetere ricerche destinate a fallire;
+# - un livello su disco (SQLite) conserva le voci tra i riavvii e tra processi;
+# - la cache può essere precaricata da un file CSV (citta,lat,lon) o JSON
+#   ({"citta": [lat, lon]}).
+# ==============================================================================
+
+import csv
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+PERCORSO_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cacheGeocoding.sqlite3")
+
+_cache_predefinita = None
+_lock_cache = threading.Lock()
+
+# ==============================================================================
+# Funzione: normalizza_citta()
+# Restituisce la chiave di un nome di città: senza accenti, in minuscolo e con
+# gli spazi compattati.
+# ==============================================================================
+def normalizza_citta(nome_citta):
+    scomposto = unicodedata.normalize("NFKD", str(nome_citta))
+    senza_accenti = "".join(c for c in scomposto if not unicodedata.combining(c))
+    return " ".join(senza_accenti.casefold().split())
+
+# ==============================================================================
+# Classe CacheGeocoding
+# Cache a due livelli (memoria + SQLite facoltativo) delle coordinate delle città.
+# ==============================================================================
+class CacheGeocoding:
+    def __init__(self, percorso_sqlite=None, ttl_negativo=86400, orologio=time.time):
+        """
+        Crea la cache:
+          - percorso_sqlite: file del livello su disco (None per disattivarlo)
+          - ttl_negativo: durata di validità, in secondi, di una città non trovata
+          - orologio: funzione che restituisce l'istante attuale in secondi
+        """
+        self.ttl_negativo = ttl_negativo
+        self.orologio = orologio
+        # chiave -> (coordinate oppure None, scadenza oppure None)
+        self.voci = {}
+        self.colpi = 0
+        self.mancati = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if percorso_sqlite is not None:
+            self._db = sqlite3.connect(percorso_sqlite, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS geocoding "
+                             "(chiave TEXT PRIMARY KEY, lat REAL, lon REAL, scadenza REAL)")
+            self._db.commit()
+
+    # --------------------------------------------------------------------------
+    # Metodo leggi: restituisce la coppia (presente, coordinate).
+    #   - (True, (lat, lon)): città nota
+    #   - (True, None): città cercata di recente e non trovata
+    #   - (False, None): città non presente in cache
+    # --------------------------------------------------------------------------
+    def leggi(self, nome_citta):
+        chiave = normalizza_citta(nome_citta)
+        adesso = self.orologio()
+        with self._lock:
+            voce = self.voci.get(chiave)
+            if voce is None and self._db is not None:
+                voce = self._leggi_disco(chiave)
+                if voce is not None:
+                    self.voci[chiave] = voce
+            if voce is not None and voce[1] is not None and voce[1] <= adesso:
+                del self.voci[chiave]
+                voce = None
+            if voce is None:
+                self.mancati += 1
+                return False, None
+            self.colpi += 1
+            return True, voce[0]
+
+    # --------------------------------------------------------------------------
+    # Metodo scrivi: memorizza le coordinate della città (None se non trovata).
+    # --------------------------------------------------------------------------
+    def scrivi(self, nome_citta, coordinate):
+        self.scrivi_molte([(nome_citta, coordinate)])
+
+    # --------------------------------------------------------------------------
+    # Metodo scrivi_molte: memorizza più coppie (nome, coordinate) in un'unica
+    # transazione.
+    # --------------------------------------------------------------------------
+    def scrivi_molte(self, coppie):
+        adesso = self.orologio()
+        righe = []
+        with self._lock:
+            for nome_citta, coordinate in coppie:
+                chiave = normalizza_citta(nome_citta)
+                if coordinate is None:
+                    voce = (None, adesso + self.ttl_negativo)
+                    righe.append((chiave, None, None, voce[1]))
+                else:
+                    voce = ((float(coordinate[0]), float(coordinate[1])), None)
+                    righe.append((chiave, voce[0][0], voce[0][1], None))
+                self.voci[chiave] = voce
+            if self._db is not None:
+                self._db.executemany("INSERT OR REPLACE INTO geocoding VALUES (?, ?, ?, ?)", righe)
+                self._db.commit()
+
+    # --------------------------------------------------------------------------
+    # Metodo precarica: carica le coordinate da un file CSV (intestazione
+    # citta,lat,lon) o JSON ({"citta": [lat, lon]}). Restituisce il numero di
+    # città caricate.
+    # --------------------------------------------------------------------------
+    def precarica(self, percorso):
+        with open(percorso, encoding="utf-8", newline="") as file:
+            if percorso.lower().endswith(".json"):
+                coppie = [(nome, (lat, lon)) for nome, (lat, lon) in json.load(file).items()]
+            else:
+                coppie = [(riga["citta"], (riga["lat"], riga["lon"])) for riga in csv.DictReader(file)]
+        self.scrivi_molte(coppie)
+        return len(coppie)
+
+    # --------------------------------------------------------------------------
+    # Metodo statistiche: numero di voci in memoria, colpi e mancati.
+    # --------------------------------------------------------------------------
+    def statistiche(self):
+        with self._lock:
+            return {"voci": len(self.voci), "colpi": self.colpi, "mancati": self.mancati}
+
+    # --------------------------------------------------------------------------
+    # Metodo svuota: elimina tutte le voci (in memoria e su disco).
+    # --------------------------------------------------------------------------
+    def svuota(self):
+        with self._lock:
+            self.voci.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM geocoding")
+                self._db.commit()
+
+    # --------------------------------------------------------------------------
+    # Metodo chiudi: chiude il livello su disco.
+    # --------------------------------------------------------------------------
+    def chiudi(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    # --------------------------------------------------------------------------
+    # Metodo _leggi_disco: legge una voce dal livello su disco (senza controllarne
+    # la scadenza).
+    # --------------------------------------------------------------------------
+    def _leggi_disco(self, chiave):
+        riga = self._db.execute("SELECT lat, lon, scadenza FROM geocoding WHERE chiave = ?", (chiave,)).fetchone()
+        if riga is None:
+            return None
+        coordinate = None if riga[0] is None else (riga[0], riga[1])
+        return coordinate, riga[2]
+
+# ==============================================================================
+# Funzione: configura_cache()
+# Sostituisce la cache condivisa con una nuova creata con le opzioni indicate.
+# ==============================================================================
+def configura_cache(**opzioni):
+    global _cache_predefinita
+    with _lock_cache:
+        precedente = _cache_predefinita
+        _cache_predefinita = CacheGeocoding(**opzioni)
+    if precedente is not None:
+        precedente.chiudi()
+    return _cache_predefinita
+
+# ==============================================================================
+# Funzione: cache_predefinita()
+# Restituisce la cache condivisa dal processo, creandola alla prima chiamata sul
+# file PERCORSO_CACHE (solo in memoria se il file non è utilizzabile).
+# ==============================================================================
+def cache_predefinita():
+    global _cache_predefinita
+    if _cache_predefinita is None:
+        with _lock_cache:
+            if _cache_predefinita is None:
+                try:
+                    _cache_predefinita = CacheGeocoding(PERCORSO_CACHE)
+                except (OSError, sqlite3.Error):
+                    _cache_predefinita = CacheGeocoding()
+    return _cache_predefinita
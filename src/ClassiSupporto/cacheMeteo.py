@@ -0,0 +1,175 @@
+# ==============================================================================
+# cacheMeteo.py
+#
+# Questo modulo implementa una cache delle rilevazioni meteo di OpenWeatherMap,
+# posta davanti a scarica_meteo:
+#
+# - la chiave è la coppia di coordinate arrotondate ad una griglia configurabile
+#   (utenti della stessa città condividono la stessa voce);
+# - ogni voce scade dopo un tempo configurabile (TTL);
+# - il livello in memoria ha una dimensione massima con rimozione LRU;
+# - un livello facoltativo su disco (SQLite) conserva le voci tra i riavvii e
+#   tra processi diversi.
+# ==============================================================================
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_cache_predefinita = None
+_lock_cache = threading.Lock()
+
+# ==============================================================================
+# Classe CacheMeteo
+# Cache a due livelli (memoria LRU + SQLite facoltativo) con scadenza delle voci.
+# ==============================================================================
+class CacheMeteo:
+    def __init__(self, griglia=0.01, ttl=600, max_voci=1024, percorso_sqlite=None, orologio=time.time):
+        """
+        Crea la cache:
+          - griglia: passo (in gradi) a cui vengono arrotondate le coordinate
+          - ttl: durata di validità di una voce, in secondi
+          - max_voci: numero massimo di voci nel livello in memoria
+          - percorso_sqlite: file del livello su disco (None per disattivarlo)
+          - orologio: funzione che restituisce l'istante attuale in secondi
+        """
+        self.griglia = griglia
+        self.ttl = ttl
+        self.max_voci = max_voci
+        self.orologio = orologio
+        self.voci = OrderedDict()
+        self.colpi = 0
+        self.mancati = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if percorso_sqlite is not None:
+            self._db = sqlite3.connect(percorso_sqlite, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS meteo (chiave TEXT PRIMARY KEY, scadenza REAL, dati TEXT)")
+            self._db.commit()
+
+    # --------------------------------------------------------------------------
+    # Metodo chiave: arrotonda le coordinate alla griglia.
+    # --------------------------------------------------------------------------
+    def chiave(self, lat, lon):
+        return "%d:%d" % (round(float(lat) / self.griglia), round(float(lon) / self.griglia))
+
+    # --------------------------------------------------------------------------
+    # Metodo leggi: restituisce i dati validi per le coordinate, oppure None.
+    # --------------------------------------------------------------------------
+    def leggi(self, lat, lon):
+        chiave = self.chiave(lat, lon)
+        adesso = self.orologio()
+        with self._lock:
+            voce = self.voci.get(chiave)
+            if voce is not None and voce[0] <= adesso:
+                del self.voci[chiave]
+                voce = None
+            if voce is None and self._db is not None:
+                voce = self._leggi_disco(chiave, adesso)
+                if voce is not None:
+                    self._inserisci(chiave, voce)
+            if voce is None:
+                self.mancati += 1
+                return None
+            self.voci.move_to_end(chiave)
+            self.colpi += 1
+            return voce[1]
+
+    # --------------------------------------------------------------------------
+    # Metodo scrivi: memorizza i dati per le coordinate, con scadenza ttl.
+    # --------------------------------------------------------------------------
+    def scrivi(self, lat, lon, dati):
+        chiave = self.chiave(lat, lon)
+        adesso = self.orologio()
+        voce = (adesso + self.ttl, dati)
+        with self._lock:
+            self._inserisci(chiave, voce)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO meteo VALUES (?, ?, ?)", (chiave, voce[0], json.dumps(dati)))
+                # Rimuove dal disco le voci ormai scadute
+                self._db.execute("DELETE FROM meteo WHERE scadenza <= ?", (adesso,))
+                self._db.commit()
+
+    # --------------------------------------------------------------------------
+    # Metodo ottieni: restituisce i dati dalla cache o, se assenti, li ottiene
+    # chiamando carica() e li memorizza.
+    # --------------------------------------------------------------------------
+    def ottieni(self, lat, lon, carica):
+        dati = self.leggi(lat, lon)
+        if dati is None:
+            dati = carica()
+            self.scrivi(lat, lon, dati)
+        return dati
+
+    # --------------------------------------------------------------------------
+    # Metodo statistiche: numero di voci in memoria, colpi e mancati.
+    # --------------------------------------------------------------------------
+    def statistiche(self):
+        with self._lock:
+            return {"voci": len(self.voci), "colpi": self.colpi, "mancati": self.mancati}
+
+    # --------------------------------------------------------------------------
+    # Metodo svuota: elimina tutte le voci (in memoria e su disco).
+    # --------------------------------------------------------------------------
+    def svuota(self):
+        with self._lock:
+            self.voci.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM meteo")
+                self._db.commit()
+
+    # --------------------------------------------------------------------------
+    # Metodo chiudi: chiude il livello su disco.
+    # --------------------------------------------------------------------------
+    def chiudi(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    # --------------------------------------------------------------------------
+    # Metodo _inserisci: aggiunge una voce in memoria rimuovendo la meno usata
+    # quando si supera max_voci (da chiamare con il lock acquisito).
+    # --------------------------------------------------------------------------
+    def _inserisci(self, chiave, voce):
+        self.voci[chiave] = voce
+        self.voci.move_to_end(chiave)
+        while len(self.voci) > self.max_voci:
+            self.voci.popitem(last=False)
+
+    # --------------------------------------------------------------------------
+    # Metodo _leggi_disco: legge una voce non scaduta dal livello su disco.
+    # --------------------------------------------------------------------------
+    def _leggi_disco(self, chiave, adesso):
+        riga = self._db.execute("SELECT scadenza, dati FROM meteo WHERE chiave = ? AND scadenza > ?",
+                                (chiave, adesso)).fetchone()
+        if riga is None:
+            return None
+        return riga[0], json.loads(riga[1])
+
+# ==============================================================================
+# Funzione: configura_cache()
+# Sostituisce la cache condivisa con una nuova creata con le opzioni indicate.
+# ==============================================================================
+def configura_cache(**opzioni):
+    global _cache_predefinita
+    with _lock_cache:
+        precedente = _cache_predefinita
+        _cache_predefinita = CacheMeteo(**opzioni)
+    if precedente is not None:
+        precedente.chiudi()
+    return _cache_predefinita
+
+# ==============================================================================
+# Funzione: cache_predefinita()
+# Restituisce la cache condivisa dal processo (solo in memoria, con i valori
+# predefiniti), creandola alla prima chiamata.
+# ==============================================================================
+def cache_predefinita():
+    global _cache_predefinita
+    if _cache_predefinita is None:
+        with _lock_cache:
+            if _cache_predefinita is None:
+                _cache_predefinita = CacheMeteo()
+    return _cache_predefinita
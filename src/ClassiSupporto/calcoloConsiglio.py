@@ -0,0 +1,302 @@
+# ==============================================================================
+# calcoloConsiglio.py
+#
+# Questo modulo calcola una raccomandazione in modo programmatico, senza input()
+# e senza variabili globali: riceve una richiesta strutturata (fascia oraria,
+# meteo, temperatura, vento, pioggia, attività, accesso indoor) e restituisce un
+# risultato strutturato con il ramo (caldo/freddo/normale), l'allerta meteo, il
+# rischio di insoddisfazione e le raccomandazioni dell'ontologia.
+#
+# Contiene inoltre le funzioni pure (determinazione del ramo e conversione di
+# temperatura e vento in indici 0-4) usate anche dall'interfaccia interattiva;
+# le soglie sono condivise con la versione vettoriale (vedi discretizzazione).
+#
+# Con le reti predefinite l'inferenza usa i tensori compilati (rete_compilata),
+# senza importare bnlearn, pgmpy e pandas, necessari solo per la rete appresa.
+# rete_unificata restituisce la rete che riunisce i due rami con fascia, meteo e
+# accesso indoor (vedi reteUnificata).
+# ==============================================================================
+
+import math
+import os
+import threading
+from collections import namedtuple
+
+# --------------------------------------------------------------------------
+# Soglia (in percentuale) oltre la quale viene segnalata un'allerta meteo
+# --------------------------------------------------------------------------
+SOGLIA_ALLERTA = 35
+
+# --------------------------------------------------------------------------
+# Soglie della discretizzazione
+# --------------------------------------------------------------------------
+LIMITE_CALDO = 26              # Ramo "caldo" sopra questa temperatura (°C, parte intera)
+LIMITE_FREDDO = 15             # Ramo "freddo" sotto questa temperatura (°C, parte intera)
+PIOGGIA_CRITICA = 3            # Indice di pioggia che forza il ramo "freddo"
+# Ramo "freddo": temperatura < soglia i -> INDICI_TEMPERATURA_FREDDO[i];
+# oltre l'ultima soglia (ramo forzato) l'indice è l'ultimo valore
+SOGLIE_TEMPERATURA_FREDDO = [5, 9, 12, 15]
+INDICI_TEMPERATURA_FREDDO = [4, 3, 2, 1, 4]
+# Ramo "caldo": temperatura > soglia i -> indice i + 1 (altrimenti 0)
+SOGLIE_TEMPERATURA_CALDO = [31, 34, 38, 42]
+# Vento (km/h): vento <= soglia i -> indice i (oltre l'ultima soglia 4)
+SOGLIE_VENTO = [16, 21, 27, 31]
+# Pioggia (mm/h): pioggia <= soglia i -> indice i (oltre l'ultima soglia 4);
+# classi assenza, leggera, moderata, intensa, molto intensa
+SOGLIE_PIOGGIA = [0, 2.5, 7.6, 50]
+
+PERCORSI_DATASET = {
+    "freddo": os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset_consulente_freddo_ottimale.csv"),
+    "caldo": os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset_consulente_caldo_ottimale.csv"),
+}
+
+# --------------------------------------------------------------------------
+# RichiestaConsiglio: dati in ingresso di una raccomandazione.
+#   - attivita: "sportiva", "culturale" o "ricreativa"
+#   - indoor: "si"/"no" (oppure True/False) per l'accesso a strutture indoor
+#   - fascia: "mattina" o "sera"
+#   - meteo: "nuvoloso", "scoperto" o "rovesci"
+#   - temperatura: temperatura in gradi Celsius
+#   - vento: velocità del vento in km/h
+#   - pioggia: intensità della pioggia (0-4)
+#   - rete: "1" rete bayesiana data, "2" rete con apprendimento dal dataset
+#   - indice_vento: indice del vento (0-4) già discretizzato; se indicato
+#     sostituisce la conversione da km/h (come nell'inserimento manuale)
+#
+# RisultatoConsiglio: esito della raccomandazione.
+#   - ramo: "caldo", "freddo" o "normale"
+#   - allerta: True se la rete bayesiana data rileva un'allerta meteo
+#   - probabilita_rischio: rischio di insoddisfazione in percentuale calcolato
+#     con la rete scelta (None se non c'è allerta)
+#   - rischio_annullato: True se c'è allerta ma l'utente ha accesso indoor
+#   - raccomandazione: Risoluzione dell'ontologia (vedi indiceOntologia)
+# --------------------------------------------------------------------------
+RichiestaConsiglio = namedtuple(
+    "RichiestaConsiglio",
+    ["attivita", "indoor", "fascia", "meteo", "temperatura", "vento", "pioggia", "rete", "indice_vento"],
+    defaults=[0.0, 0, "1", None],
+)
+RisultatoConsiglio = namedtuple(
+    "RisultatoConsiglio",
+    ["ramo", "allerta", "probabilita_rischio", "rischio_annullato", "raccomandazione"],
+)
+
+# Reti condivise nel processo e tra i thread (create una volta, usate in sola lettura)
+_reti_apprese = {}
+_reti_unificate = {}
+_lock_reti = threading.Lock()
+
+# ==============================================================================
+# Funzione: determina_ramo()
+# Determina il ramo in base alla temperatura, forzando il ramo "freddo" quando la
+# temperatura è "normale" ma le condizioni sono critiche (rovesci o pioggia intensa).
+# ==============================================================================
+def determina_ramo(temperatura, meteo, pioggia):
+    if int(temperatura) > LIMITE_CALDO:
+        return "caldo"
+    if int(temperatura) < LIMITE_FREDDO:
+        return "freddo"
+    if meteo.strip().lower() == "rovesci" or int(pioggia) >= PIOGGIA_CRITICA:
+        return "freddo"
+    return "normale"
+
+# ==============================================================================
+# Funzione: indice_temperatura_freddo()
+# Converte la temperatura in un indice (0-4) per il ramo "freddo".
+# ==============================================================================
+def indice_temperatura_freddo(temperatura):
+    for posizione, soglia in enumerate(SOGLIE_TEMPERATURA_FREDDO):
+        if temperatura < soglia:
+            return INDICI_TEMPERATURA_FREDDO[posizione]
+    return INDICI_TEMPERATURA_FREDDO[-1]    # Condizione estrema: forza l'indice massimo
+
+# ==============================================================================
+# Funzione: indice_temperatura_caldo()
+# Converte la temperatura in un indice (0-4) per il ramo "caldo".
+# ==============================================================================
+def indice_temperatura_caldo(temperatura):
+    for indice in range(len(SOGLIE_TEMPERATURA_CALDO), 0, -1):
+        if temperatura > SOGLIE_TEMPERATURA_CALDO[indice - 1]:
+            return indice
+    return 0
+
+# ==============================================================================
+# Funzione: indice_vento()
+# Converte la velocità del vento (km/h) in un indice (0-4).
+# ==============================================================================
+def indice_vento(vento):
+    try:
+        vento = float(vento)
+    except (ValueError, TypeError):
+        vento = 0
+    for indice, soglia in enumerate(SOGLIE_VENTO):
+        if vento <= soglia:
+            return indice
+    return len(SOGLIE_VENTO)
+
+# ==============================================================================
+# Funzione: indice_pioggia()
+# Converte l'intensità della pioggia (mm/h, ad esempio "rain.1h" di
+# OpenWeatherMap) in un indice (0-4); un valore mancante vale 0.
+# ==============================================================================
+def indice_pioggia(pioggia):
+    try:
+        pioggia = float(pioggia)
+    except (ValueError, TypeError):
+        pioggia = 0
+    if math.isnan(pioggia):
+        pioggia = 0     # Dato mancante: nessuna pioggia
+    for indice, soglia in enumerate(SOGLIE_PIOGGIA):
+        if pioggia <= soglia:
+            return indice
+    return len(SOGLIE_PIOGGIA)
+
+# ==============================================================================
+# Funzione: evidenza_rete()
+# Costruisce il dizionario di evidenze per la rete bayesiana del ramo indicato.
+# ==============================================================================
+def evidenza_rete(ramo, indice_temperatura, indice_vento, pioggia):
+    if ramo == "freddo":
+        return {'Vento': int(indice_vento), 'Freddo': int(indice_temperatura), 'Pioggia': int(pioggia)}
+    return {'Attività': int(indice_temperatura), 'Vento': int(indice_vento), 'Pioggia': int(pioggia)}
+
+# Nomi delle classi di retiBayesiane per ciascun ramo
+CLASSI_RETI = {"freddo": "BayesianaInsoddisfazione", "caldo": "BayesianaTempoLibero"}
+
+# ==============================================================================
+# Funzione: rete_compilata()
+# Restituisce la rete con i CPD predefiniti del ramo indicato, ridotta al tensore
+# delle posteriori (stessi risultati della rete di retiBayesiane, senza bnlearn).
+# ==============================================================================
+def rete_compilata(ramo):
+    from src.ReteBayesiana import posteriori
+    return posteriori.rete_compilata_predefinita(CLASSI_RETI[ramo])
+
+# ==============================================================================
+# Funzione: rete_appresa()
+# Restituisce la rete bayesiana del ramo indicato con i parametri appresi dal
+# dataset corrispondente (letto dalla sua forma binaria, vedi datasetBinario).
+# La rete è condivisa nel processo e viene ricreata solo se il file del dataset
+# cambia; i parametri appresi sono inoltre riusati tra i riavvii tramite la
+# cache di impara_dataset.
+# ==============================================================================
+def rete_appresa(ramo):
+    stato = os.stat(PERCORSI_DATASET[ramo])
+    firma = (stato.st_mtime_ns, stato.st_size)
+    voce = _reti_apprese.get(ramo)
+    if voce is None or voce[0] != firma:
+        from src.ClassiSupporto import datasetBinario
+        from src.ReteBayesiana import retiBayesiane as rb
+        with _lock_reti:
+            voce = _reti_apprese.get(ramo)
+            if voce is None or voce[0] != firma:
+                rete = rb.BayesianaInsoddisfazione() if ramo == "freddo" else rb.BayesianaTempoLibero()
+                rete.impara_dataset(datasetBinario.carica_dataset(PERCORSI_DATASET[ramo]), "bayes")
+                voce = _reti_apprese[ramo] = (firma, rete)
+    return voce[1]
+
+# ==============================================================================
+# Funzione: rete_unificata()
+# Restituisce la rete unificata (vedi reteUnificata) con i parametri delle reti
+# dei rami predefiniti ("predefiniti") o stimati dai dataset ("appresi"). La
+# rete è condivisa nel processo; quella appresa viene ricompilata solo se un
+# dataset cambia.
+# ==============================================================================
+def rete_unificata(parametri="predefiniti"):
+    from src.ReteBayesiana import reteUnificata
+    if parametri == "predefiniti":
+        firma = None
+    elif parametri == "appresi":
+        firma = tuple((os.stat(PERCORSI_DATASET[ramo]).st_mtime_ns, os.stat(PERCORSI_DATASET[ramo]).st_size)
+                      for ramo in ["freddo", "caldo"])
+    else:
+        raise ValueError("Parametri non validi: " + str(parametri))
+    voce = _reti_unificate.get(parametri)
+    if voce is None or voce[0] != firma:
+        with _lock_reti:
+            voce = _reti_unificate.get(parametri)
+            if voce is None or voce[0] != firma:
+                if firma is None:
+                    rete = reteUnificata.rete_unificata_predefinita()
+                else:
+                    from src.ClassiSupporto import datasetBinario
+                    from src.ReteBayesiana.posteriori import conta_osservazioni
+                    conteggi = {}
+                    for ramo in ["freddo", "caldo"]:
+                        evidenze = rete_compilata(ramo).Evidenze
+                        dataset = datasetBinario.carica_dataset(PERCORSI_DATASET[ramo])
+                        conteggi[ramo] = (evidenze, conta_osservazioni(dataset, evidenze + ['Consiglio']))
+                    rete = reteUnificata.rete_unificata_da_conteggi(conteggi)
+                voce = _reti_unificate[parametri] = (firma, rete)
+    return voce[1]
+
+# ==============================================================================
+# Funzione: precarica_risorse()
+# Carica in anticipo le risorse condivise (reti data e appresa di entrambi i rami
+# e indice dell'ontologia), così che le richieste successive non ne paghino il costo.
+# ==============================================================================
+def precarica_risorse():
+    from src.Ontologia import indiceOntologia
+    for ramo in ["freddo", "caldo"]:
+        rete_compilata(ramo)
+        rete_appresa(ramo)
+    indiceOntologia.ottieni_indice()
+
+# ==============================================================================
+# Funzione: probabilita_rischio()
+# Restituisce la probabilità (in percentuale) che "Consiglio" valga 3 o 4.
+# ==============================================================================
+def probabilita_rischio(rete, evidenza):
+    p = rete.inferenza(evidenza)
+    return float((p[3] + p[4]) * 100)
+
+# ==============================================================================
+# Funzione: calcola_consiglio()
+# Calcola la raccomandazione per una RichiestaConsiglio (o un dizionario con gli
+# stessi campi) applicando la stessa logica del percorso interattivo.
+# ==============================================================================
+def calcola_consiglio(richiesta):
+    from src.Ontologia import indiceOntologia
+    if isinstance(richiesta, dict):
+        richiesta = RichiestaConsiglio(**richiesta)
+
+    meteo = richiesta.meteo.strip().lower()
+    indoor = richiesta.indoor
+    if isinstance(indoor, bool):
+        indoor = "si" if indoor else "no"
+    indoor = indoor.strip().lower()
+
+    ramo = determina_ramo(richiesta.temperatura, meteo, richiesta.pioggia)
+    allerta = False
+    rischio = None
+    if ramo in ["freddo", "caldo"]:
+        if ramo == "freddo":
+            indice_temperatura = indice_temperatura_freddo(richiesta.temperatura)
+        else:
+            indice_temperatura = indice_temperatura_caldo(richiesta.temperatura)
+        vento = richiesta.indice_vento if richiesta.indice_vento is not None else indice_vento(richiesta.vento)
+        evidenza = evidenza_rete(ramo, indice_temperatura, vento, richiesta.pioggia)
+        # L'allerta è valutata sempre con la rete data, il rischio finale con la rete scelta
+        allerta = probabilita_rischio(rete_compilata(ramo), evidenza) >= SOGLIA_ALLERTA
+        if allerta:
+            rete = rete_appresa(ramo) if str(richiesta.rete).strip() == "2" else rete_compilata(ramo)
+            rischio = probabilita_rischio(rete, evidenza)
+
+    raccomandazione = indiceOntologia.ottieni_indice().risolvi(
+        richiesta.attivita, indoor, richiesta.fascia, ramo, meteo)
+    return RisultatoConsiglio(
+        ramo=ramo,
+        allerta=allerta,
+        probabilita_rischio=rischio,
+        rischio_annullato=allerta and indoor == "si",
+        raccomandazione=raccomandazione,
+    )
+
+# ==============================================================================
+# Funzione: calcola_consigli()
+# Variante batch: calcola le raccomandazioni per un iterabile di richieste,
+# restituendo i risultati nello stesso ordine (come generatore).
+# ==============================================================================
+def calcola_consigli(richieste):
+    for richiesta in richieste:
+        yield calcola_consiglio(richiesta)
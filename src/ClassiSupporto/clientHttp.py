@@ -0,0 +1,147 @@
+# ==============================================================================
+# clientHttp.py
+#
+# Questo modulo fornisce un client HTTP condiviso per i servizi esterni
+# (OpenWeatherMap):
+#
+# - connessioni keep-alive riusate tramite un pool (requests.Session);
+# - timeout separati di connessione e di lettura;
+# - un numero limitato di nuovi tentativi con attesa esponenziale (backoff)
+#   per errori di rete e risposte 429/5xx;
+# - misura della latenza di ogni chiamata, con statistiche riassuntive.
+#
+# Il client non dipende da un host specifico: può quindi essere provato contro
+# un server HTTP locale che simula il servizio reale.
+# ==============================================================================
+
+import threading
+import time
+from collections import deque, namedtuple
+
+# --------------------------------------------------------------------------
+# Chiamata: misura di una singola richiesta
+#   - url: indirizzo richiesto
+#   - durata: tempo totale in secondi (inclusi eventuali nuovi tentativi)
+#   - stato: codice HTTP della risposta, oppure None in caso di errore
+# --------------------------------------------------------------------------
+Chiamata = namedtuple("Chiamata", ["url", "durata", "stato"])
+
+_client_predefinito = None
+_lock_client = threading.Lock()
+
+# ==============================================================================
+# Classe ClientHttp
+# Client HTTP con pool di connessioni, timeout, nuovi tentativi e latenze.
+# ==============================================================================
+class ClientHttp:
+    def __init__(self, timeout_connessione=3.05, timeout_lettura=10, tentativi=3, backoff=0.5,
+                 dimensione_pool=10, stati_da_ritentare=(429, 500, 502, 503, 504),
+                 storico_latenze=1000, al_termine=None):
+        """
+        Crea il client:
+          - timeout_connessione / timeout_lettura: secondi massimi di attesa
+          - tentativi: numero massimo di nuovi tentativi dopo il primo
+          - backoff: fattore dell'attesa esponenziale tra i tentativi
+          - dimensione_pool: connessioni mantenute aperte per host
+          - stati_da_ritentare: codici HTTP per cui ripetere la richiesta
+          - storico_latenze: numero di chiamate conservate per le statistiche
+          - al_termine: funzione facoltativa chiamata con la Chiamata misurata
+        """
+        # requests viene importato solo quando serve un client (percorso online)
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        self.timeout = (timeout_connessione, timeout_lettura)
+        self.al_termine = al_termine
+        ritenta = Retry(
+            total=tentativi,
+            connect=tentativi,
+            read=tentativi,
+            status=tentativi,
+            backoff_factor=backoff,
+            status_forcelist=stati_da_ritentare,
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False,
+            respect_retry_after_header=True,
+        )
+        adattatore = HTTPAdapter(pool_connections=dimensione_pool, pool_maxsize=dimensione_pool,
+                                 max_retries=ritenta)
+        self.sessione = requests.Session()
+        self.sessione.mount("http://", adattatore)
+        self.sessione.mount("https://", adattatore)
+        self.chiamate = deque(maxlen=storico_latenze)
+        self._lock = threading.Lock()
+
+    # --------------------------------------------------------------------------
+    # Metodo get: esegue una richiesta GET e ne registra la latenza.
+    # Le eccezioni di requests (timeout, errori di connessione) sono propagate.
+    # --------------------------------------------------------------------------
+    def get(self, url, params=None):
+        inizio = time.perf_counter()
+        stato = None
+        try:
+            risposta = self.sessione.get(url, params=params, timeout=self.timeout)
+            stato = risposta.status_code
+            return risposta
+        finally:
+            chiamata = Chiamata(url, time.perf_counter() - inizio, stato)
+            with self._lock:
+                self.chiamate.append(chiamata)
+            if self.al_termine is not None:
+                self.al_termine(chiamata)
+
+    # --------------------------------------------------------------------------
+    # Metodo ultima_latenza: durata in secondi dell'ultima chiamata (None se assente).
+    # --------------------------------------------------------------------------
+    def ultima_latenza(self):
+        with self._lock:
+            return self.chiamate[-1].durata if self.chiamate else None
+
+    # --------------------------------------------------------------------------
+    # Metodo statistiche: riepilogo delle latenze (in millisecondi) delle ultime chiamate.
+    # --------------------------------------------------------------------------
+    def statistiche(self):
+        with self._lock:
+            chiamate = list(self.chiamate)
+        if not chiamate:
+            return {"chiamate": 0}
+        durate = sorted(c.durata * 1000 for c in chiamate)
+        return {
+            "chiamate": len(chiamate),
+            "errori": sum(1 for c in chiamate if c.stato is None or c.stato >= 400),
+            "media_ms": sum(durate) / len(durate),
+            "p50_ms": durate[(len(durate) - 1) // 2],
+            "p95_ms": durate[min(len(durate) - 1, int(len(durate) * 0.95))],
+            "max_ms": durate[-1],
+        }
+
+    # --------------------------------------------------------------------------
+    # Metodo chiudi: chiude le connessioni del pool.
+    # --------------------------------------------------------------------------
+    def chiudi(self):
+        self.sessione.close()
+
+# ==============================================================================
+# Funzione: configura_client()
+# Sostituisce il client condiviso con uno nuovo creato con le opzioni indicate.
+# ==============================================================================
+def configura_client(**opzioni):
+    global _client_predefinito
+    with _lock_client:
+        precedente = _client_predefinito
+        _client_predefinito = ClientHttp(**opzioni)
+    if precedente is not None:
+        precedente.chiudi()
+    return _client_predefinito
+
+# ==============================================================================
+# Funzione: client_predefinito()
+# Restituisce il client condiviso dal processo, creandolo alla prima chiamata.
+# ==============================================================================
+def client_predefinito():
+    global _client_predefinito
+    if _client_predefinito is None:
+        with _lock_client:
+            if _client_predefinito is None:
+                _client_predefinito = ClientHttp()
+    return _client_predefinito
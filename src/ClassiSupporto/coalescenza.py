@@ -0,0 +1,77 @@
+# ==============================================================================
+# coalescenza.py
+#
+# Questo modulo raggruppa le chiamate identiche contemporanee ("singleflight"):
+# se più thread chiedono lo stesso risultato (stessa chiave) mentre la prima
+# chiamata è ancora in corso, solo questa viene eseguita e tutti ricevono il suo
+# risultato (oppure la sua eccezione).
+#
+# È usato da previsioniMeteo per inviare a Nominatim e OpenWeatherMap una sola
+# richiesta per città anche quando molte sessioni la cercano insieme.
+# ==============================================================================
+
+import threading
+
+# ==============================================================================
+# Classe _ChiamataInCorso
+# Stato di una chiamata in esecuzione, condiviso con i thread in attesa.
+# ==============================================================================
+class _ChiamataInCorso:
+    def __init__(self):
+        self.completata = threading.Event()
+        self.risultato = None
+        self.errore = None
+        self.attese = 0
+
+# ==============================================================================
+# Classe GruppoChiamate
+# Esegue una sola volta le chiamate contemporanee con la stessa chiave.
+# ==============================================================================
+class GruppoChiamate:
+    def __init__(self):
+        """
+        Crea un gruppo vuoto; le chiavi di gruppi diversi sono indipendenti.
+        """
+        self.in_corso = {}
+        self.eseguite = 0
+        self.condivise = 0
+        self._lock = threading.Lock()
+
+    # --------------------------------------------------------------------------
+    # Metodo esegui: restituisce funzione(*args, **kwargs), eseguendola solo se
+    # non c'è già una chiamata in corso con la stessa chiave; altrimenti attende
+    # quella e ne condivide il risultato o l'eccezione.
+    # --------------------------------------------------------------------------
+    def esegui(self, chiave, funzione, *args, **kwargs):
+        with self._lock:
+            chiamata = self.in_corso.get(chiave)
+            esecutore = chiamata is None
+            if esecutore:
+                chiamata = self.in_corso[chiave] = _ChiamataInCorso()
+                self.eseguite += 1
+            else:
+                chiamata.attese += 1
+                self.condivise += 1
+        if not esecutore:
+            chiamata.completata.wait()
+            if chiamata.errore is not None:
+                raise chiamata.errore
+            return chiamata.risultato
+        try:
+            chiamata.risultato = funzione(*args, **kwargs)
+            return chiamata.risultato
+        except BaseException as e:
+            chiamata.errore = e
+            raise
+        finally:
+            with self._lock:
+                del self.in_corso[chiave]
+            chiamata.completata.set()
+
+    # --------------------------------------------------------------------------
+    # Metodo statistiche: chiamate eseguite, chiamate servite da un'altra in
+    # corso e chiavi attualmente in esecuzione.
+    # --------------------------------------------------------------------------
+    def statistiche(self):
+        with self._lock:
+            return {"eseguite": self.eseguite, "condivise": self.condivise, "in_corso": len(self.in_corso)}
@@ -0,0 +1,90 @@
+# ==============================================================================
+# datasetBinario.py
+#
+# Questo modulo conserva i dataset CSV delle reti bayesiane in forma binaria
+# compatta: una matrice numpy di uint8 in ordine per colonne (file .npy), con
+# le intestazioni e i dati del CSV di origine in un file .npy.json accanto.
+#
+# - la conversione avviene una sola volta; il file binario viene ricreato
+#   automaticamente quando il CSV cambia (data di modifica e dimensione, con
+#   verifica del contenuto tramite sha256 se cambia solo la data; vedi fileDerivati);
+# - il file binario viene aperto in memory mapping, senza analizzare il CSV;
+# - ogni dataset viene caricato al più una volta per processo.
+#
+# Se il file binario non può essere scritto o letto, il CSV viene letto con pandas.
+# ==============================================================================
+
+import os
+import threading
+
+import numpy
+import pandas
+
+from src.ClassiSupporto import fileDerivati
+
+# Dataset già caricati nel processo (percorso CSV -> (firma del CSV, DataFrame))
+_dataset_caricati = {}
+_lock_dataset = threading.Lock()
+
+# ==============================================================================
+# Funzione: percorso_binario()
+# Restituisce il percorso del file .npy corrispondente al CSV.
+# ==============================================================================
+def percorso_binario(percorso_csv):
+    return os.path.splitext(percorso_csv)[0] + ".npy"
+
+# ==============================================================================
+# Funzione: converti_dataset()
+# Converte il CSV nel file binario (sostituito in modo atomico) e ne restituisce
+# i metadati. Solleva ValueError se i valori non sono interi tra 0 e 255.
+# ==============================================================================
+def converti_dataset(percorso_csv, percorso_npy=None):
+    percorso_npy = percorso_npy or percorso_binario(percorso_csv)
+    metadati = fileDerivati.metadati_sorgente(percorso_csv)
+    dataset = pandas.read_csv(percorso_csv)
+    valori = dataset.to_numpy()
+    if not all(numpy.issubdtype(t, numpy.integer) for t in dataset.dtypes) or \
+            (valori.size and (valori.min() < 0 or valori.max() > 255)):
+        raise ValueError("Il dataset deve contenere solo interi compresi tra 0 e 255: " + percorso_csv)
+    temporaneo = percorso_npy + ".%d.tmp" % os.getpid()
+    with open(temporaneo, "wb") as f:
+        numpy.save(f, numpy.asfortranarray(valori, dtype=numpy.uint8))
+    os.replace(temporaneo, percorso_npy)
+    metadati["colonne"] = list(dataset.columns)
+    fileDerivati.scrivi_metadati(percorso_npy, metadati)
+    return metadati
+
+# ==============================================================================
+# Funzione: _apri_dataset()
+# Restituisce il DataFrame del CSV letto dal file binario in memory mapping
+# (convertendolo se necessario), oppure dal CSV se il binario non è utilizzabile.
+# ==============================================================================
+def _apri_dataset(percorso_csv):
+    percorso_npy = percorso_binario(percorso_csv)
+    try:
+        metadati = fileDerivati.metadati_validi(percorso_csv, percorso_npy)
+        if metadati is None:
+            metadati = converti_dataset(percorso_csv, percorso_npy)
+        valori = numpy.load(percorso_npy, mmap_mode="r")
+        # Le colonne del DataFrame sono viste (in sola lettura) sul file mappato
+        return pandas.DataFrame(valori, columns=metadati["colonne"], copy=False)
+    except (OSError, ValueError) as e:
+        print("Dataset binario non disponibile, lettura del CSV:", e)
+    return pandas.read_csv(percorso_csv)
+
+# ==============================================================================
+# Funzione: carica_dataset()
+# Restituisce il DataFrame del dataset CSV indicato, caricato al più una volta
+# per processo e ricaricato solo se il CSV cambia. Il DataFrame è condiviso:
+# non va modificato.
+# ==============================================================================
+def carica_dataset(percorso_csv):
+    stato = os.stat(percorso_csv)
+    firma = (stato.st_mtime_ns, stato.st_size)
+    voce = _dataset_caricati.get(percorso_csv)
+    if voce is None or voce[0] != firma:
+        with _lock_dataset:
+            voce = _dataset_caricati.get(percorso_csv)
+            if voce is None or voce[0] != firma:
+                voce = _dataset_caricati[percorso_csv] = (firma, _apri_dataset(percorso_csv))
+    return voce[1]
@@ -0,0 +1,258 @@
+# ==============================================================================
+# discretizzazione.py
+#
+# Questo modulo è la versione vettoriale (numpy) delle conversioni usate dal
+# percorso interattivo e da calcoloConsiglio: da array di osservazioni meteo
+# grezze (temperatura in °C, vento in km/h o m/s, pioggia in mm/h, condizioni
+# o codici meteo di OpenWeatherMap) ricava in un solo passaggio:
+#
+# - il ramo ("freddo", "normale", "caldo"), come determina_ramo;
+# - gli indici 0-4 di temperatura, vento e pioggia usati come evidenze dalle
+#   reti bayesiane, come indice_temperatura_freddo/caldo, indice_vento e
+#   indice_pioggia.
+#
+# Le soglie predefinite sono quelle di calcoloConsiglio e possono essere
+# sostituite creando un Discretizzatore con soglie diverse.
+#
+# Uso da riga di comando (risposte JSON di OpenWeatherMap, una per riga):
+#   python -m src.ClassiSupporto.discretizzazione storico.jsonl --output evidenze.csv
+# ==============================================================================
+
+import argparse
+import csv
+import json
+import sys
+from collections import namedtuple
+
+import numpy
+
+from src.ClassiSupporto import calcoloConsiglio
+
+# Etichette dei codici restituiti (stesso ordine di indiceOntologia.TEMPERATURE e METEO)
+RAMI = ["freddo", "normale", "caldo"]
+METEO = ["nuvoloso", "scoperto", "rovesci"]
+FREDDO, NORMALE, CALDO = range(3)
+NUVOLOSO, SCOPERTO, ROVESCI = range(3)
+
+# Nomi delle evidenze delle reti per ramo, nell'ordine (temperatura, vento,
+# pioggia); corrispondono a calcoloConsiglio.evidenza_rete
+NOMI_EVIDENZE = {"freddo": ("Freddo", "Vento", "Pioggia"), "caldo": ("Attività", "Vento", "Pioggia")}
+
+# --------------------------------------------------------------------------
+# EvidenzeDiscrete: risultato della discretizzazione di N osservazioni (array).
+#   - ramo: codice del ramo (indice in RAMI)
+#   - meteo: codice delle condizioni meteo (indice in METEO)
+#   - indice_temperatura: indice 0-4 del ramo (0 per il ramo "normale")
+#   - indice_vento / indice_pioggia: indici 0-4
+#   - valida: False per le osservazioni con temperatura mancante (NaN), i cui
+#     valori non sono significativi
+# --------------------------------------------------------------------------
+EvidenzeDiscrete = namedtuple("EvidenzeDiscrete",
+                              ["ramo", "meteo", "indice_temperatura", "indice_vento", "indice_pioggia", "valida"])
+
+# ==============================================================================
+# Classe Discretizzatore
+# Conversione vettoriale di osservazioni grezze in rami e indici, con soglie
+# configurabili.
+# ==============================================================================
+class Discretizzatore:
+    def __init__(self, limite_caldo=calcoloConsiglio.LIMITE_CALDO, limite_freddo=calcoloConsiglio.LIMITE_FREDDO,
+                 pioggia_critica=calcoloConsiglio.PIOGGIA_CRITICA,
+                 soglie_temperatura_freddo=calcoloConsiglio.SOGLIE_TEMPERATURA_FREDDO,
+                 indici_temperatura_freddo=calcoloConsiglio.INDICI_TEMPERATURA_FREDDO,
+                 soglie_temperatura_caldo=calcoloConsiglio.SOGLIE_TEMPERATURA_CALDO,
+                 soglie_vento=calcoloConsiglio.SOGLIE_VENTO, soglie_pioggia=calcoloConsiglio.SOGLIE_PIOGGIA):
+        """
+        Crea il discretizzatore (soglie con lo stesso significato di quelle di
+        calcoloConsiglio):
+          - limite_caldo / limite_freddo: limiti (°C) dei rami caldo e freddo
+          - pioggia_critica: indice di pioggia che forza il ramo freddo
+          - soglie_temperatura_freddo / indici_temperatura_freddo: soglie crescenti
+            (temperatura < soglia) e indici corrispondenti, uno in più delle soglie
+          - soglie_temperatura_caldo: soglie crescenti (temperatura > soglia)
+          - soglie_vento (km/h) / soglie_pioggia (mm/h): soglie crescenti (valore <= soglia)
+        """
+        self.limite_caldo = limite_caldo
+        self.limite_freddo = limite_freddo
+        self.pioggia_critica = pioggia_critica
+        self.soglie_temperatura_freddo = numpy.asarray(soglie_temperatura_freddo, dtype=float)
+        self.indici_temperatura_freddo = numpy.asarray(indici_temperatura_freddo, dtype=numpy.int8)
+        self.soglie_temperatura_caldo = numpy.asarray(soglie_temperatura_caldo, dtype=float)
+        self.soglie_vento = numpy.asarray(soglie_vento, dtype=float)
+        self.soglie_pioggia = numpy.asarray(soglie_pioggia, dtype=float)
+        if len(self.indici_temperatura_freddo) != len(self.soglie_temperatura_freddo) + 1:
+            raise ValueError("indici_temperatura_freddo deve avere un elemento in più delle soglie")
+        for nome in ["soglie_temperatura_freddo", "soglie_temperatura_caldo", "soglie_vento", "soglie_pioggia"]:
+            if numpy.any(numpy.diff(getattr(self, nome)) <= 0):
+                raise ValueError(f"{nome} deve essere strettamente crescente")
+
+    # --------------------------------------------------------------------------
+    # Metodo codici_meteo: codici METEO da condizioni di OpenWeatherMap
+    # ("Clouds", "Clear", ... come in interpreta_meteo), da etichette italiane
+    # o da codici numerici delle condizioni (800 sereno, 801-804 nuvoloso).
+    # Tutte le altre condizioni valgono "rovesci".
+    # --------------------------------------------------------------------------
+    def codici_meteo(self, meteo):
+        meteo = numpy.asarray(meteo)
+        if numpy.issubdtype(meteo.dtype, numpy.number):
+            codici = numpy.full(meteo.shape, ROVESCI, dtype=numpy.int8)
+            codici[meteo == 800] = SCOPERTO
+            codici[(meteo >= 801) & (meteo <= 804)] = NUVOLOSO
+            return codici
+        # Le condizioni distinte sono poche: si converte una volta ciascuna
+        distinte, posizioni = numpy.unique(meteo.astype(str), return_inverse=True)
+        normalizzate = [valore.strip().lower() for valore in distinte]
+        codici_distinte = numpy.array([NUVOLOSO if valore in ("clouds", "nuvoloso") else
+                                       SCOPERTO if valore in ("clear", "scoperto") else ROVESCI
+                                       for valore in normalizzate], dtype=numpy.int8)
+        return codici_distinte[posizioni].reshape(meteo.shape)
+
+    # --------------------------------------------------------------------------
+    # Metodo indici_vento: indici 0-4 della velocità del vento, in km/h
+    # oppure in m/s (unita="m/s", come nelle risposte di OpenWeatherMap).
+    # --------------------------------------------------------------------------
+    def indici_vento(self, vento, unita="km/h"):
+        vento = numpy.asarray(vento, dtype=float)
+        if unita == "m/s":
+            vento = vento * 3.6
+        elif unita != "km/h":
+            raise ValueError("Unità del vento non valida: " + str(unita))
+        # right=True: vento <= soglia; i valori mancanti (NaN) vanno oltre l'ultima soglia
+        return numpy.digitize(vento, self.soglie_vento, right=True).astype(numpy.int8)
+
+    # --------------------------------------------------------------------------
+    # Metodo indici_pioggia: indici 0-4 dell'intensità della pioggia (mm/h);
+    # i valori mancanti (NaN) valgono "assenza".
+    # --------------------------------------------------------------------------
+    def indici_pioggia(self, pioggia):
+        pioggia = numpy.nan_to_num(numpy.asarray(pioggia, dtype=float), nan=0.0)
+        return numpy.digitize(pioggia, self.soglie_pioggia, right=True).astype(numpy.int8)
+
+    # --------------------------------------------------------------------------
+    # Metodo rami: codici RAMI come determina_ramo (sulla parte intera della
+    # temperatura), dati i codici meteo e gli indici di pioggia.
+    # --------------------------------------------------------------------------
+    def rami(self, temperatura, codici_meteo, indici_pioggia):
+        intera = numpy.trunc(numpy.asarray(temperatura, dtype=float))
+        critico = (numpy.asarray(codici_meteo) == ROVESCI) | (numpy.asarray(indici_pioggia) >= self.pioggia_critica)
+        rami = numpy.where(critico, FREDDO, NORMALE).astype(numpy.int8)
+        rami[intera < self.limite_freddo] = FREDDO
+        rami[intera > self.limite_caldo] = CALDO
+        return rami
+
+    # --------------------------------------------------------------------------
+    # Metodo indici_temperatura: indici 0-4 della temperatura per il ramo di
+    # ciascuna osservazione (come indice_temperatura_freddo/caldo; 0 per "normale").
+    # --------------------------------------------------------------------------
+    def indici_temperatura(self, temperatura, rami):
+        temperatura = numpy.asarray(temperatura, dtype=float)
+        # Freddo: numero di soglie <= temperatura, cioè la prima soglia superata
+        freddo = self.indici_temperatura_freddo[numpy.digitize(temperatura, self.soglie_temperatura_freddo)]
+        # Caldo: numero di soglie < temperatura
+        caldo = numpy.digitize(temperatura, self.soglie_temperatura_caldo, right=True).astype(numpy.int8)
+        return numpy.select([rami == FREDDO, rami == CALDO], [freddo, caldo], 0).astype(numpy.int8)
+
+    # --------------------------------------------------------------------------
+    # Metodo discretizza: converte N osservazioni in EvidenzeDiscrete.
+    #   - temperatura: °C
+    #   - vento: velocità del vento nell'unità "unita_vento" ("km/h" o "m/s")
+    #   - pioggia: mm/h (None: assente), oppure indici 0-4 con pioggia_indici=True
+    #   - meteo: condizioni o codici meteo (None: "scoperto")
+    # --------------------------------------------------------------------------
+    def discretizza(self, temperatura, vento, pioggia=None, meteo=None, unita_vento="km/h", pioggia_indici=False):
+        temperatura = numpy.asarray(temperatura, dtype=float)
+        forma = temperatura.shape
+        if meteo is None:
+            codici = numpy.full(forma, SCOPERTO, dtype=numpy.int8)
+        else:
+            codici = self.codici_meteo(meteo)
+        if pioggia is None:
+            indici_pioggia = numpy.zeros(forma, dtype=numpy.int8)
+        elif pioggia_indici:
+            indici_pioggia = numpy.asarray(pioggia).astype(numpy.int8)
+        else:
+            indici_pioggia = self.indici_pioggia(pioggia)
+        valida = ~numpy.isnan(temperatura)
+        temperatura = numpy.where(valida, temperatura, 0.0)
+        rami = self.rami(temperatura, codici, indici_pioggia)
+        return EvidenzeDiscrete(
+            ramo=rami,
+            meteo=codici,
+            indice_temperatura=self.indici_temperatura(temperatura, rami),
+            indice_vento=self.indici_vento(vento, unita_vento),
+            indice_pioggia=indici_pioggia,
+            valida=valida,
+        )
+
+# ==============================================================================
+# Funzione: evidenze_rete()
+# Restituisce le righe (array N x 3, colonne nell'ordine delle evidenze della
+# rete) e la maschera delle osservazioni valide del ramo indicato, pronte per
+# ReteCompilata.inferenza_batch.
+# ==============================================================================
+def evidenze_rete(evidenze, ramo, ordine_rete):
+    maschera = evidenze.valida & (evidenze.ramo == RAMI.index(ramo))
+    colonne = dict(zip(NOMI_EVIDENZE[ramo], [evidenze.indice_temperatura, evidenze.indice_vento,
+                                              evidenze.indice_pioggia]))
+    return numpy.column_stack([colonne[nome][maschera] for nome in ordine_rete]), maschera
+
+# ==============================================================================
+# Funzione: colonne_openweathermap()
+# Estrae da una sequenza di risposte JSON di OpenWeatherMap ("/weather") gli
+# array di istante, temperatura, vento (m/s), pioggia (mm/h) e codice meteo.
+# ==============================================================================
+def colonne_openweathermap(risposte):
+    risposte = list(risposte)
+    return {
+        "dt": numpy.array([r.get("dt", 0) for r in risposte], dtype=numpy.int64),
+        "temperatura": numpy.array([r.get("main", {}).get("temp", numpy.nan) for r in risposte], dtype=float),
+        "vento": numpy.array([r.get("wind", {}).get("speed", 0.0) for r in risposte], dtype=float),
+        "pioggia": numpy.array([r.get("rain", {}).get("1h", 0.0) for r in risposte], dtype=float),
+        "meteo": numpy.array([(r.get("weather") or [{}])[0].get("id", 0) for r in risposte], dtype=numpy.int64),
+    }
+
+# ==============================================================================
+# Funzione: discretizza_openweathermap()
+# Discretizza una sequenza di risposte JSON di OpenWeatherMap; restituisce le
+# colonne grezze e le EvidenzeDiscrete.
+# ==============================================================================
+def discretizza_openweathermap(risposte, discretizzatore=None):
+    discretizzatore = discretizzatore or Discretizzatore()
+    colonne = colonne_openweathermap(risposte)
+    evidenze = discretizzatore.discretizza(colonne["temperatura"], colonne["vento"], colonne["pioggia"],
+                                           colonne["meteo"], unita_vento="m/s")
+    return colonne, evidenze
+
+# ==============================================================================
+# Funzione: main()
+# Discretizza un archivio di risposte di OpenWeatherMap (JSON, una per riga,
+# oppure una lista JSON) e scrive le evidenze in CSV.
+# ==============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Discretizzazione di osservazioni meteo in evidenze")
+    parser.add_argument("file", help="risposte di OpenWeatherMap (JSONL o lista JSON)")
+    parser.add_argument("--output", help="file CSV delle evidenze (stdout se assente)")
+    argomenti = parser.parse_args(argv)
+    with open(argomenti.file, encoding="utf-8") as file:
+        testo = file.read()
+    if testo.lstrip().startswith("["):
+        risposte = json.loads(testo)
+    else:
+        risposte = [json.loads(riga) for riga in testo.splitlines() if riga.strip()]
+    colonne, evidenze = discretizza_openweathermap(risposte)
+
+    output = open(argomenti.output, "w", encoding="utf-8", newline="") if argomenti.output else sys.stdout
+    try:
+        scrittore = csv.writer(output)
+        scrittore.writerow(["dt", "ramo", "meteo", "indice_temperatura", "indice_vento", "indice_pioggia", "valida"])
+        etichette_rami = numpy.array(RAMI)[evidenze.ramo]
+        etichette_meteo = numpy.array(METEO)[evidenze.meteo]
+        scrittore.writerows(zip(colonne["dt"].tolist(), etichette_rami.tolist(), etichette_meteo.tolist(),
+                                evidenze.indice_temperatura.tolist(), evidenze.indice_vento.tolist(),
+                                evidenze.indice_pioggia.tolist(), evidenze.valida.astype(int).tolist()))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# ==============================================================================
+# fileDerivati.py
+#
+# Questo modulo contiene la regola di validità comune ai file derivati da un
+# file sorgente e salvati su disco per velocizzare gli avvii successivi (il
+# dataset binario di datasetBinario e lo snapshot SQLite di indiceOntologia).
+#
+# Accanto al file derivato è salvato un file di metadati (percorso del derivato
+# + ".json") con data di modifica, dimensione e hash SHA-256 del sorgente:
+#
+# - se data e dimensione del sorgente coincidono, il derivato è valido;
+# - se cambiano ma il contenuto (hash) è lo stesso, il derivato resta valido e
+#   i metadati vengono aggiornati;
+# - altrimenti il derivato va ricreato.
+# ==============================================================================
+
+import hashlib
+import json
+import os
+
+# ==============================================================================
+# Funzione: hash_file()
+# Calcola l'hash SHA-256 del contenuto di un file.
+# ==============================================================================
+def hash_file(percorso):
+    impronta = hashlib.sha256()
+    with open(percorso, "rb") as f:
+        for blocco in iter(lambda: f.read(1 << 20), b""):
+            impronta.update(blocco)
+    return impronta.hexdigest()
+
+# ==============================================================================
+# Funzione: metadati_sorgente()
+# Restituisce data di modifica, dimensione e hash del file sorgente, da salvare
+# (con eventuali altri campi) nei metadati del file derivato.
+# ==============================================================================
+def metadati_sorgente(percorso):
+    stato = os.stat(percorso)
+    return {"mtime_ns": stato.st_mtime_ns, "dimensione": stato.st_size, "sha256": hash_file(percorso)}
+
+# ==============================================================================
+# Funzione: scrivi_metadati()
+# Scrive in modo atomico i metadati del file derivato (percorso + ".json").
+# ==============================================================================
+def scrivi_metadati(percorso_derivato, metadati):
+    temporaneo = percorso_derivato + ".json.%d.tmp" % os.getpid()
+    with open(temporaneo, "w", encoding="utf-8") as f:
+        json.dump(metadati, f)
+    os.replace(temporaneo, percorso_derivato + ".json")
+
+# ==============================================================================
+# Funzione: metadati_validi()
+# Restituisce i metadati del file derivato se questo corrisponde al sorgente
+# attuale, altrimenti None. Se cambia solo la data di modifica ma non il
+# contenuto, il derivato resta valido e i metadati vengono aggiornati.
+# ==============================================================================
+def metadati_validi(percorso_sorgente, percorso_derivato):
+    try:
+        with open(percorso_derivato + ".json", encoding="utf-8") as f:
+            metadati = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(percorso_derivato):
+        return None
+    stato = os.stat(percorso_sorgente)
+    if metadati.get("mtime_ns") == stato.st_mtime_ns and metadati.get("dimensione") == stato.st_size:
+        return metadati
+    if metadati.get("sha256") != hash_file(percorso_sorgente):
+        return None
+    metadati.update(mtime_ns=stato.st_mtime_ns, dimensione=stato.st_size)
+    scrivi_metadati(percorso_derivato, metadati)
+    return metadati
@@ -0,0 +1,278 @@
+# ==============================================================================
+# grigliaRischio.py
+#
+# Questo modulo calcola in blocco la probabilità di rischio, P(Consiglio ∈ {3, 4})
+# in percentuale, sull'intera griglia delle evidenze delle due reti (ramo
+# freddo e caldo), con i parametri predefiniti e con quelli appresi dai dataset.
+#
+# Le griglie si ottengono direttamente dai tensori delle posteriori (vedi
+# posteriori.py): quelli predefiniti sono già compilati, quelli appresi sono
+# ricavati dai conteggi dei dataset con sole operazioni numpy, e vengono
+# ricalcolati quando un dataset cambia. Per ogni griglia sono riportati:
+#
+# - il rischio per ogni combinazione di indici di temperatura, vento e pioggia
+#   (0-4, oppure evidenza non osservata);
+# - le celle in allerta (rischio >= SOGLIA_ALLERTA) e la frontiera dell'allerta:
+#   le celle con un vicino (un indice di distanza) dall'altra parte della soglia
+#   e, per ogni variabile, lo stato minimo che porta in allerta date le altre due;
+# - la sensibilità del rischio a ciascuna variabile (rischio marginale per
+#   stato ed effetto medio e massimo dell'aumento di un indice).
+#
+# Uso:
+#   python -m src.ClassiSupporto.grigliaRischio --csv griglia.csv --json sintesi.json
+# ==============================================================================
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import numpy
+
+from src.ClassiSupporto import calcoloConsiglio
+from src.ReteBayesiana.posteriori import NON_OSSERVATO, STATI, conta_osservazioni, posteriori_da_conteggi
+
+# Rami con rete bayesiana, parametri delle reti e ruoli delle evidenze
+# (assi delle griglie, nell'ordine degli argomenti di evidenza_rete)
+RAMI_RETE = ["freddo", "caldo"]
+PARAMETRI = ["predefiniti", "appresi"]
+RUOLI = ["temperatura", "vento", "pioggia"]
+
+# Tensori delle posteriori appresi ((ramo, metodo) -> (firma del dataset, tensore))
+_posteriori_apprese = {}
+_lock_posteriori = threading.Lock()
+
+# --------------------------------------------------------------------------
+# GrigliaRischio: probabilità di rischio di una rete su tutte le evidenze.
+#   - ramo: "freddo" o "caldo"
+#   - parametri: "predefiniti" o "appresi"
+#   - evidenze: nomi delle evidenze della rete per ciascun ruolo (RUOLI)
+#   - rischio: array (6, 6, 6) con assi nell'ordine di RUOLI; l'indice
+#     NON_OSSERVATO indica un'evidenza marginalizzata
+# --------------------------------------------------------------------------
+GrigliaRischio = namedtuple("GrigliaRischio", ["ramo", "parametri", "evidenze", "rischio"])
+
+# ==============================================================================
+# Funzione: evidenze_per_ruolo()
+# Restituisce i nomi delle evidenze della rete del ramo nell'ordine di RUOLI.
+# ==============================================================================
+def evidenze_per_ruolo(ramo):
+    ruoli = calcoloConsiglio.evidenza_rete(ramo, *range(len(RUOLI)))
+    return [nome for nome, _ in sorted(ruoli.items(), key=lambda voce: voce[1])]
+
+# ==============================================================================
+# Funzione: rischio_da_posteriori()
+# Converte il tensore delle posteriori (assi nell'ordine delle evidenze della
+# rete) nella griglia del rischio in percentuale, con assi nell'ordine di RUOLI.
+# ==============================================================================
+def rischio_da_posteriori(posteriori, evidenze_rete, ramo):
+    assi = [list(evidenze_rete).index(nome) for nome in evidenze_per_ruolo(ramo)]
+    return ((posteriori[..., 3] + posteriori[..., 4]) * 100).transpose(assi)
+
+# ==============================================================================
+# Funzione: posteriori_apprese()
+# Restituisce il tensore delle posteriori della rete del ramo con i parametri
+# appresi dal dataset (stessi valori di rete_appresa). Il tensore è calcolato
+# dai conteggi del dataset e ricalcolato solo se il file del dataset cambia.
+# ==============================================================================
+def posteriori_apprese(ramo, metodo="bayes"):
+    from src.ClassiSupporto import datasetBinario
+    percorso = calcoloConsiglio.PERCORSI_DATASET[ramo]
+    stato = os.stat(percorso)
+    firma = (stato.st_mtime_ns, stato.st_size)
+    voce = _posteriori_apprese.get((ramo, metodo))
+    if voce is None or voce[0] != firma:
+        with _lock_posteriori:
+            voce = _posteriori_apprese.get((ramo, metodo))
+            if voce is None or voce[0] != firma:
+                evidenze = calcoloConsiglio.rete_compilata(ramo).Evidenze
+                conteggi = conta_osservazioni(datasetBinario.carica_dataset(percorso), evidenze + ['Consiglio'])
+                voce = _posteriori_apprese[(ramo, metodo)] = (firma, posteriori_da_conteggi(conteggi, metodo))
+    return voce[1]
+
+# ==============================================================================
+# Funzione: calcola_griglie()
+# Restituisce le GrigliaRischio di entrambi i rami, con i parametri predefiniti
+# e con quelli appresi dai dataset.
+# ==============================================================================
+def calcola_griglie(metodo="bayes"):
+    griglie = []
+    for ramo in RAMI_RETE:
+        rete = calcoloConsiglio.rete_compilata(ramo)
+        for parametri, posteriori in [("predefiniti", rete.posteriori), ("appresi", posteriori_apprese(ramo, metodo))]:
+            griglie.append(GrigliaRischio(ramo, parametri, evidenze_per_ruolo(ramo),
+                                          rischio_da_posteriori(posteriori, rete.Evidenze, ramo)))
+    return griglie
+
+# ==============================================================================
+# Funzione: frontiera_allerta()
+# Restituisce, sulla griglia delle evidenze tutte osservate (5x5x5), la maschera
+# delle celle in allerta e quella delle celle di frontiera (con almeno un vicino
+# lungo un asse dall'altra parte della soglia).
+# ==============================================================================
+def frontiera_allerta(rischio, soglia=calcoloConsiglio.SOGLIA_ALLERTA):
+    allerta = rischio[:NON_OSSERVATO, :NON_OSSERVATO, :NON_OSSERVATO] >= soglia
+    frontiera = numpy.zeros_like(allerta)
+    for asse in range(allerta.ndim):
+        cambio = numpy.diff(allerta, axis=asse)
+        prima = [slice(None)] * allerta.ndim
+        dopo = [slice(None)] * allerta.ndim
+        prima[asse], dopo[asse] = slice(None, -1), slice(1, None)
+        frontiera[tuple(prima)] |= cambio
+        frontiera[tuple(dopo)] |= cambio
+    return allerta, frontiera
+
+# ==============================================================================
+# Funzione: stato_minimo_allerta()
+# Per la variabile indicata (asse della griglia) restituisce la matrice 5x5,
+# indicizzata dalle altre due variabili, dello stato minimo che porta in
+# allerta (-1 se nessuno stato la raggiunge).
+# ==============================================================================
+def stato_minimo_allerta(allerta, asse):
+    allerta = numpy.moveaxis(allerta, asse, -1)
+    return numpy.where(allerta.any(axis=-1), allerta.argmax(axis=-1), -1)
+
+# ==============================================================================
+# Funzione: sensibilita()
+# Sensibilità del rischio a ciascuna variabile (punti percentuali):
+#   - rischio_marginale: rischio per ogni stato della variabile, con le altre
+#     evidenze non osservate;
+#   - escursione_marginale: differenza tra il massimo e il minimo del precedente;
+#   - effetto_medio / effetto_massimo: variazione media e massima (in valore
+#     assoluto) del rischio quando l'indice della variabile aumenta di uno,
+#     sulla griglia delle evidenze tutte osservate.
+# ==============================================================================
+def sensibilita(rischio):
+    completa = rischio[:NON_OSSERVATO, :NON_OSSERVATO, :NON_OSSERVATO]
+    risultato = {}
+    for asse, ruolo in enumerate(RUOLI):
+        posizione = [NON_OSSERVATO] * len(RUOLI)
+        posizione[asse] = slice(0, NON_OSSERVATO)
+        marginale = rischio[tuple(posizione)]
+        differenze = numpy.diff(completa, axis=asse)
+        risultato[ruolo] = {
+            "rischio_marginale": marginale.tolist(),
+            "escursione_marginale": float(marginale.max() - marginale.min()),
+            "effetto_medio": float(differenze.mean()),
+            "effetto_medio_assoluto": float(numpy.abs(differenze).mean()),
+            "effetto_massimo": float(numpy.abs(differenze).max()),
+        }
+    return risultato
+
+# ==============================================================================
+# Funzione: sintesi()
+# Restituisce il riepilogo (serializzabile in JSON) delle griglie: intervallo
+# del rischio, allerta, frontiera e sensibilità di ciascuna griglia.
+# ==============================================================================
+def sintesi(griglie, soglia=calcoloConsiglio.SOGLIA_ALLERTA):
+    voci = []
+    for griglia in griglie:
+        allerta, frontiera = frontiera_allerta(griglia.rischio, soglia)
+        completa = griglia.rischio[:NON_OSSERVATO, :NON_OSSERVATO, :NON_OSSERVATO]
+        voci.append({
+            "ramo": griglia.ramo,
+            "parametri": griglia.parametri,
+            "evidenze": dict(zip(RUOLI, griglia.evidenze)),
+            "rischio_senza_evidenze": float(griglia.rischio[(NON_OSSERVATO,) * len(RUOLI)]),
+            "rischio_minimo": float(completa.min()),
+            "rischio_massimo": float(completa.max()),
+            "celle_allerta": int(allerta.sum()),
+            "celle_frontiera": int(frontiera.sum()),
+            "stato_minimo_allerta": {ruolo: stato_minimo_allerta(allerta, asse).tolist()
+                                     for asse, ruolo in enumerate(RUOLI)},
+            "sensibilita": sensibilita(griglia.rischio),
+        })
+    return {"soglia_allerta": soglia, "celle": len(STATI) ** len(RUOLI), "griglie": voci}
+
+# ==============================================================================
+# Funzione: scrivi_csv()
+# Scrive una riga per ogni griglia e combinazione di evidenze (anche parziali:
+# le evidenze non osservate sono vuote). Allerta e frontiera sono indicate solo
+# per le combinazioni con tutte le evidenze osservate.
+# ==============================================================================
+def scrivi_csv(griglie, file, soglia=calcoloConsiglio.SOGLIA_ALLERTA):
+    scrittore = csv.writer(file)
+    scrittore.writerow(["ramo", "parametri", "evidenza_temperatura"] + RUOLI +
+                       ["osservate", "rischio", "allerta", "frontiera"])
+    for griglia in griglie:
+        allerta, frontiera = frontiera_allerta(griglia.rischio, soglia)
+        for indici in itertools.product(range(len(STATI) + 1), repeat=len(RUOLI)):
+            osservate = sum(indice != NON_OSSERVATO for indice in indici)
+            completa = osservate == len(RUOLI)
+            scrittore.writerow([griglia.ramo, griglia.parametri, griglia.evidenze[0]] +
+                               ["" if indice == NON_OSSERVATO else indice for indice in indici] +
+                               [osservate, round(float(griglia.rischio[indici]), 6),
+                                int(allerta[indici]) if completa else "",
+                                int(frontiera[indici]) if completa else ""])
+
+# ==============================================================================
+# Funzione: verifica_griglie()
+# Confronta le griglie con probabilita_rischio sulla rete data e sulla rete
+# appresa con bnlearn dal dataset del ramo (con il metodo delle griglie), per
+# tutte le evidenze osservate. Restituisce il numero di celle con differenze
+# oltre la tolleranza.
+# ==============================================================================
+def verifica_griglie(griglie, metodo="bayes", tolleranza=1e-9):
+    from src.ClassiSupporto import datasetBinario
+    from src.ReteBayesiana import retiBayesiane
+    differenze = 0
+    for griglia in griglie:
+        if griglia.parametri == "predefiniti":
+            rete = calcoloConsiglio.rete_compilata(griglia.ramo)
+        else:
+            rete = getattr(retiBayesiane, calcoloConsiglio.CLASSI_RETI[griglia.ramo])()
+            rete.impara_dataset(datasetBinario.carica_dataset(calcoloConsiglio.PERCORSI_DATASET[griglia.ramo]), metodo)
+        for t, v, p in itertools.product(STATI, repeat=len(RUOLI)):
+            atteso = calcoloConsiglio.probabilita_rischio(rete, calcoloConsiglio.evidenza_rete(griglia.ramo, t, v, p))
+            if abs(atteso - griglia.rischio[t, v, p]) > tolleranza:
+                differenze += 1
+    return differenze
+
+# ==============================================================================
+# Funzione: main()
+# Calcola le griglie e le esporta in CSV e/o JSON.
+# ==============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Griglia del rischio e sensibilità delle reti bayesiane")
+    parser.add_argument("--csv", help="file CSV con il rischio di ogni combinazione di evidenze")
+    parser.add_argument("--json", help="file JSON con allerta, frontiera e sensibilità di ogni griglia")
+    parser.add_argument("--soglia", type=float, default=calcoloConsiglio.SOGLIA_ALLERTA,
+                        help="soglia di allerta (percentuale)")
+    parser.add_argument("--metodo", choices=["bayes", "maximumlikelihood"], default="bayes",
+                        help="metodo di stima dei parametri appresi")
+    parser.add_argument("--verifica", action="store_true",
+                        help="confronta le griglie con l'inferenza delle reti (richiede bnlearn)")
+    argomenti = parser.parse_args(argv)
+
+    inizio = time.perf_counter()
+    griglie = calcola_griglie(argomenti.metodo)
+    riepilogo = sintesi(griglie, argomenti.soglia)
+    durata = (time.perf_counter() - inizio) * 1000
+    for voce in riepilogo["griglie"]:
+        print(f"{voce['ramo']:7s} {voce['parametri']:12s} rischio {voce['rischio_minimo']:6.2f}-"
+              f"{voce['rischio_massimo']:6.2f}%  allerta {voce['celle_allerta']:3d}/{riepilogo['celle']}  "
+              f"frontiera {voce['celle_frontiera']:3d}", file=sys.stderr)
+    print(f"Griglie calcolate in {durata:.1f} ms", file=sys.stderr)
+
+    if argomenti.csv:
+        with open(argomenti.csv, "w", encoding="utf-8", newline="") as file:
+            scrivi_csv(griglie, file, argomenti.soglia)
+    if argomenti.json:
+        with open(argomenti.json, "w", encoding="utf-8") as file:
+            json.dump(riepilogo, file, indent=2, ensure_ascii=False)
+    if not argomenti.csv and not argomenti.json:
+        json.dump(riepilogo, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    if argomenti.verifica:
+        differenze = verifica_griglie(griglie, argomenti.metodo)
+        print(f"Verifica: {differenze} celle diverse dall'inferenza delle reti", file=sys.stderr)
+        if differenze:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
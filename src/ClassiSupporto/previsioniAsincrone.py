@@ -0,0 +1,131 @@
+# ==============================================================================
+# previsioniAsincrone.py
+#
+# Questo modulo recupera le condizioni meteo di molte città in parallelo con
+# asyncio, ripetendo la sequenza geocodifica -> scarica_meteo -> interpreta_meteo
+# del percorso online:
+#
+# - le ricerche su Nominatim passano per previsioniMeteo.geocodifica, quindi per
+#   il limitatore di frequenza condiviso dal processo (al più una richiesta al
+#   secondo, come richiesto dal servizio) e per il raggruppamento delle ricerche
+#   contemporanee della stessa città;
+# - i nomi ripetuti (a meno di maiuscole, accenti e spazi) sono cercati una volta;
+# - le chiamate a OpenWeatherMap sono limitate da un semaforo separato;
+# - le città già presenti nella cache delle coordinate non consumano il limite;
+# - i risultati vengono restituiti man mano che sono pronti.
+#
+# Le funzioni di previsioniMeteo sono bloccanti e vengono eseguite in thread
+# (asyncio.to_thread), riusando client HTTP e cache condivisi.
+#
+# Uso da riga di comando (una città per riga, risultati in JSON, uno per riga):
+#   python -m src.ClassiSupporto.previsioniAsincrone citta.txt
+# ==============================================================================
+
+import argparse
+import asyncio
+import json
+import sys
+from collections import namedtuple
+
+from src.ClassiSupporto import cacheGeocoding, previsioniMeteo
+
+# --------------------------------------------------------------------------
+# EsitoCitta: risultato della ricerca per una città.
+#   - citta: nome indicato
+#   - coordinate: (lat, lon), oppure None se la città non è stata trovata
+#   - meteo: dizionario di interpreta_meteo, oppure None
+#   - errore: messaggio d'errore, oppure None
+# --------------------------------------------------------------------------
+EsitoCitta = namedtuple("EsitoCitta", ["citta", "coordinate", "meteo", "errore"])
+
+# Ricerche su Nominatim eseguite contemporaneamente in thread: il limite di
+# frequenza è comunque quello di previsioniMeteo.LIMITATORE_NOMINATIM
+RICERCHE_CONTEMPORANEE = 2
+
+# ==============================================================================
+# Funzione: geocodifica_async()
+# Geocodifica la città: le città già nella cache delle coordinate non occupano
+# thread; le altre passano per previsioniMeteo.geocodifica, che raggruppa le
+# ricerche contemporanee della stessa città e rispetta il limitatore condiviso.
+# ==============================================================================
+async def geocodifica_async(nome_citta, semaforo_geocoding, cache=None):
+    cache = cache if cache is not None else cacheGeocoding.cache_predefinita()
+    presente, coordinate = cache.leggi(nome_citta)
+    if presente:
+        return coordinate
+    async with semaforo_geocoding:
+        return await asyncio.to_thread(previsioniMeteo.geocodifica, nome_citta, cache)
+
+# ==============================================================================
+# Funzione: previsioni_citta_async()
+# Versione asincrona di previsioni_citta: restituisce un EsitoCitta, senza
+# propagare gli errori (riportati nel campo "errore").
+# ==============================================================================
+async def previsioni_citta_async(nome_citta, semaforo_geocoding, semaforo_meteo, api_key=previsioniMeteo.API_KEY):
+    try:
+        coordinate = await geocodifica_async(nome_citta, semaforo_geocoding)
+    except Exception as e:
+        return EsitoCitta(nome_citta, None, None, "Errore durante la ricerca della città: " + str(e))
+    if coordinate is None:
+        return EsitoCitta(nome_citta, None, None, "Città non trovata")
+    try:
+        async with semaforo_meteo:
+            data = await asyncio.to_thread(previsioniMeteo.scarica_meteo, coordinate[0], coordinate[1], api_key)
+        return EsitoCitta(nome_citta, coordinate, previsioniMeteo.interpreta_meteo(data), None)
+    except Exception as e:
+        return EsitoCitta(nome_citta, coordinate, None, "Errore nel recupero dei dati meteo online: " + str(e))
+
+# ==============================================================================
+# Funzione: previsioni_citta_multiple()
+# Generatore asincrono: avvia la ricerca di tutte le città e restituisce gli
+# EsitoCitta nell'ordine in cui vengono completati. I nomi con la stessa forma
+# normalizzata (ad esempio "Bari" e " bari ") sono cercati una sola volta e
+# ricevono lo stesso esito, ciascuno con il proprio nome.
+# ==============================================================================
+async def previsioni_citta_multiple(nomi_citta, api_key=previsioniMeteo.API_KEY, max_chiamate_meteo=8):
+    semaforo_geocoding = asyncio.Semaphore(RICERCHE_CONTEMPORANEE)
+    semaforo_meteo = asyncio.Semaphore(max_chiamate_meteo)
+    nomi_per_chiave = {}
+    for nome in nomi_citta:
+        nomi_per_chiave.setdefault(cacheGeocoding.normalizza_citta(nome), []).append(nome)
+    attivita = [asyncio.create_task(previsioni_citta_async(nomi[0], semaforo_geocoding, semaforo_meteo, api_key))
+                for nomi in nomi_per_chiave.values()]
+    try:
+        for completata in asyncio.as_completed(attivita):
+            esito = await completata
+            for nome in nomi_per_chiave[cacheGeocoding.normalizza_citta(esito.citta)]:
+                yield esito._replace(citta=nome)
+    finally:
+        # Se il chiamante interrompe l'iterazione, annulla le ricerche rimaste
+        for task in attivita:
+            task.cancel()
+
+# ==============================================================================
+# Funzione: _stampa_esiti()
+# Stampa un EsitoCitta in JSON per riga, man mano che le ricerche terminano.
+# ==============================================================================
+async def _stampa_esiti(nomi_citta, argomenti):
+    previsioniMeteo.LIMITATORE_NOMINATIM.imposta_frequenza(argomenti.richieste_al_secondo)
+    async for esito in previsioni_citta_multiple(nomi_citta, max_chiamate_meteo=argomenti.max_chiamate_meteo):
+        print(json.dumps(esito._asdict(), ensure_ascii=False), flush=True)
+
+# ==============================================================================
+# Funzione: main()
+# Legge i nomi delle città da un file (o da stdin) e ne stampa i risultati.
+# ==============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recupero parallelo del meteo di più città")
+    parser.add_argument("file", nargs="?", help="file con un nome di città per riga (stdin se assente)")
+    parser.add_argument("--richieste-al-secondo", type=float, default=1.0, help="limite delle ricerche su Nominatim (per l'intero processo)")
+    parser.add_argument("--max-chiamate-meteo", type=int, default=8, help="chiamate contemporanee a OpenWeatherMap")
+    argomenti = parser.parse_args(argv)
+    if argomenti.file:
+        with open(argomenti.file, encoding="utf-8") as file:
+            righe = file.read().splitlines()
+    else:
+        righe = sys.stdin.read().splitlines()
+    nomi_citta = [riga.strip() for riga in righe if riga.strip()]
+    asyncio.run(_stampa_esiti(nomi_citta, argomenti))
+
+if __name__ == "__main__":
+    main()
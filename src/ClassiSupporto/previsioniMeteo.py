@@ -0,0 +1,215 @@
+# ==============================================================================
+# previsioniMeteo.py
+#
+# Questo modulo recupera le condizioni meteo online senza interazione con
+# l'utente:
+#
+# 1. geocodifica: nome della città -> coordinate (servizio Nominatim);
+# 2. scarica_meteo: coordinate -> risposta JSON dell'API "/weather" di OpenWeatherMap;
+# 3. interpreta_meteo: risposta JSON -> fascia oraria, meteo, temperatura e vento.
+#
+# Le funzioni sono usate sia dall'interfaccia interattiva sia dal servizio HTTP.
+# Le chiamate a OpenWeatherMap passano per il client HTTP condiviso (clientHttp),
+# con connessioni riusate, timeout e nuovi tentativi limitati, e sono precedute
+# dalla cache delle rilevazioni per coordinate arrotondate (cacheMeteo).
+# Le ricerche su Nominatim sono precedute dalla cache persistente delle
+# coordinate delle città (cacheGeocoding).
+# Le richieste identiche contemporanee (stessa città, stesse coordinate) sono
+# raggruppate (coalescenza): ne parte una sola e tutti ne condividono l'esito.
+# Tutte le ricerche su Nominatim del processo passano per un unico limitatore
+# di frequenza (al più una richiesta al secondo, come richiesto dal servizio).
+# ==============================================================================
+
+import threading
+import time
+from datetime import datetime, timezone
+
+from src.ClassiSupporto import cacheGeocoding, cacheMeteo, clientHttp, coalescenza
+
+API_KEY = "2fbee3e1111e3bbc6482a8263d59d1e5" # API Key di openerathermap.org
+URL_METEO = "https://api.openweathermap.org/data/2.5/weather"
+
+_geolocator = None
+_lock_geolocator = threading.Lock()
+
+# Gruppi di richieste in corso verso Nominatim e OpenWeatherMap
+GRUPPO_GEOCODING = coalescenza.GruppoChiamate()
+GRUPPO_METEO = coalescenza.GruppoChiamate()
+
+# ==============================================================================
+# Classe LimitatoreFrequenza
+# Distanzia l'inizio delle operazioni di almeno "intervallo" secondi, anche
+# quando sono avviate da thread diversi.
+# ==============================================================================
+class LimitatoreFrequenza:
+    def __init__(self, richieste_al_secondo=1.0, orologio=time.monotonic):
+        """
+        Crea il limitatore:
+          - richieste_al_secondo: numero massimo di operazioni avviate al secondo
+          - orologio: funzione che restituisce l'istante attuale in secondi
+        """
+        self.intervallo = 1.0 / richieste_al_secondo
+        self.orologio = orologio
+        self._prossimo = 0.0
+        self._lock = threading.Lock()
+
+    # --------------------------------------------------------------------------
+    # Metodo imposta_frequenza: cambia il numero massimo di operazioni al secondo.
+    # --------------------------------------------------------------------------
+    def imposta_frequenza(self, richieste_al_secondo):
+        with self._lock:
+            self.intervallo = 1.0 / richieste_al_secondo
+
+    # --------------------------------------------------------------------------
+    # Metodo attendi: sospende il thread chiamante fino al prossimo turno
+    # disponibile (i turni sono assegnati nell'ordine delle richieste).
+    # --------------------------------------------------------------------------
+    def attendi(self):
+        with self._lock:
+            ora = self.orologio()
+            inizio = max(ora, self._prossimo)
+            self._prossimo = inizio + self.intervallo
+        if inizio > ora:
+            time.sleep(inizio - ora)
+
+# Limitatore condiviso da tutte le ricerche su Nominatim del processo
+LIMITATORE_NOMINATIM = LimitatoreFrequenza(1.0)
+
+# ==============================================================================
+# Funzione: geolocator()
+# Restituisce il geolocator Nominatim condiviso dal processo.
+# ==============================================================================
+def geolocator():
+    global _geolocator
+    if _geolocator is None:
+        from geopy.geocoders import Nominatim
+        with _lock_geolocator:
+            if _geolocator is None:
+                # Usa un user_agent personalizzato e un timeout per una ricerca affidabile
+                _geolocator = Nominatim(user_agent="ProgettoAcarrisi", timeout=10)
+    return _geolocator
+
+# ==============================================================================
+# Funzione: geocodifica()
+# Restituisce le coordinate (lat, lon) della città indicata, oppure None se la
+# città non viene trovata. Gli errori del servizio vengono propagati (e non
+# memorizzati). Con "cache" si può usare una cache diversa da quella condivisa,
+# oppure nessuna cache (usa_cache=False).
+# ==============================================================================
+def geocodifica(nome_citta, cache=None, usa_cache=True):
+    if usa_cache:
+        cache = cache if cache is not None else cacheGeocoding.cache_predefinita()
+        presente, coordinate = cache.leggi(nome_citta)
+        if presente:
+            return coordinate
+    # Le richieste contemporanee per la stessa città (nome normalizzato) sono raggruppate
+    chiave = (cacheGeocoding.normalizza_citta(nome_citta), usa_cache)
+    return GRUPPO_GEOCODING.esegui(chiave, _geocodifica_servizio, nome_citta, cache if usa_cache else None)
+
+# ==============================================================================
+# Funzione: _geocodifica_servizio()
+# Interroga Nominatim (nel rispetto di LIMITATORE_NOMINATIM) e memorizza
+# l'esito nella cache (se indicata).
+# ==============================================================================
+def _geocodifica_servizio(nome_citta, cache):
+    LIMITATORE_NOMINATIM.attendi()
+    address = geolocator().geocode(nome_citta)
+    coordinate = None if address is None else (address.latitude, address.longitude)
+    if cache is not None:
+        cache.scrivi(nome_citta, coordinate)
+    return coordinate
+
+# ==============================================================================
+# Funzione: scarica_meteo()
+# Interroga l'API "/weather" per le coordinate indicate e restituisce il JSON.
+# Solleva un'eccezione se la risposta non è valida o mancano i dati essenziali.
+# Con "client" e "url_base" si può usare un client diverso da quello condiviso
+# o un servizio sostitutivo (ad esempio un server locale di prova); con "cache"
+# una cache diversa da quella condivisa, oppure nessuna cache (usa_cache=False).
+# Il dizionario restituito può essere condiviso con altri chiamanti: non va modificato.
+# ==============================================================================
+def scarica_meteo(lat, lon, api_key=API_KEY, debug=False, client=None, url_base=None, cache=None, usa_cache=True):
+    if usa_cache:
+        cache = cache if cache is not None else cacheMeteo.cache_predefinita()
+        data = cache.leggi(lat, lon)
+        if data is not None:
+            if debug:
+                print("DEBUG: Dati meteo dalla cache ->", data)
+            return data
+        # Le richieste contemporanee per la stessa cella della griglia sono raggruppate
+        chiave = (cache.chiave(lat, lon), api_key, url_base)
+    else:
+        chiave = (lat, lon, api_key, url_base)
+    return GRUPPO_METEO.esegui(chiave, _scarica_meteo_servizio, lat, lon, api_key, debug, client, url_base,
+                               cache if usa_cache else None)
+
+# ==============================================================================
+# Funzione: _scarica_meteo_servizio()
+# Esegue la chiamata a OpenWeatherMap, ne valida la risposta e la memorizza
+# nella cache (se indicata).
+# ==============================================================================
+def _scarica_meteo_servizio(lat, lon, api_key, debug, client, url_base, cache):
+    client = client if client is not None else clientHttp.client_predefinito()
+    # Costruisce l'URL dell'API usando le coordinate e l'API key
+    url = f"{url_base or URL_METEO}?lat={lat}&lon={lon}&appid={api_key}&units=metric"
+    if debug:
+        print("DEBUG: URL chiamato ->", url)
+    response = client.get(url)
+    if debug:
+        print("DEBUG: Response status code ->", response.status_code)
+        print("DEBUG: Latenza (ms) ->", round(client.ultima_latenza() * 1000, 1))
+    if response.status_code != 200:
+        raise Exception("Errore HTTP: " + str(response.status_code))
+    data = response.json()
+    if debug:
+        print("DEBUG: JSON response ->", data)
+    # Controlla la presenza dei dati essenziali
+    if 'main' not in data or 'weather' not in data or 'temp' not in data['main']:
+        raise Exception("Dati meteo non disponibili per la posizione richiesta")
+    if cache is not None:
+        cache.scrivi(lat, lon, data)
+    return data
+
+# ==============================================================================
+# Funzione: interpreta_meteo()
+# Estrae dalla risposta dell'API le informazioni usate dal sistema:
+#   - ora: ora della rilevazione (stringa "HH", in UTC)
+#   - fascia: "mattina" o "sera"
+#   - meteo: "nuvoloso", "scoperto" o "rovesci"
+#   - temperatura: temperatura in gradi Celsius
+#   - vento: velocità del vento in km/h
+# ==============================================================================
+def interpreta_meteo(data):
+    # Estrae l'orario (usa UTC; se necessario, adattare con data['timezone'])
+    ora = datetime.fromtimestamp(data['dt'], timezone.utc).strftime('%H')
+    # Determina la fascia oraria
+    fascia = "sera" if int(ora) > 14 or int(ora) < 3 else "mattina"
+
+    # Estrae e mappa le condizioni meteo (da inglese a etichette italiane)
+    raw_meteo = data['weather'][0]['main']
+    if raw_meteo.lower() == "clouds":
+        meteo = "nuvoloso"
+    elif raw_meteo.lower() == "clear":
+        meteo = "scoperto"
+    else:
+        meteo = "rovesci"    # Mappa tutte le altre condizioni a "rovesci"
+
+    return {
+        "ora": ora,
+        "fascia": fascia,
+        "meteo": meteo,
+        "temperatura": data['main']['temp'],
+        # Converte la velocità del vento da m/s a km/h
+        "vento": data['wind']['speed'] * 3.6,
+    }
+
+# ==============================================================================
+# Funzione: previsioni_citta()
+# Geocodifica la città e ne interpreta le condizioni meteo attuali.
+# Restituisce None se la città non viene trovata.
+# ==============================================================================
+def previsioni_citta(nome_citta, api_key=API_KEY):
+    coordinate = geocodifica(nome_citta)
+    if coordinate is None:
+        return None
+    return interpreta_meteo(scarica_meteo(coordinate[0], coordinate[1], api_key))
@@ -0,0 +1,269 @@
+# ==============================================================================
+# tabellaConsigli.py
+#
+# Questo modulo precalcola l'intero spazio delle raccomandazioni in una tabella
+# decisionale compatta (file .npz) e risponde alle richieste leggendola, senza
+# caricare experta, bnlearn/pgmpy e owlready2.
+#
+# Gli ingressi di una raccomandazione hanno domini piccoli e discreti: attività
+# (3), accesso indoor (2), fascia (2), meteo (3), ramo di temperatura (3),
+# indici di temperatura, vento e pioggia (5 ciascuno) e rete scelta (2).
+# La tabella è composta da due parti indipendenti, calcolate con la logica
+# esistente (calcoloConsiglio e indiceOntologia):
+#
+# - rischio: probabilità di rischio (%) per ramo freddo/caldo, rete data/appresa
+#   e ogni combinazione di indici, con l'allerta valutata sulla rete data;
+# - risoluzioni: la Risoluzione dell'ontologia (fallback compresi) per ogni
+#   combinazione di attività, luogo, fascia, ramo e meteo.
+#
+# La tabella registra l'impronta dei file da cui è stata calcolata (dataset,
+# ontologia e sorgenti) e va ricompilata quando questi cambiano.
+#
+# Uso:
+#   python -m src.ClassiSupporto.tabellaConsigli --compila [--verifica]
+#   echo '{"attivita": "sportiva", "indoor": "no", "fascia": "sera", "meteo": "rovesci",
+#          "temperatura": 5, "vento": 30, "pioggia": 3}' | python -m src.ClassiSupporto.tabellaConsigli
+# ==============================================================================
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+
+import numpy
+
+from src.ClassiSupporto import calcoloConsiglio
+from src.Ontologia import indiceOntologia
+
+CARTELLA = os.path.dirname(os.path.abspath(__file__))
+PERCORSO_TABELLA = os.path.join(CARTELLA, "tabellaConsigli.npz")
+
+# Versione del formato del file
+VERSIONE = 1
+
+# Assi della parte "rischio": rami con rete bayesiana e reti selezionabili
+RAMI_RETE = ["freddo", "caldo"]
+RETI = ["1", "2"]
+INDICI = range(5)
+
+# File da cui dipende il contenuto della tabella
+SORGENTI = [
+    calcoloConsiglio.PERCORSI_DATASET["freddo"],
+    calcoloConsiglio.PERCORSI_DATASET["caldo"],
+    indiceOntologia.PERCORSO_ONTOLOGIA,
+    os.path.join(CARTELLA, "calcoloConsiglio.py"),
+    os.path.join(os.path.dirname(CARTELLA), "Ontologia", "indiceOntologia.py"),
+    os.path.join(os.path.dirname(CARTELLA), "ReteBayesiana", "retiBayesiane.py"),
+    os.path.join(os.path.dirname(CARTELLA), "ReteBayesiana", "posteriori.py"),
+]
+
+# ==============================================================================
+# Funzione: impronta_sorgenti()
+# Restituisce l'impronta sha256 dei file da cui dipende la tabella, oppure None
+# se qualcuno manca (ad esempio in un'installazione con la sola tabella).
+# ==============================================================================
+def impronta_sorgenti():
+    impronta = hashlib.sha256()
+    for percorso in SORGENTI:
+        try:
+            with open(percorso, "rb") as f:
+                impronta.update(f.read())
+        except OSError:
+            return None
+    return impronta.hexdigest()
+
+# ==============================================================================
+# Funzione: compila_tabella()
+# Enumera lo spazio delle raccomandazioni con la logica esistente e salva la
+# tabella (in modo atomico) nel percorso indicato. Restituisce la TabellaConsigli.
+# ==============================================================================
+def compila_tabella(percorso=PERCORSO_TABELLA):
+    rischio = numpy.empty((len(RAMI_RETE), len(RETI), 5, 5, 5))
+    for r, ramo in enumerate(RAMI_RETE):
+        reti = [calcoloConsiglio.rete_compilata(ramo), calcoloConsiglio.rete_appresa(ramo)]
+        for (n, rete), t, v, p in itertools.product(enumerate(reti), INDICI, INDICI, INDICI):
+            evidenza = calcoloConsiglio.evidenza_rete(ramo, t, v, p)
+            rischio[r, n, t, v, p] = calcoloConsiglio.probabilita_rischio(rete, evidenza)
+    # Come in calcola_consiglio, l'allerta è valutata sempre con la rete data
+    allerta = rischio[:, 0] >= calcoloConsiglio.SOGLIA_ALLERTA
+
+    indice = indiceOntologia.ottieni_indice()
+    domini = [indiceOntologia.ATTIVITA, indiceOntologia.LUOGHI, indiceOntologia.FASCE_ORARIE,
+              indiceOntologia.TEMPERATURE, indiceOntologia.METEO]
+    risoluzioni = []
+    for combinazione in itertools.product(*domini):
+        risoluzione = indice.risoluzioni[combinazione]
+        risoluzioni.append([risoluzione.chiave, risoluzione.luogo, risoluzione.avviso_rovesci,
+                            None if risoluzione.raccomandazione is None else list(risoluzione.raccomandazione)])
+
+    array = {
+        "versione": numpy.array(VERSIONE),
+        "impronta": numpy.array(impronta_sorgenti() or ""),
+        "soglia_allerta": numpy.array(calcoloConsiglio.SOGLIA_ALLERTA),
+        "rischio": rischio,
+        "allerta": allerta,
+        "domini": numpy.array(json.dumps(domini)),
+        "risoluzioni": numpy.array(json.dumps(risoluzioni, ensure_ascii=False)),
+    }
+    temporaneo = percorso + ".%d.tmp" % os.getpid()
+    with open(temporaneo, "wb") as f:
+        numpy.savez_compressed(f, **array)
+    os.replace(temporaneo, percorso)
+    return TabellaConsigli.carica(percorso)
+
+# ==============================================================================
+# Classe TabellaConsigli
+# Tabella decisionale caricata in memoria: risponde alle richieste con lo
+# stesso RisultatoConsiglio di calcoloConsiglio.calcola_consiglio.
+# ==============================================================================
+class TabellaConsigli:
+    def __init__(self, rischio, allerta, domini, risoluzioni, impronta=""):
+        """
+        Crea la tabella:
+          - rischio: array (ramo, rete, temperatura, vento, pioggia) delle probabilità
+          - allerta: array booleano (ramo, temperatura, vento, pioggia)
+          - domini: valori di attività, luogo, fascia, ramo e meteo
+          - risoluzioni: voci [chiave, luogo, avviso_rovesci, raccomandazione]
+            nell'ordine del prodotto dei domini
+          - impronta: impronta dei sorgenti al momento della compilazione
+        """
+        self.rischio = rischio
+        self.allerta = allerta
+        self.impronta = impronta
+        self.risoluzioni = {}
+        for combinazione, (chiave, luogo, avviso, raccomandazione) in zip(itertools.product(*domini), risoluzioni):
+            if raccomandazione is not None:
+                raccomandazione = indiceOntologia.Raccomandazione(*raccomandazione)
+            self.risoluzioni[combinazione] = indiceOntologia.Risoluzione(chiave, luogo, avviso, raccomandazione)
+
+    # --------------------------------------------------------------------------
+    # Metodo carica: legge la tabella dal file .npz.
+    # --------------------------------------------------------------------------
+    @classmethod
+    def carica(cls, percorso=PERCORSO_TABELLA):
+        with numpy.load(percorso, allow_pickle=False) as archivio:
+            if int(archivio["versione"]) != VERSIONE:
+                raise ValueError(f"Versione della tabella non supportata: {int(archivio['versione'])}")
+            if float(archivio["soglia_allerta"]) != calcoloConsiglio.SOGLIA_ALLERTA:
+                raise ValueError("La tabella è stata compilata con una soglia di allerta diversa")
+            return cls(archivio["rischio"], archivio["allerta"], json.loads(str(archivio["domini"])),
+                       json.loads(str(archivio["risoluzioni"])), str(archivio["impronta"]))
+
+    # --------------------------------------------------------------------------
+    # Metodo aggiornata: True se la tabella corrisponde ai sorgenti attuali,
+    # False se va ricompilata, None se i sorgenti non sono disponibili.
+    # --------------------------------------------------------------------------
+    def aggiornata(self):
+        impronta = impronta_sorgenti()
+        return None if impronta is None else impronta == self.impronta
+
+    # --------------------------------------------------------------------------
+    # Metodo _risolvi: Risoluzione della combinazione; per valori fuori dai
+    # domini nessun individuo corrisponde (come in IndiceOntologia._risolvi).
+    # --------------------------------------------------------------------------
+    def _risolvi(self, attivita, indoor, fascia, ramo, meteo):
+        luogo = "indoor" if indoor == "si" else "outdoor"
+        combinazione = (attivita.strip().lower(), luogo, fascia.strip().lower(), ramo, meteo)
+        risoluzione = self.risoluzioni.get(combinazione)
+        if risoluzione is None:
+            risoluzione = indiceOntologia.Risoluzione(indiceOntologia.componi_chiave(*combinazione), luogo, False, None)
+        return risoluzione
+
+    # --------------------------------------------------------------------------
+    # Metodo consiglio: calcola la raccomandazione per una RichiestaConsiglio (o
+    # un dizionario con gli stessi campi) leggendo la tabella.
+    # --------------------------------------------------------------------------
+    def consiglio(self, richiesta):
+        if isinstance(richiesta, dict):
+            richiesta = calcoloConsiglio.RichiestaConsiglio(**richiesta)
+        meteo = richiesta.meteo.strip().lower()
+        indoor = richiesta.indoor
+        if isinstance(indoor, bool):
+            indoor = "si" if indoor else "no"
+        indoor = indoor.strip().lower()
+
+        ramo = calcoloConsiglio.determina_ramo(richiesta.temperatura, meteo, richiesta.pioggia)
+        allerta = False
+        rischio = None
+        if ramo in RAMI_RETE:
+            if ramo == "freddo":
+                indice_temperatura = calcoloConsiglio.indice_temperatura_freddo(richiesta.temperatura)
+            else:
+                indice_temperatura = calcoloConsiglio.indice_temperatura_caldo(richiesta.temperatura)
+            vento = richiesta.indice_vento if richiesta.indice_vento is not None \
+                else calcoloConsiglio.indice_vento(richiesta.vento)
+            indici = (RAMI_RETE.index(ramo), indice_temperatura, int(vento), int(richiesta.pioggia))
+            for nome, valore in zip(["Vento", "Pioggia"], indici[2:]):
+                if valore not in INDICI:
+                    raise ValueError(f"Valore non valido per {nome}: {valore}")
+            allerta = bool(self.allerta[indici])
+            if allerta:
+                rete = 1 if str(richiesta.rete).strip() == "2" else 0
+                rischio = float(self.rischio[indici[0], rete, indici[1], indici[2], indici[3]])
+
+        return calcoloConsiglio.RisultatoConsiglio(
+            ramo=ramo,
+            allerta=allerta,
+            probabilita_rischio=rischio,
+            rischio_annullato=allerta and indoor == "si",
+            raccomandazione=self._risolvi(richiesta.attivita, indoor, richiesta.fascia, ramo, meteo),
+        )
+
+# ==============================================================================
+# Funzione: verifica_tabella()
+# Confronta la tabella con calcola_consiglio su tutte le combinazioni di scelte,
+# indici di vento e pioggia, reti e temperature intere nell'intervallo indicato.
+# Restituisce il numero di combinazioni confrontate e la lista delle differenze.
+# ==============================================================================
+def verifica_tabella(tabella, temperature=range(-10, 51)):
+    differenze = []
+    confrontate = 0
+    for combinazione in itertools.product(indiceOntologia.ATTIVITA, ["si", "no"], indiceOntologia.FASCE_ORARIE,
+                                          indiceOntologia.METEO, temperature, INDICI, INDICI, RETI):
+        richiesta = calcoloConsiglio.RichiestaConsiglio(*combinazione[:5], pioggia=combinazione[6],
+                                                        rete=combinazione[7], indice_vento=combinazione[5])
+        confrontate += 1
+        if tabella.consiglio(richiesta) != calcoloConsiglio.calcola_consiglio(richiesta):
+            differenze.append(richiesta)
+    return confrontate, differenze
+
+# ==============================================================================
+# Funzione: main()
+# Compila (ed eventualmente verifica) la tabella, oppure risponde alle richieste
+# JSON lette da stdin, una per riga, stampando i risultati in JSON.
+# ==============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tabella decisionale precalcolata delle raccomandazioni")
+    parser.add_argument("--tabella", default=PERCORSO_TABELLA, help="percorso del file della tabella")
+    parser.add_argument("--compila", action="store_true", help="ricalcola la tabella con la logica esistente")
+    parser.add_argument("--verifica", action="store_true", help="confronta la tabella con calcola_consiglio")
+    argomenti = parser.parse_args(argv)
+
+    if argomenti.compila:
+        compila_tabella(argomenti.tabella)
+        print("Tabella salvata in", argomenti.tabella, f"({os.path.getsize(argomenti.tabella)} byte)")
+    tabella = TabellaConsigli.carica(argomenti.tabella)
+    if argomenti.verifica:
+        confrontate, differenze = verifica_tabella(tabella)
+        print(f"Combinazioni confrontate -> {confrontate}  differenze -> {len(differenze)}")
+        for richiesta in differenze[:10]:
+            print("  ", richiesta)
+        if differenze:
+            sys.exit(1)
+    if argomenti.compila or argomenti.verifica:
+        return
+    if tabella.aggiornata() is False:
+        print("Attenzione: la tabella non corrisponde ai sorgenti attuali, ricompilarla con --compila",
+              file=sys.stderr)
+    for riga in sys.stdin:
+        if riga.strip():
+            risultato = tabella.consiglio(json.loads(riga))
+            corpo = dict(risultato._asdict(), raccomandazione=risultato.raccomandazione._asdict())
+            if risultato.raccomandazione.raccomandazione is not None:
+                corpo["raccomandazione"]["raccomandazione"] = risultato.raccomandazione.raccomandazione._asdict()
+            print(json.dumps(corpo, ensure_ascii=False), flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# ==============================================================================
+# indiceOntologia.py
+#
+# Questo modulo fornisce un servizio di accesso all'ontologia delle attività:
+#
+# - l'ontologia viene caricata una sola volta per processo;
+# - gli individui vengono indicizzati in un dizionario che associa il nome
+#   normalizzato alle raccomandazioni (principale, secondaria, alternativa,
+#   accessorio);
+# - la catena di fallback usata da stampa_risultato (luogo, meteo e temperatura)
+#   viene risolta in anticipo per tutte le combinazioni di scelte dell'utente,
+#   così che ogni ricerca sia un singolo accesso al dizionario.
+#
+# Per velocizzare gli avvii successivi, l'ontologia analizzata viene salvata in
+# un quadstore SQLite di owlready2 accanto al file OWL (ontologiaAttivita.sqlite3):
+# i processi successivi aprono lo snapshot invece di rileggere l'RDF/XML.
+# Lo snapshot viene ricreato automaticamente quando cambiano data di modifica
+# e contenuto (hash SHA-256) del file OWL (vedi fileDerivati).
+#
+# owlready2 viene importato solo per caricare l'ontologia: domini e tipi dei
+# risultati (ATTIVITA, Risoluzione, ...) sono utilizzabili anche senza di esso.
+# ==============================================================================
+
+import itertools
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+
+from src.ClassiSupporto import fileDerivati
+
+# --------------------------------------------------------------------------
+# Percorso dell'ontologia e domini delle scelte dell'utente
+# --------------------------------------------------------------------------
+PERCORSO_ONTOLOGIA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ontologiaAttivita.owl")
+PERCORSO_SNAPSHOT = os.path.splitext(PERCORSO_ONTOLOGIA)[0] + ".sqlite3"
+
+ATTIVITA = ["sportiva", "culturale", "ricreativa"]
+LUOGHI = ["indoor", "outdoor"]
+FASCE_ORARIE = ["mattina", "sera"]
+TEMPERATURE = ["freddo", "normale", "caldo"]
+METEO = ["nuvoloso", "scoperto", "rovesci"]
+
+# --------------------------------------------------------------------------
+# Raccomandazione: proprietà di un individuo dell'ontologia (None se assente).
+# Risoluzione: esito della ricerca di una combinazione di scelte dell'utente.
+#   - chiave: chiave costruita dopo l'eventuale fallback sul luogo
+#   - luogo: luogo usato per la ricerca ("indoor"/"outdoor")
+#   - avviso_rovesci: True se outdoor con rovesci è stato sostituito da indoor
+#   - raccomandazione: individuo trovato (anche tramite fallback) oppure None
+# --------------------------------------------------------------------------
+Raccomandazione = namedtuple("Raccomandazione", ["principale", "secondaria", "alternativa", "accessorio"])
+Risoluzione = namedtuple("Risoluzione", ["chiave", "luogo", "avviso_rovesci", "raccomandazione"])
+
+_indice = None
+_lock_indice = threading.Lock()
+
+# ==============================================================================
+# Funzione: _iri_file()
+# Restituisce l'IRI "file://" del percorso indicato.
+# ==============================================================================
+def _iri_file(percorso):
+    return "file://" + percorso.replace("\\", "/")
+
+# ==============================================================================
+# Funzione: _crea_snapshot()
+# Analizza il file OWL in un nuovo quadstore SQLite e lo sostituisce in modo
+# atomico allo snapshot precedente.
+# ==============================================================================
+def _crea_snapshot(percorso, percorso_snapshot):
+    from owlready2 import World
+    metadati = fileDerivati.metadati_sorgente(percorso)
+    temporaneo = percorso_snapshot + ".%d.tmp" % os.getpid()
+    if os.path.exists(temporaneo):
+        os.remove(temporaneo)
+    mondo = World(filename=temporaneo)
+    try:
+        onto = mondo.get_ontology(_iri_file(percorso)).load()
+        base_iri = onto.base_iri
+        mondo.save()
+    finally:
+        mondo.close()
+    os.replace(temporaneo, percorso_snapshot)
+    metadati["base_iri"] = base_iri
+    fileDerivati.scrivi_metadati(percorso_snapshot, metadati)
+    return metadati
+
+# ==============================================================================
+# Funzione: carica_ontologia()
+# Carica l'ontologia dallo snapshot SQLite (creandolo o ricreandolo se necessario).
+# Con percorso_snapshot=None, o se lo snapshot non può essere scritto né letto,
+# l'ontologia viene analizzata direttamente dal file OWL.
+# ==============================================================================
+def carica_ontologia(percorso=PERCORSO_ONTOLOGIA, percorso_snapshot=PERCORSO_SNAPSHOT):
+    from owlready2 import World, get_ontology
+    if percorso_snapshot is not None:
+        try:
+            metadati = fileDerivati.metadati_validi(percorso, percorso_snapshot)
+            if metadati is None:
+                metadati = _crea_snapshot(percorso, percorso_snapshot)
+            # In sola lettura: più caricamenti (anche da processi diversi) non si bloccano a vicenda
+            mondo = World(filename=percorso_snapshot, exclusive=False, read_only=True)
+            return mondo.get_ontology(metadati["base_iri"])
+        except (OSError, sqlite3.Error) as e:
+            print("Snapshot dell'ontologia non disponibile, analisi del file OWL:", e)
+    return get_ontology(_iri_file(percorso)).load()
+
+# ==============================================================================
+# Funzione: _prima_proprieta()
+# Restituisce il primo valore (ripulito dagli spazi) di una proprietà dell'individuo.
+# ==============================================================================
+def _prima_proprieta(individuo, proprieta):
+    valori = getattr(individuo, proprieta, None)
+    if valori is None or len(valori) == 0:
+        return None
+    return valori[0].strip()
+
+# ==============================================================================
+# Funzione: componi_chiave()
+# Costruisce il nome dell'individuo corrispondente ad una combinazione di scelte.
+# ==============================================================================
+def componi_chiave(attivita, luogo, fascia_oraria, temperatura, meteo):
+    return "attivita_" + attivita + "_" + luogo + "_" + fascia_oraria + "_" + temperatura + "_" + meteo
+
+# ==============================================================================
+# Classe IndiceOntologia
+# Indice in memoria (in sola lettura dopo la costruzione) degli individui
+# dell'ontologia e delle risoluzioni precalcolate.
+# ==============================================================================
+class IndiceOntologia:
+    def __init__(self, onto):
+        """
+        Costruisce l'indice a partire da un'ontologia già caricata:
+          - individui: nome normalizzato -> Raccomandazione
+          - risoluzioni: (attività, luogo, fascia, temperatura, meteo) -> Risoluzione
+        """
+        self.individui = {}
+        for ind in onto.individuals():
+            self.individui[ind.name.strip().lower()] = Raccomandazione(
+                principale=_prima_proprieta(ind, "haAttivitaPrincipale"),
+                secondaria=_prima_proprieta(ind, "haAttivitaSecondaria"),
+                alternativa=_prima_proprieta(ind, "haAttivitaAlternativa"),
+                accessorio=_prima_proprieta(ind, "haAccessorioConsigliato"),
+            )
+
+        # Risolve in anticipo la catena di fallback per tutte le combinazioni note
+        self.risoluzioni = {
+            combinazione: self._risolvi(*combinazione)
+            for combinazione in itertools.product(ATTIVITA, LUOGHI, FASCE_ORARIE, TEMPERATURE, METEO)
+        }
+
+    # --------------------------------------------------------------------------
+    # Metodo _risolvi: applica la stessa catena di fallback di stampa_risultato
+    # ai valori già normalizzati.
+    # --------------------------------------------------------------------------
+    def _risolvi(self, attivita, luogo, fascia_oraria, temperatura, meteo):
+        # Outdoor con rovesci: si ripiega su indoor con meteo nuvoloso
+        avviso_rovesci = luogo == "outdoor" and meteo == "rovesci"
+        if avviso_rovesci:
+            luogo, meteo = "indoor", "nuvoloso"
+
+        chiave = componi_chiave(attivita, luogo, fascia_oraria, temperatura, meteo)
+        individuo = self.individui.get(chiave)
+        if individuo is None and luogo == "indoor":
+            # 1. Prova a modificare il meteo (da 'rovesci' a 'nuvoloso')
+            alt_meteo = meteo
+            if alt_meteo == "rovesci":
+                alt_meteo = "nuvoloso"
+                individuo = self.individui.get(componi_chiave(attivita, luogo, fascia_oraria, temperatura, alt_meteo))
+            # 2. Prova a modificare la temperatura (da 'freddo' o 'caldo' a 'normale')
+            if individuo is None:
+                alt_temp = "normale" if temperatura in ["freddo", "caldo"] else temperatura
+                individuo = self.individui.get(componi_chiave(attivita, luogo, fascia_oraria, alt_temp, alt_meteo))
+        return Risoluzione(chiave, luogo, avviso_rovesci, individuo)
+
+    # --------------------------------------------------------------------------
+    # Metodo risolvi: normalizza le scelte dell'utente e restituisce la Risoluzione.
+    # Le combinazioni note sono risolte con un solo accesso al dizionario.
+    # --------------------------------------------------------------------------
+    def risolvi(self, attivita, accesso, fascia_oraria, temperatura, meteo):
+        combinazione = (
+            attivita.strip().lower(),
+            "indoor" if accesso.strip().lower() == "si" else "outdoor",
+            fascia_oraria.strip().lower(),
+            temperatura.strip().lower(),
+            meteo.strip().lower(),
+        )
+        risoluzione = self.risoluzioni.get(combinazione)
+        if risoluzione is None:
+            risoluzione = self._risolvi(*combinazione)
+        return risoluzione
+
+# ==============================================================================
+# Funzione: ottieni_indice()
+# Restituisce l'indice condiviso, caricando l'ontologia solo alla prima chiamata.
+# ==============================================================================
+def ottieni_indice():
+    global _indice
+    if _indice is None:
+        with _lock_indice:
+            if _indice is None:
+                _indice = IndiceOntologia(carica_ontologia())
+    return _indice
@@ -0,0 +1,276 @@
+# ==============================================================================
+# alberoGiunzione.py
+#
+# Questo modulo contiene l'inferenza esatta su reti bayesiane discrete tramite
+# albero di giunzione (junction tree), usando solo numpy.
+#
+# La rete (stati delle variabili e CPD) viene compilata una sola volta:
+#
+# - grafo morale e triangolazione con l'euristica "min-fill";
+# - cricche massimali collegate in un albero di giunzione (albero di copertura
+#   di peso massimo sulle dimensioni dei separatori);
+# - potenziali delle cricche, prodotto dei CPD assegnati a ciascuna cricca.
+#
+# Un'interrogazione con evidenze anche parziali calcola solo i messaggi verso la
+# cricca della variabile richiesta. Ogni messaggio dipende soltanto dalle
+# evidenze della parte dell'albero da cui proviene ed è memorizzato con questa
+# chiave: le interrogazioni successive ricalcolano solo i messaggi interessati
+# da evidenze nuove. Senza evidenze, tutti i messaggi sono riusati.
+# ==============================================================================
+
+import itertools
+
+import numpy
+
+# Numero massimo di messaggi memorizzati (superato il limite la cache viene svuotata)
+DIMENSIONE_CACHE_MESSAGGI = 8192
+
+# --------------------------------------------------------------------------
+# Funzione _einsum: numpy.einsum in forma a liste di indici, con gli
+# identificativi delle variabili rinumerati (einsum ne accetta al più 52).
+# --------------------------------------------------------------------------
+def _einsum(operandi, uscita):
+    locali = {}
+    argomenti = []
+    for tabella, indici in operandi:
+        argomenti += [tabella, [locali.setdefault(i, len(locali)) for i in indici]]
+    return numpy.einsum(*argomenti, [locali.setdefault(i, len(locali)) for i in uscita])
+
+# --------------------------------------------------------------------------
+# Funzione _normalizza: divide la tabella per la sua somma; una tabella nulla
+# indica evidenze di probabilità nulla, per cui la distribuzione a posteriori
+# non è definita (ValueError).
+# --------------------------------------------------------------------------
+def _normalizza(tabella, evidenze):
+    totale = tabella.sum()
+    if totale > 0:
+        return tabella / totale
+    raise ValueError("Evidenze impossibili per la rete: " +
+                     ", ".join(f"{variabile}={valore}" for variabile, valore in evidenze.items()))
+
+# ==============================================================================
+# Classe AlberoGiunzione
+# Rete bayesiana discreta compilata in un albero di giunzione.
+# ==============================================================================
+class AlberoGiunzione:
+    def __init__(self, stati, cpd):
+        """
+        Compila la rete:
+          - stati: dizionario variabile -> lista dei suoi stati
+          - cpd: dizionario variabile -> (genitori, tabella), con la tabella
+            (array numpy) di assi genitori..., variabile, normalizzata
+            sull'ultimo asse
+        """
+        self.stati = {variabile: list(valori) for variabile, valori in stati.items()}
+        self.cpd = {}
+        for variabile in self.stati:
+            if variabile not in cpd:
+                raise ValueError("CPD mancante per la variabile " + variabile)
+            genitori, tabella = cpd[variabile]
+            genitori = tuple(genitori)
+            tabella = numpy.asarray(tabella, dtype=float)
+            sconosciuti = [g for g in genitori if g not in self.stati]
+            if sconosciuti:
+                raise ValueError(f"Genitori di {variabile} non presenti nella rete: {', '.join(sconosciuti)}")
+            forma = tuple(len(self.stati[v]) for v in genitori + (variabile,))
+            if tabella.shape != forma:
+                raise ValueError(f"Forma del CPD di {variabile} non valida: {tabella.shape} invece di {forma}")
+            if not numpy.allclose(tabella.sum(axis=-1), 1):
+                raise ValueError(f"Il CPD di {variabile} non è normalizzato")
+            tabella.setflags(write=False)
+            self.cpd[variabile] = (genitori, tabella)
+        self.variabili = self._ordine_topologico()
+        self._messaggi = {}
+        self._compila()
+
+    # --------------------------------------------------------------------------
+    # Metodo _ordine_topologico: ordina le variabili dai genitori ai figli,
+    # verificando che il grafo sia aciclico.
+    # --------------------------------------------------------------------------
+    def _ordine_topologico(self):
+        ordine, visitate = [], set()
+        mancanti = dict((v, set(self.cpd[v][0])) for v in self.stati)
+        while mancanti:
+            pronte = [v for v, genitori in mancanti.items() if genitori <= visitate]
+            if not pronte:
+                raise ValueError("Il grafo della rete contiene un ciclo: " + ", ".join(sorted(mancanti)))
+            for variabile in pronte:
+                ordine.append(variabile)
+                visitate.add(variabile)
+                del mancanti[variabile]
+        return ordine
+
+    # --------------------------------------------------------------------------
+    # Metodo _compila: costruisce cricche, albero di giunzione e potenziali.
+    # --------------------------------------------------------------------------
+    def _compila(self):
+        cardinalita = {v: len(self.stati[v]) for v in self.variabili}
+
+        # Grafo morale: ogni variabile è collegata ai genitori, i genitori tra loro
+        vicini = {v: set() for v in self.variabili}
+        for variabile, (genitori, _) in self.cpd.items():
+            for a, b in itertools.combinations(genitori + (variabile,), 2):
+                vicini[a].add(b)
+                vicini[b].add(a)
+
+        # Triangolazione per eliminazione (min-fill, a parità il prodotto minore delle cardinalità)
+        def costo(v):
+            riempimento = sum(1 for a, b in itertools.combinations(vicini[v], 2) if b not in vicini[a])
+            return riempimento, numpy.prod([cardinalita[u] for u in vicini[v] | {v}])
+
+        candidate = []
+        rimanenti = set(self.variabili)
+        while rimanenti:
+            variabile = min(sorted(rimanenti, key=self.variabili.index), key=costo)
+            cricca = frozenset(vicini[variabile] | {variabile})
+            for a, b in itertools.combinations(vicini[variabile], 2):
+                vicini[a].add(b)
+                vicini[b].add(a)
+            for u in vicini[variabile]:
+                vicini[u].discard(variabile)
+            del vicini[variabile]
+            rimanenti.discard(variabile)
+            if not any(cricca <= altra for altra in candidate):
+                candidate = [altra for altra in candidate if not altra < cricca] + [cricca]
+
+        # Variabili di ciascuna cricca nell'ordine topologico (assi dei potenziali)
+        self.cricche = [tuple(v for v in self.variabili if v in cricca) for cricca in candidate]
+
+        # Albero di copertura di peso massimo (Kruskal) sulle dimensioni dei separatori
+        archi = sorted(((len(set(a) & set(b)), -i, -j) for (i, a), (j, b)
+                        in itertools.combinations(enumerate(self.cricche), 2)), reverse=True)
+        componente = list(range(len(self.cricche)))
+
+        def radice(i):
+            while componente[i] != i:
+                i = componente[i]
+            return i
+        self.adiacenti = [[] for _ in self.cricche]
+        for _, i, j in archi:
+            i, j = -i, -j
+            if radice(i) != radice(j):
+                componente[radice(i)] = radice(j)
+                self.adiacenti[i].append(j)
+                self.adiacenti[j].append(i)
+        self.separatori = {}
+        for i, adiacenti in enumerate(self.adiacenti):
+            for j in adiacenti:
+                self.separatori[i, j] = tuple(v for v in self.cricche[i] if v in self.cricche[j])
+
+        # Ogni CPD (e ogni evidenza sulla variabile) è assegnato alla cricca più
+        # piccola che ne contiene la famiglia
+        def dimensione(i):
+            return numpy.prod([cardinalita[v] for v in self.cricche[i]])
+        self.cricca_variabile = {}
+        assegnati = [[] for _ in self.cricche]
+        for variabile in self.variabili:
+            famiglia = set(self.cpd[variabile][0]) | {variabile}
+            cricca = min((i for i, c in enumerate(self.cricche) if famiglia <= set(c)), key=dimensione)
+            self.cricca_variabile[variabile] = cricca
+            assegnati[cricca].append(variabile)
+
+        self.potenziali = []
+        for cricca, variabili in zip(self.cricche, assegnati):
+            operandi = [(numpy.ones([cardinalita[v] for v in cricca]), cricca)]
+            operandi += [(self.cpd[v][1], self.cpd[v][0] + (v,)) for v in variabili]
+            potenziale = _einsum(operandi, cricca)
+            potenziale.setflags(write=False)
+            self.potenziali.append(potenziale)
+
+        # Variabili assegnate alla parte dell'albero da cui parte ciascun messaggio
+        self._provenienza = {}
+        for i, j in self.separatori:
+            parte, da_visitare = set(), [i]
+            visitate = {i, j}
+            while da_visitare:
+                k = da_visitare.pop()
+                parte.update(assegnati[k])
+                for vicino in self.adiacenti[k]:
+                    if vicino not in visitate:
+                        visitate.add(vicino)
+                        da_visitare.append(vicino)
+            self._provenienza[i, j] = frozenset(parte)
+
+    # --------------------------------------------------------------------------
+    # Metodo indice_stato: posizione del valore tra gli stati della variabile;
+    # per stati non numerici è accettata anche la posizione stessa. I booleani
+    # non sono accettati (True e False varrebbero come 1 e 0).
+    # --------------------------------------------------------------------------
+    def indice_stato(self, variabile, valore):
+        if variabile not in self.stati:
+            raise ValueError("Variabile non presente nella rete: " + str(variabile))
+        if isinstance(valore, (bool, numpy.bool_)):
+            raise ValueError(f"Valore non valido per {variabile}: {valore}")
+        stati = self.stati[variabile]
+        if isinstance(valore, str):
+            valore = valore.strip().lower()
+        if valore in stati:
+            return stati.index(valore)
+        if isinstance(valore, (int, numpy.integer)) and 0 <= valore < len(stati):
+            return int(valore)
+        raise ValueError(f"Valore non valido per {variabile}: {valore}")
+
+    # --------------------------------------------------------------------------
+    # Metodo _evidenze_cricca: operandi einsum (indicatori) per le evidenze
+    # assegnate alla cricca.
+    # --------------------------------------------------------------------------
+    def _evidenze_cricca(self, cricca, evidenze):
+        operandi = []
+        for variabile, indice in evidenze.items():
+            if self.cricca_variabile[variabile] == cricca:
+                indicatore = numpy.zeros(len(self.stati[variabile]))
+                indicatore[indice] = 1.0
+                operandi.append((indicatore, (variabile,)))
+        return operandi
+
+    # --------------------------------------------------------------------------
+    # Metodo _messaggio: messaggio (normalizzato) dalla cricca i alla cricca j,
+    # memorizzato con le sole evidenze della parte dell'albero di i.
+    # --------------------------------------------------------------------------
+    def _messaggio(self, i, j, evidenze):
+        provenienza = self._provenienza[i, j]
+        chiave = (i, j, tuple(sorted((v, s) for v, s in evidenze.items() if v in provenienza)))
+        messaggio = self._messaggi.get(chiave)
+        if messaggio is None:
+            operandi = [(self.potenziali[i], self.cricche[i])]
+            operandi += [(self._messaggio(k, i, evidenze), self.separatori[k, i]) for k in self.adiacenti[i] if k != j]
+            operandi += self._evidenze_cricca(i, evidenze)
+            messaggio = _einsum(operandi, self.separatori[i, j])
+            # Scala il messaggio (solo per la stabilità numerica): un messaggio
+            # nullo resta tale, così che le evidenze impossibili siano riconosciute
+            totale = messaggio.sum()
+            if totale > 0:
+                messaggio = messaggio / totale
+            messaggio.setflags(write=False)
+            if len(self._messaggi) >= DIMENSIONE_CACHE_MESSAGGI:
+                self._messaggi.clear()
+            self._messaggi[chiave] = messaggio
+        return messaggio
+
+    # --------------------------------------------------------------------------
+    # Metodo interroga: distribuzione a posteriori della variabile (array nello
+    # stesso ordine dei suoi stati) dato il dizionario di evidenze; le variabili
+    # assenti (o con valore None) sono marginalizzate. Solleva ValueError se le
+    # evidenze hanno probabilità nulla.
+    # --------------------------------------------------------------------------
+    def interroga(self, variabile, evidenze=None):
+        if variabile not in self.stati:
+            raise ValueError("Variabile non presente nella rete: " + str(variabile))
+        osservate = {v: valore for v, valore in (evidenze or {}).items() if valore is not None}
+        evidenze = {v: self.indice_stato(v, valore) for v, valore in osservate.items()}
+        cricca = self.cricca_variabile[variabile]
+        operandi = [(self.potenziali[cricca], self.cricche[cricca])]
+        operandi += [(self._messaggio(k, cricca, evidenze), self.separatori[k, cricca]) for k in self.adiacenti[cricca]]
+        operandi += self._evidenze_cricca(cricca, evidenze)
+        return _normalizza(_einsum(operandi, (variabile,)), osservate)
+
+    # --------------------------------------------------------------------------
+    # Metodo con_variabile: restituisce una nuova rete (della stessa classe) con
+    # la variabile aggiunta, oppure con il suo CPD sostituito.
+    # --------------------------------------------------------------------------
+    def con_variabile(self, variabile, stati, genitori, tabella):
+        nuovi_stati = dict(self.stati)
+        nuovi_stati[variabile] = list(stati)
+        cpd = dict(self.cpd)
+        cpd[variabile] = (tuple(genitori), tabella)
+        return type(self)(nuovi_stati, cpd)
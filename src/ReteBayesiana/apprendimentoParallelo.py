@@ -0,0 +1,126 @@
+# ==============================================================================
+# apprendimentoParallelo.py
+#
+# Questo modulo apprende i parametri delle reti bayesiane da dataset nel formato
+# di dataset_consulente_*_ottimale.csv troppo grandi per essere caricati in
+# memoria, eventualmente suddivisi in più file (shard):
+#
+# 1. ogni file viene diviso in intervalli di byte allineati all'inizio di una riga;
+# 2. ogni intervallo viene letto a blocchi di dimensione fissa da un processo del
+#    pool, che ne conta le righe nel tensore 5x5x5x5 (evidenze + "Consiglio");
+# 3. i tensori dei conteggi vengono sommati e trasformati in CPD con la stessa
+#    regola di impara_dataset (vedi retiBayesiane.cpd_da_conteggi).
+#
+# La memoria usata da ogni processo dipende solo dalla dimensione del blocco,
+# non dal numero di righe.
+# ==============================================================================
+
+import glob
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+import pandas
+
+from src.ReteBayesiana import retiBayesiane
+
+# Dimensione (in byte) dei blocchi letti da ciascun processo
+DIMENSIONE_BLOCCO = 8 * 1024 * 1024
+
+# ==============================================================================
+# Funzione: espandi_percorsi()
+# Restituisce l'elenco ordinato dei file indicati da un percorso, da uno schema
+# (ad esempio "log/feedback_*.csv") o da una lista di percorsi e schemi.
+# ==============================================================================
+def espandi_percorsi(percorsi):
+    if isinstance(percorsi, (str, os.PathLike)):
+        percorsi = [percorsi]
+    file = []
+    for percorso in percorsi:
+        trovati = sorted(glob.glob(os.fspath(percorso)))
+        if not trovati:
+            raise FileNotFoundError("Nessun file trovato per: " + os.fspath(percorso))
+        file.extend(trovati)
+    return file
+
+# ==============================================================================
+# Funzione: dividi_file()
+# Divide il file in al più "parti" intervalli [inizio, fine) di byte, ciascuno
+# allineato all'inizio di una riga; il primo comincia dopo l'intestazione.
+# Restituisce (intestazione, intervalli).
+# ==============================================================================
+def dividi_file(percorso, parti):
+    dimensione = os.path.getsize(percorso)
+    with open(percorso, "rb") as file:
+        intestazione = file.readline().decode("utf-8-sig").strip().split(",")
+        confini = [file.tell()]
+        for i in range(1, parti):
+            file.seek(max(confini[-1], dimensione * i // parti))
+            file.readline()
+            if file.tell() >= dimensione:
+                break
+            if file.tell() > confini[-1]:
+                confini.append(file.tell())
+    confini.append(dimensione)
+    return intestazione, [(inizio, fine) for inizio, fine in zip(confini, confini[1:]) if fine > inizio]
+
+# ==============================================================================
+# Funzione: conta_intervallo()
+# Conta le righe del file comprese nell'intervallo di byte indicato, leggendole
+# a blocchi. "colonne" sono le posizioni delle variabili nell'intestazione.
+# Eseguita nei processi del pool.
+# ==============================================================================
+def conta_intervallo(percorso, inizio, fine, colonne, dimensione_blocco=DIMENSIONE_BLOCCO):
+    conteggi = numpy.zeros([len(retiBayesiane.STATI)] * len(colonne))
+    with open(percorso, "rb") as file:
+        file.seek(inizio)
+        while file.tell() < fine:
+            blocco = file.read(min(dimensione_blocco, fine - file.tell()))
+            if file.tell() < fine and not blocco.endswith(b"\n"):
+                # Completa l'ultima riga del blocco (il confine è a inizio riga)
+                blocco += file.readline()
+            if not blocco.strip():
+                continue
+            righe = pandas.read_csv(io.BytesIO(blocco), header=None, usecols=colonne,
+                                    dtype="int64", skip_blank_lines=True)
+            conteggi += retiBayesiane.conta_osservazioni(righe[colonne].to_numpy(), colonne)
+    return conteggi
+
+# ==============================================================================
+# Funzione: conta_file()
+# Restituisce il tensore dei conteggi delle variabili indicate su tutti i file,
+# distribuendo gli intervalli tra "processi" processi (None: uno per CPU).
+# ==============================================================================
+def conta_file(percorsi, variabili, processi=None, dimensione_blocco=DIMENSIONE_BLOCCO):
+    processi = processi or os.cpu_count() or 1
+    compiti = []
+    for percorso in espandi_percorsi(percorsi):
+        # Almeno un blocco per intervallo, al più un intervallo per processo
+        parti = max(1, min(processi, os.path.getsize(percorso) // dimensione_blocco + 1))
+        intestazione, intervalli = dividi_file(percorso, parti)
+        mancanti = [v for v in variabili if v not in intestazione]
+        if mancanti:
+            raise ValueError(f"Colonne mancanti in {percorso}: {', '.join(mancanti)}")
+        colonne = [intestazione.index(v) for v in variabili]
+        compiti.extend((percorso, inizio, fine, colonne) for inizio, fine in intervalli)
+
+    conteggi = numpy.zeros([len(retiBayesiane.STATI)] * len(variabili))
+    if processi == 1 or len(compiti) == 1:
+        for compito in compiti:
+            conteggi += conta_intervallo(*compito, dimensione_blocco)
+        return conteggi
+    with ProcessPoolExecutor(max_workers=min(processi, len(compiti))) as pool:
+        futuri = [pool.submit(conta_intervallo, *compito, dimensione_blocco) for compito in compiti]
+        for futuro in futuri:
+            conteggi += futuro.result()
+    return conteggi
+
+# ==============================================================================
+# Funzione: impara_file()
+# Apprende i parametri della rete dai file indicati (vedi conta_file) con il
+# metodo indicato ("bayes" o "maximumlikelihood").
+# ==============================================================================
+def impara_file(rete, percorsi, metodo="bayes", processi=None, dimensione_blocco=DIMENSIONE_BLOCCO):
+    conteggi = conta_file(percorsi, list(rete.Evidenze) + ['Consiglio'], processi, dimensione_blocco)
+    retiBayesiane.imposta_conteggi(rete, conteggi, metodo)
@@ -0,0 +1,317 @@
+# ==============================================================================
+# posteriori.py
+#
+# Questo modulo contiene la parte delle reti bayesiane che usa solo numpy:
+#
+# - compilazione di una rete in un tensore delle distribuzioni a posteriori di
+#   "Consiglio" per ogni combinazione di evidenze (anche parziali);
+# - interrogazione del tensore, per un dizionario di evidenze o per N righe;
+# - stima dei parametri dai conteggi delle osservazioni e compilazione diretta
+#   del tensore dai conteggi (posteriori_da_conteggi);
+# - ReteCompilata, una rete ridotta al solo tensore (e alle tabelle dei CPD),
+#   con la stessa interfaccia di inferenza delle classi di retiBayesiane;
+# - i tensori e le tabelle dei CPD delle reti con i CPD predefiniti, salvati su
+#   disco (posterioriPredefinite.npz) e ricalcolati solo quando cambiano i sorgenti.
+#
+# Il percorso di inferenza con le reti predefinite non richiede quindi di
+# importare bnlearn, pgmpy e pandas.
+# ==============================================================================
+
+import hashlib
+import itertools
+import os
+import threading
+
+import numpy
+
+# ==============================================================================
+# Compilazione delle reti
+#
+# Le reti hanno tre evidenze con 5 stati (0-4): considerando anche l'evidenza
+# mancante le interrogazioni possibili sono 6x6x6 = 216. Le distribuzioni a
+# posteriori vengono calcolate una sola volta per enumerazione esatta della
+# congiunta e memorizzate in un tensore di forma (6, 6, 6, 5): l'indice
+# NON_OSSERVATO su un asse indica che quell'evidenza è stata marginalizzata.
+# ==============================================================================
+STATI = [0, 1, 2, 3, 4]
+NON_OSSERVATO = len(STATI)
+
+# Dimensione equivalente del campione del prior BDeu usato da bnlearn con methodtype="bayes"
+DIMENSIONE_EQUIVALENTE = 1000
+
+CARTELLA = os.path.dirname(os.path.abspath(__file__))
+PERCORSO_POSTERIORI_PREDEFINITE = os.path.join(CARTELLA, "posterioriPredefinite.npz")
+# Sorgenti da cui dipendono i tensori predefiniti (CPD e regole di compilazione)
+SORGENTI_PREDEFINITE = [os.path.join(CARTELLA, "retiBayesiane.py"), os.path.join(CARTELLA, "posteriori.py")]
+
+# Reti compilate con i CPD predefiniti (nome della classe -> ReteCompilata)
+_reti_compilate = {}
+_lock_reti_compilate = threading.Lock()
+
+# --------------------------------------------------------------------------
+# Funzione _tabella_cpd: converte un TabularCPD in un array numpy con gli assi
+# nell'ordine indicato da "variabili", indicizzato direttamente dal valore dello stato.
+# --------------------------------------------------------------------------
+def _tabella_cpd(cpd, variabili):
+    valori = numpy.asarray(cpd.get_values(), dtype=float).reshape(cpd.cardinality)
+    tabella = numpy.zeros([len(STATI)] * len(cpd.variables))
+    tabella[numpy.ix_(*[[int(s) for s in cpd.state_names[v]] for v in cpd.variables])] = valori
+    return tabella.transpose([cpd.variables.index(v) for v in variabili])
+
+# --------------------------------------------------------------------------
+# Funzione _posteriori_da_congiunta: calcola il tensore delle posteriori dalla
+# congiunta P(evidenze, target) (assi: evidenze, poi target).
+# --------------------------------------------------------------------------
+def _posteriori_da_congiunta(congiunta):
+    numero_evidenze = congiunta.ndim - 1
+    posteriori = numpy.empty([len(STATI) + 1] * numero_evidenze + [len(STATI)])
+    for osservate in itertools.product([True, False], repeat=numero_evidenze):
+        # Marginalizza le evidenze non osservate e normalizza sul target
+        marginale = congiunta.sum(axis=tuple(i for i, o in enumerate(osservate) if not o), keepdims=True)
+        normalizzazione = marginale.sum(axis=-1, keepdims=True)
+        distribuzione = numpy.divide(marginale, normalizzazione,
+                                     out=numpy.full_like(marginale, 1 / len(STATI)),
+                                     where=normalizzazione > 0)
+        posizione = tuple(slice(0, NON_OSSERVATO) if o else slice(NON_OSSERVATO, None) for o in osservate)
+        posteriori[posizione] = distribuzione
+    posteriori.setflags(write=False)
+    return posteriori
+
+# --------------------------------------------------------------------------
+# Funzione _congiunta: congiunta P(evidenze, target) = P(target | evidenze)
+# per il prodotto dei priori delle evidenze (tabelle indicizzate dagli stati).
+# --------------------------------------------------------------------------
+def _congiunta(condizionata, priori):
+    congiunta = condizionata
+    for asse, priore in enumerate(priori):
+        forma = [1] * (len(priori) + 1)
+        forma[asse] = len(STATI)
+        congiunta = congiunta * priore.reshape(forma)
+    return congiunta
+
+# --------------------------------------------------------------------------
+# Funzione compila_posteriori: calcola P(Consiglio | evidenze osservate) per ogni
+# sottoinsieme di evidenze osservate e per ogni combinazione dei loro valori.
+# --------------------------------------------------------------------------
+def compila_posteriori(modello, evidenze, target='Consiglio'):
+    condizionata = _tabella_cpd(modello.get_cpds(target), list(evidenze) + [target])
+    priori = [_tabella_cpd(modello.get_cpds(variabile), [variabile]) for variabile in evidenze]
+    return _posteriori_da_congiunta(_congiunta(condizionata, priori))
+
+# --------------------------------------------------------------------------
+# Funzione conta_osservazioni: restituisce il tensore dei conteggi (5 stati per
+# ciascuna variabile, assi nell'ordine di "variabili") delle righe indicate,
+# fornite come DataFrame con le colonne delle variabili oppure come array N x k.
+# --------------------------------------------------------------------------
+def conta_osservazioni(righe, variabili):
+    if hasattr(righe, "columns"):
+        righe = righe[list(variabili)].to_numpy()
+    righe = numpy.asarray(righe)
+    if righe.ndim != 2 or righe.shape[1] != len(variabili):
+        raise ValueError(f"Attese righe con {len(variabili)} colonne ({', '.join(variabili)})")
+    if righe.size and (numpy.any(righe < 0) or numpy.any(righe >= len(STATI)) or numpy.any(righe != numpy.floor(righe))):
+        raise ValueError("Le osservazioni devono essere interi compresi tra 0 e 4")
+    forma = [len(STATI)] * len(variabili)
+    indici = numpy.ravel_multi_index(tuple(righe.astype(numpy.intp).T), forma)
+    return numpy.bincount(indici, minlength=len(STATI) ** len(variabili)).reshape(forma).astype(float)
+
+# --------------------------------------------------------------------------
+# Funzione parametri_da_conteggi: stima dai conteggi (assi: evidenze, poi
+# target) i priori delle evidenze e la distribuzione condizionata del target,
+# con la stessa regola di bnlearn.parameter_learning.fit:
+#   - "bayes": prior BDeu con DIMENSIONE_EQUIVALENTE ripartita sulle celle di
+#     ciascun CPD;
+#   - "maximumlikelihood": frequenze relative (uniforme per le configurazioni
+#     dei genitori mai osservate).
+# Con "priore" (priori delle evidenze e CPD del target, ad esempio i CPD
+# predefiniti) il metodo "bayes" usa questi CPD al posto della distribuzione
+# uniforme del prior BDeu, con la stessa dimensione equivalente per ciascuna
+# configurazione dei genitori: senza conteggi la stima coincide con il priore.
+# --------------------------------------------------------------------------
+def parametri_da_conteggi(conteggi, metodo="bayes", priore=None):
+    if metodo not in ["bayes", "maximumlikelihood"]:
+        raise ValueError("Metodo di apprendimento non valido: " + str(metodo))
+
+    def normalizza(tabella, base):
+        if metodo == "bayes":
+            if base is None:
+                tabella = tabella + DIMENSIONE_EQUIVALENTE / tabella.size
+            else:
+                tabella = tabella + DIMENSIONE_EQUIVALENTE * numpy.asarray(base) / (tabella.size // len(STATI))
+        totale = tabella.sum(axis=-1, keepdims=True)
+        return numpy.divide(tabella, totale, out=numpy.full_like(tabella, 1 / len(STATI)), where=totale > 0)
+
+    priori_base, condizionata_base = priore if priore is not None else ([None] * (conteggi.ndim - 1), None)
+    priori = [normalizza(conteggi.sum(axis=tuple(i for i in range(conteggi.ndim) if i != asse)), base)
+              for asse, base in zip(range(conteggi.ndim - 1), priori_base)]
+    return priori, normalizza(conteggi, condizionata_base)
+
+# --------------------------------------------------------------------------
+# Funzione posteriori_da_conteggi: tensore delle posteriori della rete con i
+# parametri stimati dai conteggi (uguale a quello di una rete appresa con
+# bnlearn sullo stesso dataset), senza costruire la rete.
+# --------------------------------------------------------------------------
+def posteriori_da_conteggi(conteggi, metodo="bayes"):
+    priori, condizionata = parametri_da_conteggi(conteggi, metodo)
+    return _posteriori_da_congiunta(_congiunta(condizionata, priori))
+
+# --------------------------------------------------------------------------
+# Funzione interroga_posteriori: restituisce la distribuzione di "Consiglio"
+# (array di 5 probabilità) leggendola dal tensore compilato.
+# Le evidenze assenti dal dizionario (o con valore None) sono marginalizzate.
+# --------------------------------------------------------------------------
+def interroga_posteriori(posteriori, evidenze, dati):
+    sconosciute = set(dati) - set(evidenze)
+    if sconosciute:
+        raise ValueError("Evidenze non presenti nella rete: " + ", ".join(sorted(sconosciute)))
+    indici = []
+    for variabile in evidenze:
+        valore = dati.get(variabile)
+        if valore is None:
+            indici.append(NON_OSSERVATO)
+            continue
+        # Stessa regola di interroga_posteriori_batch: interi compresi tra 0 e 4
+        try:
+            numero = float(valore)
+        except (TypeError, ValueError):
+            numero = numpy.nan
+        if not (0 <= numero < NON_OSSERVATO and numero == numpy.floor(numero)):
+            raise ValueError(f"Valore non valido per {variabile}: {valore}")
+        indici.append(int(numero))
+    return posteriori[tuple(indici)]
+
+# --------------------------------------------------------------------------
+# Funzione interroga_posteriori_batch: versione vettoriale di interroga_posteriori.
+# Accetta N righe di evidenze come array numpy (N x 3, colonne nell'ordine di
+# "evidenze") oppure come DataFrame con le colonne delle evidenze.
+# I valori NaN (o colonne assenti nel DataFrame) indicano evidenze non osservate.
+# Restituisce la matrice N x 5 delle distribuzioni di "Consiglio" e la colonna
+# della probabilità di rischio in percentuale, (P(3) + P(4)) * 100.
+# --------------------------------------------------------------------------
+def interroga_posteriori_batch(posteriori, evidenze, righe):
+    if hasattr(righe, "columns"):
+        righe = numpy.column_stack([
+            righe[variabile].to_numpy(dtype=float) if variabile in righe.columns
+            else numpy.full(len(righe), numpy.nan)
+            for variabile in evidenze
+        ])
+    righe = numpy.asarray(righe, dtype=float)
+    if righe.ndim != 2 or righe.shape[1] != len(evidenze):
+        raise ValueError(f"Attese righe con {len(evidenze)} evidenze ({', '.join(evidenze)})")
+    # Valida i soli valori osservati: un 5 esplicito non equivale a "non osservato"
+    mancanti = numpy.isnan(righe)
+    osservati = righe[~mancanti]
+    if numpy.any((osservati < 0) | (osservati >= NON_OSSERVATO) | (osservati != numpy.floor(osservati))):
+        raise ValueError("Le evidenze devono essere interi compresi tra 0 e 4")
+    indici = numpy.where(mancanti, NON_OSSERVATO, righe).astype(numpy.intp)
+    distribuzioni = posteriori[tuple(indici.T)]
+    probabilita_rischio = (distribuzioni[:, 3] + distribuzioni[:, 4]) * 100
+    return distribuzioni, probabilita_rischio
+
+# ==============================================================================
+# Classe ReteCompilata
+# Rete bayesiana ridotta al tensore delle posteriori di "Consiglio".
+# ==============================================================================
+class ReteCompilata:
+    def __init__(self, nome, evidenze, posteriori, priori=None, condizionata=None):
+        """
+        Crea la rete compilata:
+          - nome: nome della rete di origine (es. "BayesianaInsoddisfazione")
+          - evidenze: nomi delle evidenze, nell'ordine degli assi del tensore
+          - posteriori: tensore (6, 6, 6, 5) prodotto da compila_posteriori
+          - priori: tabelle (5,) dei CPD delle evidenze, nello stesso ordine
+          - condizionata: tabella (5, 5, 5, 5) del CPD di "Consiglio"
+            (assi: evidenze, poi "Consiglio")
+        """
+        self.nome = nome
+        self.Evidenze = list(evidenze)
+        self.posteriori = posteriori
+        self.priori = priori
+        self.condizionata = condizionata
+
+    # --------------------------------------------------------------------------
+    # Metodo inferenza: distribuzione di "Consiglio" dato un dizionario di evidenze.
+    # --------------------------------------------------------------------------
+    def inferenza(self, dati):
+        return interroga_posteriori(self.posteriori, self.Evidenze, dati)
+
+    # --------------------------------------------------------------------------
+    # Metodo inferenza_batch: inferenza vettoriale su N righe di evidenze.
+    # --------------------------------------------------------------------------
+    def inferenza_batch(self, righe):
+        return interroga_posteriori_batch(self.posteriori, self.Evidenze, righe)
+
+# --------------------------------------------------------------------------
+# Funzione _impronta_sorgenti: sha256 dei sorgenti dei tensori predefiniti.
+# --------------------------------------------------------------------------
+def _impronta_sorgenti():
+    impronta = hashlib.sha256()
+    for percorso in SORGENTI_PREDEFINITE:
+        with open(percorso, "rb") as f:
+            impronta.update(f.read())
+    return impronta.hexdigest()
+
+# --------------------------------------------------------------------------
+# Funzione _leggi_predefinite: legge le reti compilate dal file .npz, oppure
+# restituisce None se il file manca o non corrisponde ai sorgenti attuali.
+# --------------------------------------------------------------------------
+def _leggi_predefinite(impronta):
+    try:
+        with numpy.load(PERCORSO_POSTERIORI_PREDEFINITE, allow_pickle=False) as archivio:
+            if str(archivio["impronta"]) != impronta:
+                return None
+            reti = {}
+            for nome in archivio["nomi"]:
+                posteriori = archivio[nome + "__posteriori"]
+                priori = archivio[nome + "__priori"]
+                condizionata = archivio[nome + "__condizionata"]
+                for tabella in [posteriori, priori, condizionata]:
+                    tabella.setflags(write=False)
+                reti[str(nome)] = ReteCompilata(str(nome), [str(e) for e in archivio[nome + "__evidenze"]],
+                                                posteriori, list(priori), condizionata)
+            return reti
+    except (OSError, KeyError, ValueError):
+        return None
+
+# --------------------------------------------------------------------------
+# Funzione _compila_e_salva_predefinite: costruisce le reti predefinite con
+# retiBayesiane (bnlearn/pgmpy), ne salva i tensori e restituisce le reti compilate.
+# --------------------------------------------------------------------------
+def _compila_e_salva_predefinite(impronta):
+    from src.ReteBayesiana import retiBayesiane
+    reti = {}
+    for classe in [retiBayesiane.BayesianaInsoddisfazione, retiBayesiane.BayesianaTempoLibero]:
+        rete = classe()
+        modello = rete.DAG['model']
+        priori = [_tabella_cpd(modello.get_cpds(variabile), [variabile]) for variabile in rete.Evidenze]
+        condizionata = _tabella_cpd(modello.get_cpds('Consiglio'), list(rete.Evidenze) + ['Consiglio'])
+        reti[classe.__name__] = ReteCompilata(classe.__name__, rete.Evidenze, rete.posteriori, priori, condizionata)
+    array = {"impronta": numpy.array(impronta), "nomi": numpy.array(list(reti))}
+    for nome, rete in reti.items():
+        array[nome + "__posteriori"] = rete.posteriori
+        array[nome + "__evidenze"] = numpy.array(rete.Evidenze)
+        array[nome + "__priori"] = numpy.array(rete.priori)
+        array[nome + "__condizionata"] = rete.condizionata
+    try:
+        temporaneo = PERCORSO_POSTERIORI_PREDEFINITE + ".%d.tmp" % os.getpid()
+        with open(temporaneo, "wb") as f:
+            numpy.savez(f, **array)
+        os.replace(temporaneo, PERCORSO_POSTERIORI_PREDEFINITE)
+    except OSError:
+        pass
+    return reti
+
+# --------------------------------------------------------------------------
+# Funzione rete_compilata_predefinita: restituisce la ReteCompilata con i CPD
+# predefiniti della classe indicata ("BayesianaInsoddisfazione" o
+# "BayesianaTempoLibero"), letta dal file .npz o ricompilata se questo manca
+# o non corrisponde ai sorgenti.
+# --------------------------------------------------------------------------
+def rete_compilata_predefinita(nome):
+    if nome not in _reti_compilate:
+        with _lock_reti_compilate:
+            if nome not in _reti_compilate:
+                impronta = _impronta_sorgenti()
+                reti = _leggi_predefinite(impronta) or _compila_e_salva_predefinite(impronta)
+                _reti_compilate.update(reti)
+    return _reti_compilate[nome]
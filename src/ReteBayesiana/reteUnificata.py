@@ -0,0 +1,186 @@
+# ==============================================================================
+# reteUnificata.py
+#
+# Questo modulo definisce un'unica rete bayesiana che estende le due reti dei
+# rami (BayesianaInsoddisfazione e BayesianaTempoLibero) con le informazioni
+# finora gestite fuori dal modello:
+#
+#   Fascia, Meteo -> Ramo
+#   Ramo -> Temperatura, Vento, Pioggia
+#   Ramo, Temperatura, Vento, Pioggia -> Consiglio
+#   Consiglio, Indoor -> Rischio
+#
+# - Ramo ("freddo", "normale", "caldo") è il ramo di temperatura; Temperatura è
+#   l'indice 0-4 del ramo ("Freddo" nella rete del ramo freddo, "Attività" in
+#   quella del ramo caldo);
+# - per i rami freddo e caldo i CPD di Temperatura, Vento, Pioggia e Consiglio
+#   sono quelli della rete del ramo (predefiniti o appresi dal dataset CSV): con
+#   il Ramo osservato la rete dà quindi le stesse distribuzioni di "Consiglio"
+#   delle due reti, anche con evidenze parziali;
+# - nel ramo "normale" non c'è rischio (come nel percorso interattivo, dove non
+#   si valuta l'allerta) e l'indice di temperatura non è informativo;
+# - Rischio vale "si" quando Consiglio indica una situazione critica (3 o 4)
+#   senza accesso a una struttura indoor, che annulla il rischio;
+# - le evidenze impossibili (ad esempio il ramo "normale" con i rovesci)
+#   sollevano ValueError;
+# - il CPD predefinito di Ramo è un priore non informativo (vedi CPD_RAMO): con
+#   il Ramo non osservato i risultati sono solo probabilità a priori.
+#
+# La rete è compilata una sola volta in un albero di giunzione (vedi
+# alberoGiunzione.py) e interrogata con evidenze arbitrarie, anche parziali.
+# ==============================================================================
+
+import numpy
+
+from src.Ontologia.indiceOntologia import FASCE_ORARIE, METEO, TEMPERATURE
+from src.ReteBayesiana.alberoGiunzione import AlberoGiunzione
+from src.ReteBayesiana.posteriori import STATI, parametri_da_conteggi, rete_compilata_predefinita
+
+# Reti dei rami e ruolo di ciascuna loro evidenza nella rete unificata
+RETI_RAMI = {"freddo": "BayesianaInsoddisfazione", "caldo": "BayesianaTempoLibero"}
+RUOLI_EVIDENZE = {
+    "freddo": {"Freddo": "Temperatura", "Vento": "Vento", "Pioggia": "Pioggia"},
+    "caldo": {"Attività": "Temperatura", "Vento": "Vento", "Pioggia": "Pioggia"},
+}
+EVIDENZE = ["Temperatura", "Vento", "Pioggia"]
+SI_NO = ["si", "no"]
+
+# ------------------------------------------------------------------------------
+# CPD predefinito di Ramo dati Fascia e Meteo (assi: fascia, meteo, ramo).
+# I dataset non contengono fascia e meteo, quindi il CPD è un priore non
+# informativo: uniforme sui rami, salvo il vincolo di determina_ramo (con i
+# rovesci il ramo "normale" è escluso). Le interrogazioni con il Ramo non
+# osservato danno quindi solo probabilità a priori; per stime effettive va
+# osservato il Ramo (determina_ramo) oppure appreso il CPD da osservazioni
+# etichettate (impara_famiglia).
+# ------------------------------------------------------------------------------
+CPD_RAMO = numpy.array([
+    # freddo normale caldo
+    [[1 / 3, 1 / 3, 1 / 3],    # mattina, nuvoloso
+     [1 / 3, 1 / 3, 1 / 3],    # mattina, scoperto
+     [1 / 2, 0.0, 1 / 2]],     # mattina, rovesci
+    [[1 / 3, 1 / 3, 1 / 3],    # sera, nuvoloso
+     [1 / 3, 1 / 3, 1 / 3],    # sera, scoperto
+     [1 / 2, 0.0, 1 / 2]],     # sera, rovesci
+])
+
+# Distribuzione di "Consiglio" nel ramo "normale": rischio nullo, come per le
+# condizioni ottimali nelle reti dei rami
+CONSIGLIO_NORMALE = numpy.array([1 / 3, 1 / 3, 1 / 3, 0.0, 0.0])
+
+# ==============================================================================
+# Classe ReteUnificata
+# Rete unificata compilata in albero di giunzione, con le probabilità di
+# rischio usate dal sistema.
+# ==============================================================================
+class ReteUnificata(AlberoGiunzione):
+    # --------------------------------------------------------------------------
+    # Metodo probabilita_rischio: probabilità (in percentuale) che "Consiglio"
+    # valga 3 o 4, date le evidenze (anche parziali).
+    # --------------------------------------------------------------------------
+    def probabilita_rischio(self, evidenze=None):
+        p = self.interroga("Consiglio", evidenze)
+        return float((p[3] + p[4]) * 100)
+
+    # --------------------------------------------------------------------------
+    # Metodo rischio_effettivo: probabilità (in percentuale) di rischio tenendo
+    # conto dell'accesso a una struttura indoor.
+    # --------------------------------------------------------------------------
+    def rischio_effettivo(self, evidenze=None):
+        return float(self.interroga("Rischio", evidenze)[SI_NO.index("si")] * 100)
+
+    # --------------------------------------------------------------------------
+    # Metodo impara_famiglia: restituisce una nuova rete con il CPD della
+    # variabile stimato (regole di parametri_da_conteggi) dalle righe indicate,
+    # DataFrame o lista di dizionari con le colonne della variabile e dei suoi
+    # genitori (valori come stati o posizioni).
+    # --------------------------------------------------------------------------
+    def impara_famiglia(self, variabile, righe, metodo="bayes"):
+        genitori, _ = self.cpd[variabile]
+        famiglia = genitori + (variabile,)
+        if hasattr(righe, "to_dict"):
+            righe = righe.to_dict("records")
+        conteggi = numpy.zeros([len(self.stati[v]) for v in famiglia])
+        for riga in righe:
+            conteggi[tuple(self.indice_stato(v, riga[v]) for v in famiglia)] += 1
+        _, tabella = parametri_da_conteggi(conteggi, metodo)
+        return self.con_variabile(variabile, self.stati[variabile], genitori, tabella)
+
+# ==============================================================================
+# Funzione: parametri_rete_ramo()
+# Riordina i parametri di una rete di ramo (priori delle evidenze e CPD di
+# "Consiglio", assi nell'ordine di "evidenze_rete") secondo EVIDENZE.
+# ==============================================================================
+def parametri_rete_ramo(ramo, evidenze_rete, priori, condizionata):
+    ruoli = [RUOLI_EVIDENZE[ramo][nome] for nome in evidenze_rete]
+    priori_ruoli = {ruolo: numpy.asarray(priore) for ruolo, priore in zip(ruoli, priori)}
+    assi = [ruoli.index(ruolo) for ruolo in EVIDENZE] + [len(ruoli)]
+    return priori_ruoli, numpy.asarray(condizionata).transpose(assi)
+
+# ==============================================================================
+# Funzione: crea_rete_unificata()
+# Costruisce e compila la rete unificata dai parametri delle reti dei rami
+# (dizionario ramo -> (priori per ruolo, CPD di "Consiglio"), vedi
+# parametri_rete_ramo).
+# ==============================================================================
+def crea_rete_unificata(parametri_rami, cpd_ramo=CPD_RAMO):
+    stati = {
+        "Fascia": FASCE_ORARIE,
+        "Meteo": METEO,
+        "Indoor": SI_NO,
+        "Ramo": TEMPERATURE,
+        "Temperatura": STATI,
+        "Vento": STATI,
+        "Pioggia": STATI,
+        "Consiglio": STATI,
+        "Rischio": SI_NO,
+    }
+    cpd = {
+        "Fascia": ((), numpy.full(len(FASCE_ORARIE), 1 / len(FASCE_ORARIE))),
+        "Meteo": ((), numpy.full(len(METEO), 1 / len(METEO))),
+        "Indoor": ((), numpy.full(len(SI_NO), 1 / len(SI_NO))),
+        "Ramo": (("Fascia", "Meteo"), cpd_ramo),
+    }
+    priori_freddo, consiglio_freddo = parametri_rami["freddo"]
+    priori_caldo, consiglio_caldo = parametri_rami["caldo"]
+    for evidenza in EVIDENZE:
+        # Nel ramo "normale" la temperatura non è informativa; vento e pioggia
+        # seguono la media delle due reti
+        normale = numpy.full(len(STATI), 1 / len(STATI)) if evidenza == "Temperatura" \
+            else (priori_freddo[evidenza] + priori_caldo[evidenza]) / 2
+        righe = {"freddo": priori_freddo[evidenza], "normale": normale, "caldo": priori_caldo[evidenza]}
+        cpd[evidenza] = (("Ramo",), numpy.array([righe[ramo] for ramo in TEMPERATURE]))
+    consiglio = {"freddo": consiglio_freddo, "caldo": consiglio_caldo,
+                 "normale": numpy.broadcast_to(CONSIGLIO_NORMALE, consiglio_freddo.shape)}
+    cpd["Consiglio"] = (("Ramo",) + tuple(EVIDENZE), numpy.array([consiglio[ramo] for ramo in TEMPERATURE]))
+    rischio = numpy.zeros((len(STATI), len(SI_NO), len(SI_NO)))
+    for c, indoor in numpy.ndindex(len(STATI), len(SI_NO)):
+        critico = c >= 3 and SI_NO[indoor] == "no"
+        rischio[c, indoor, SI_NO.index("si" if critico else "no")] = 1.0
+    cpd["Rischio"] = (("Consiglio", "Indoor"), rischio)
+    return ReteUnificata(stati, cpd)
+
+# ==============================================================================
+# Funzione: rete_unificata_predefinita()
+# Rete unificata con i CPD predefiniti delle reti dei rami (letti dalle reti
+# compilate, senza bnlearn).
+# ==============================================================================
+def rete_unificata_predefinita():
+    parametri = {}
+    for ramo, nome in RETI_RAMI.items():
+        rete = rete_compilata_predefinita(nome)
+        parametri[ramo] = parametri_rete_ramo(ramo, rete.Evidenze, rete.priori, rete.condizionata)
+    return crea_rete_unificata(parametri)
+
+# ==============================================================================
+# Funzione: rete_unificata_da_conteggi()
+# Rete unificata con i parametri delle reti dei rami stimati dai conteggi dei
+# dataset (dizionario ramo -> (evidenze della rete, tensore dei conteggi con
+# assi evidenze, "Consiglio")), con le stesse regole di impara_dataset.
+# ==============================================================================
+def rete_unificata_da_conteggi(conteggi_rami, metodo="bayes"):
+    parametri = {}
+    for ramo, (evidenze_rete, conteggi) in conteggi_rami.items():
+        priori, condizionata = parametri_da_conteggi(conteggi, metodo)
+        parametri[ramo] = parametri_rete_ramo(ramo, evidenze_rete, priori, condizionata)
+    return crea_rete_unificata(parametri)
@@ -13,11 +13,251 @@
 #
 # Inoltre, è fornita la funzione ottieni_risultato_query per formattare l'output
 # dell'inferenza in una struttura pandas.DataFrame.
+#
+# Ogni rete viene "compilata" in un tensore denso che contiene la distribuzione
+# a posteriori di "Consiglio" per ogni combinazione di evidenze (anche parziali):
+# l'inferenza si riduce così ad un accesso ad un array. Il metodo inferenza_batch
+# applica lo stesso accesso in modo vettoriale a N righe di evidenze.
+#
+# I parametri appresi da impara_dataset sono memorizzati (in memoria e su disco)
+# con chiave l'impronta del dataset e del metodo: finché il dataset non cambia
+# l'apprendimento non viene ripetuto, nemmeno dopo un riavvio.
+#
+# Le reti conservano inoltre i conteggi delle osservazioni (tensore 5x5x5x5) da
+# cui sono stati stimati i parametri: aggiorna_osservazioni aggiunge nuove righe
+# etichettate ai conteggi e ricalcola CPD e posteriori senza ripetere
+# l'apprendimento sull'intero dataset.
+#
+# Uso (verifica degli aggiornamenti sulle reti con i CPD predefiniti):
+#   python -m src.ReteBayesiana.retiBayesiane --verifica
 # ==============================================================================
 
 from pgmpy.factors.discrete import TabularCPD
+import argparse
 import bnlearn
+import hashlib
+import numpy
+import os
 import pandas
+import pgmpy
+import pickle
+import sys
+import tempfile
+import threading
+
+# ==============================================================================
+# Compilazione delle reti
+#
+# Le funzioni di compilazione e di interrogazione dei tensori delle posteriori
+# e di stima dei parametri dai conteggi (che usano solo numpy) sono definite in
+# posteriori.py e riesportate qui.
+# ==============================================================================
+from src.ReteBayesiana.posteriori import (STATI, NON_OSSERVATO, DIMENSIONE_EQUIVALENTE, compila_posteriori,
+                                          conta_osservazioni, interroga_posteriori, interroga_posteriori_batch,
+                                          parametri_da_conteggi, rete_compilata_predefinita)
+
+# Tensori compilati per le reti con i CPD predefiniti (uno per classe e per processo).
+# I tensori sono in sola lettura e quindi condivisibili tra thread.
+_posteriori_predefinite = {}
+_lock_posteriori = threading.Lock()
+
+# Cartella della cache su disco delle reti apprese
+CARTELLA_CACHE_RETI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cacheReti")
+
+# Reti apprese già serializzate (impronta -> bytes), condivise nel processo
+_reti_apprese = {}
+_lock_reti_apprese = threading.Lock()
+
+# Serializza gli aggiornamenti incrementali dei conteggi
+_lock_aggiornamenti = threading.Lock()
+
+# --------------------------------------------------------------------------
+# Funzione _compila_predefinita: compila la rete con i CPD predefiniti la prima
+# volta che una sua istanza viene creata e riusa il tensore nelle successive.
+# --------------------------------------------------------------------------
+def _compila_predefinita(rete):
+    chiave = type(rete).__name__
+    if chiave not in _posteriori_predefinite:
+        with _lock_posteriori:
+            if chiave not in _posteriori_predefinite:
+                _posteriori_predefinite[chiave] = compila_posteriori(rete.DAG['model'], rete.Evidenze)
+    return _posteriori_predefinite[chiave]
+
+# --------------------------------------------------------------------------
+# Funzione impronta_dataset: restituisce l'impronta (sha256) del contenuto del
+# dataset, del metodo di apprendimento e della rete, usata come chiave della cache.
+# Include le versioni di bnlearn e pgmpy, da cui dipendono gli oggetti serializzati.
+# --------------------------------------------------------------------------
+def impronta_dataset(rete, dataset, metodo):
+    impronta = hashlib.sha256()
+    for parte in [type(rete).__name__, str(metodo), bnlearn.__version__, pgmpy.__version__]:
+        impronta.update(parte.encode("utf-8") + b"\0")
+    impronta.update(",".join(map(str, dataset.columns)).encode("utf-8") + b"\0")
+    if all(numpy.issubdtype(tipo, numpy.integer) for tipo in dataset.dtypes):
+        # Dataset interi (anche in forma binaria uint8): impronta dei valori, senza conversione in testo
+        impronta.update(numpy.ascontiguousarray(dataset.to_numpy(dtype=numpy.int64)).tobytes())
+    else:
+        impronta.update(dataset.to_csv(index=False, header=False).encode("utf-8"))
+    return impronta.hexdigest()
+
+# --------------------------------------------------------------------------
+# Funzione _leggi_rete_appresa: restituisce (DAG, posteriori) dalla cache in
+# memoria o su disco, oppure None. Ogni chiamata restituisce oggetti nuovi.
+# Un file che non si riesce a leggere o a deserializzare (ad esempio perché
+# scritto con versioni incompatibili delle librerie) vale come assente.
+# --------------------------------------------------------------------------
+def _leggi_rete_appresa(impronta):
+    serializzata = _reti_apprese.get(impronta)
+    if serializzata is None:
+        try:
+            with open(os.path.join(CARTELLA_CACHE_RETI, impronta + ".pkl"), "rb") as file:
+                serializzata = file.read()
+            dag, posteriori = pickle.loads(serializzata)
+        except Exception:
+            return None
+        with _lock_reti_apprese:
+            _reti_apprese[impronta] = serializzata
+    else:
+        dag, posteriori = pickle.loads(serializzata)
+    posteriori.setflags(write=False)
+    return dag, posteriori
+
+# --------------------------------------------------------------------------
+# Funzione _scrivi_rete_appresa: memorizza (DAG, posteriori) in memoria e su
+# disco (scrittura atomica; gli errori del disco vengono ignorati).
+# --------------------------------------------------------------------------
+def _scrivi_rete_appresa(impronta, dag, posteriori):
+    serializzata = pickle.dumps((dag, posteriori), protocol=pickle.HIGHEST_PROTOCOL)
+    with _lock_reti_apprese:
+        _reti_apprese[impronta] = serializzata
+    try:
+        os.makedirs(CARTELLA_CACHE_RETI, exist_ok=True)
+        descrittore, temporaneo = tempfile.mkstemp(dir=CARTELLA_CACHE_RETI, suffix=".tmp")
+        with os.fdopen(descrittore, "wb") as file:
+            file.write(serializzata)
+        os.replace(temporaneo, os.path.join(CARTELLA_CACHE_RETI, impronta + ".pkl"))
+    except OSError:
+        pass
+
+# --------------------------------------------------------------------------
+# Funzione cpd_da_conteggi: stima i CPD della rete dai conteggi (vedi
+# parametri_da_conteggi per le regole di stima e per "priore").
+# --------------------------------------------------------------------------
+def cpd_da_conteggi(conteggi, evidenze, metodo="bayes", target='Consiglio', priore=None):
+    priori, condizionata = parametri_da_conteggi(conteggi, metodo, priore)
+    cpd = []
+    for variabile, priore in zip(evidenze, priori):
+        cpd.append(TabularCPD(
+            variable=variabile, variable_card=len(STATI),
+            values=priore.reshape(-1, 1),
+            state_names={variabile: STATI}
+        ))
+    cpd.append(TabularCPD(
+        variable=target, variable_card=len(STATI),
+        values=condizionata.reshape(-1, len(STATI)).T,
+        evidence=list(evidenze),
+        evidence_card=[len(STATI)] * len(evidenze),
+        state_names={v: STATI for v in [target] + list(evidenze)}
+    ))
+    return cpd
+
+# --------------------------------------------------------------------------
+# Funzione aggiorna_parametri: aggiunge le righe etichettate ai conteggi della
+# rete e ne ricalcola CPD e posteriori. I conteggi partono da quelli dell'ultimo
+# dataset appreso; per una rete con i CPD predefiniti partono da zero e i CPD
+# predefiniti diventano il priore della stima bayesiana (vedi
+# parametri_da_conteggi), così che poche righe non li cancellino. Il metodo è,
+# se non indicato, quello dell'ultimo apprendimento.
+# --------------------------------------------------------------------------
+def aggiorna_parametri(rete, righe, metodo=None, target='Consiglio'):
+    nuovi = conta_osservazioni(righe, list(rete.Evidenze) + [target])
+    with _lock_aggiornamenti:
+        metodo = metodo or rete.metodo_apprendimento or "bayes"
+        if rete.conteggi is None:
+            predefinita = rete_compilata_predefinita(type(rete).__name__)
+            priore = (predefinita.priori, predefinita.condizionata)
+            conteggi = nuovi
+        else:
+            priore = rete.priore_parametri
+            conteggi = rete.conteggi + nuovi
+        if priore is not None and metodo != "bayes":
+            raise ValueError("La rete usa i CPD predefiniti: gli aggiornamenti richiedono il metodo \"bayes\" "
+                             "(oppure un dataset appreso in precedenza)")
+        imposta_conteggi(rete, conteggi, metodo, target, priore)
+
+# --------------------------------------------------------------------------
+# Funzione imposta_conteggi: sostituisce i parametri della rete con quelli
+# stimati dal tensore dei conteggi indicato (e dall'eventuale priore) e
+# ricompila le posteriori.
+# --------------------------------------------------------------------------
+def imposta_conteggi(rete, conteggi, metodo="bayes", target='Consiglio', priore=None):
+    dag = bnlearn.make_DAG(rete.Bordi, CPD=cpd_da_conteggi(conteggi, rete.Evidenze, metodo, target, priore),
+                           verbose=0)
+    posteriori = compila_posteriori(dag['model'], rete.Evidenze, target)
+    # Sostituisce lo stato in blocco: chi legge vede la rete vecchia o quella nuova
+    rete.DAG, rete.posteriori = dag, posteriori
+    rete.conteggi, rete.metodo_apprendimento, rete.priore_parametri = conteggi, metodo, priore
+
+# --------------------------------------------------------------------------
+# Funzione apprendi_parametri: apprende i CPD della rete dal dataset (già
+# ridotto alle colonne della rete) e ricompila il tensore delle posteriori,
+# riusando la cache se il dataset e il metodo sono già stati visti.
+# --------------------------------------------------------------------------
+def apprendi_parametri(rete, dataset, metodo="bayes", usa_cache=True):
+    # Conteggi di partenza per gli aggiornamenti incrementali
+    rete.conteggi = conta_osservazioni(dataset, list(rete.Evidenze) + ['Consiglio'])
+    rete.metodo_apprendimento = metodo
+    rete.priore_parametri = None
+    impronta = impronta_dataset(rete, dataset, metodo) if usa_cache else None
+    appresa = _leggi_rete_appresa(impronta) if usa_cache else None
+    if appresa is not None:
+        rete.DAG, rete.posteriori = appresa
+        return
+    rete.DAG = bnlearn.make_DAG(rete.Bordi, verbose=0)
+    rete.DAG = bnlearn.parameter_learning.fit(
+        rete.DAG, dataset,
+        methodtype=metodo,
+        verbose=0
+    )
+    # I parametri sono cambiati: ricompila il tensore delle distribuzioni a posteriori
+    rete.posteriori = compila_posteriori(rete.DAG['model'], rete.Evidenze)
+    if usa_cache:
+        _scrivi_rete_appresa(impronta, rete.DAG, rete.posteriori)
+
+# --------------------------------------------------------------------------
+# Funzione genera_cpd_consiglio: valori del CPD di "Consiglio" (liste per
+# p(Consiglio=0..4), una colonna per ciascuna delle 125 combinazioni delle tre
+# evidenze, la prima più lenta). La logica applicata:
+# - Si considera il massimo delle tre evidenze come indicatore di rischio.
+# - In base al valore massimo si determina un "rischio" (0.0, 0.25, 0.40, 0.60, 0.80).
+# - Il rischio viene poi distribuito: metà sui livelli 3 e 4 (stati critici), il resto
+#   equamente distribuito tra 0, 1 e 2.
+# Il massimo non dipende dall'ordine delle evidenze: il CPD è lo stesso per le
+# reti di entrambi i rami.
+# --------------------------------------------------------------------------
+def genera_cpd_consiglio():
+    values = [[], [], [], [], []]  # liste per p(Consiglio=0..4)
+    # Cicla su tutte le possibili combinazioni delle evidenze (5x5x5 = 125 combinazioni)
+    for prima in range(5):
+        for seconda in range(5):
+            for terza in range(5):
+                massimo = max(prima, seconda, terza)
+                if massimo == 0: rischio = 0.0    # condizioni ottimali: rischio 0%
+                elif massimo == 1: rischio = 0.25   # condizioni lievemente sfavorevoli: 25%
+                elif massimo == 2: rischio = 0.40   # condizioni moderate: 40%
+                elif massimo == 3: rischio = 0.60   # condizioni difficili: 60%
+                else: rischio = 0.80   # condizioni estreme: 80%
+                # Suddivide il rischio: metà per lo stato 3, metà per lo stato 4.
+                p3 = rischio / 2
+                p4 = rischio / 2
+                restante = 1 - rischio
+                if restante < 0:
+                    restante = 0.0
+                p0 = p1 = p2 = restante / 3 if restante > 0 else 0.0
+                # Aggiunge le probabilità per questa combinazione
+                values[0].append(p0); values[1].append(p1); values[2].append(p2)
+                values[3].append(p3); values[4].append(p4)
+    return values
 
 # ==============================================================================
 # Classe BayesianaInsoddisfazione (Ramo Freddo)
@@ -37,6 +277,8 @@ class BayesianaInsoddisfazione:
             ('Freddo', 'Consiglio'),
             ('Pioggia', 'Consiglio')
         ]
+        # Ordine delle evidenze negli assi del tensore compilato
+        self.Evidenze = ['Vento', 'Freddo', 'Pioggia']
 
         # ----------------------------------------------------------------------
         # CPD per Vento: rappresenta la distribuzione a priori dei livelli di vento.
@@ -87,37 +329,9 @@ class BayesianaInsoddisfazione:
 
         # ------------------------------------------------------------------
         # CPD per Consiglio: definisce la probabilità di ciascun livello di "Consiglio"
-        # in base a combinazioni delle evidenze Vento, Freddo e Pioggia.
-        # La logica applicata:
-        # - Si considera il massimo tra Vento, Freddo e Pioggia come indicatore di rischio.
-        # - In base al valore massimo si determina un "rischio" (0.0, 0.25, 0.40, 0.60, 0.80).
-        # - Il rischio viene poi distribuito: metà sui livelli 3 e 4 (stati critici), il resto
-        #   equamente distribuito tra 0, 1 e 2.
+        # in base a combinazioni delle evidenze Vento, Freddo e Pioggia (vedi
+        # genera_cpd_consiglio).
         # ----------------------------------------------------------------------
-        def genera_cpd_consiglio():
-            values = [[], [], [], [], []]  # liste per p(Consiglio=0..4)
-            # Cicla su tutte le possibili combinazioni delle evidenze (5x5x5 = 125 combinazioni)
-            for vento in range(5):
-                for freddo in range(5):
-                    for pioggia in range(5):
-                        massimo = max(vento, freddo, pioggia)
-                        if massimo == 0: rischio = 0.0    # condizioni ottimali: rischio 0%
-                        elif massimo == 1: rischio = 0.25   # condizioni lievemente sfavorevoli: 25%
-                        elif massimo == 2: rischio = 0.40   # condizioni moderate: 40%
-                        elif massimo == 3: rischio = 0.60   # condizioni difficili: 60%
-                        else: rischio = 0.80   # condizioni estreme: 80%
-                        # Suddivide il rischio: metà per lo stato 3, metà per lo stato 4.
-                        p3 = rischio / 2
-                        p4 = rischio / 2
-                        restante = 1 - rischio
-                        if restante < 0:
-                            restante = 0.0
-                        p0 = p1 = p2 = restante / 3 if restante > 0 else 0.0
-                        # Aggiunge le probabilità per questa combinazione
-                        values[0].append(p0); values[1].append(p1); values[2].append(p2)
-                        values[3].append(p3); values[4].append(p4)
-            return values
-
         self.CPD_consiglio = TabularCPD(
             variable='Consiglio', variable_card=5,
             values=genera_cpd_consiglio(),
@@ -139,37 +353,64 @@ class BayesianaInsoddisfazione:
             CPD=[self.CPD_vento, self.CPD_freddo, self.CPD_pioggia, self.CPD_consiglio],
             verbose=0
         )
+        # Tensore delle distribuzioni a posteriori (compilato una volta per processo)
+        self.posteriori = _compila_predefinita(self)
+        # Conteggi e metodo dell'ultimo apprendimento (None finché si usano i CPD predefiniti)
+        self.conteggi = None
+        self.metodo_apprendimento = None
+        # Priore delle stime (CPD predefiniti) dopo un aggiornamento della rete predefinita
+        self.priore_parametri = None
 
     # --------------------------------------------------------------------------
-    # Metodo inferenza: esegue l'inferenza sul nodo "Consiglio" dato un dizionario di evidenze.
+    # Metodo inferenza: restituisce la distribuzione di "Consiglio" dato un dizionario
+    # di evidenze, leggendola dal tensore compilato (le evidenze mancanti sono marginalizzate).
     # --------------------------------------------------------------------------
     def inferenza(self, dati):
-        return bnlearn.inference.fit(self.DAG,
-                                     variables=['Consiglio'],
-                                     evidence=dati,
-                                     verbose=0)
+        return interroga_posteriori(self.posteriori, self.Evidenze, dati)
+
+    # --------------------------------------------------------------------------
+    # Metodo inferenza_batch: inferenza vettoriale su N righe di evidenze.
+    # Restituisce (distribuzioni N x 5, probabilità di rischio in percentuale).
+    # --------------------------------------------------------------------------
+    def inferenza_batch(self, righe):
+        return interroga_posteriori_batch(self.posteriori, self.Evidenze, righe)
 
     # --------------------------------------------------------------------------
     # Metodo impara_dataset: aggiorna i parametri della rete utilizzando un dataset
     # Se il dataset contiene la colonna 'Attività' (ramo caldo) la usa, altrimenti usa 'Freddo' (ramo freddo).
+    # Con usa_cache=False l'apprendimento viene sempre ripetuto.
     # --------------------------------------------------------------------------
-    def impara_dataset(self, dataset, metodo="bayes"):
+    def impara_dataset(self, dataset, metodo="bayes", usa_cache=True):
         if 'Attività' in dataset.columns:
             dataset = dataset[['Attività', 'Vento', 'Pioggia', 'Consiglio']]
         else:
             dataset = dataset[['Vento', 'Freddo', 'Pioggia', 'Consiglio']]
-        self.DAG = bnlearn.make_DAG(self.Bordi, verbose=0)
         # MODIFICA: utilizza il metodo bayesiano con smoothing (Laplace smoothing, α=1)
-        self.DAG = bnlearn.parameter_learning.fit(
-            self.DAG, dataset,
-            methodtype=metodo,
-            verbose=0
-        )
+        apprendi_parametri(self, dataset, metodo, usa_cache)
+
+    # --------------------------------------------------------------------------
+    # Metodo aggiorna_osservazioni: aggiunge nuove righe etichettate (DataFrame con
+    # le colonne delle evidenze e 'Consiglio', oppure array N x 4 nello stesso
+    # ordine) ai conteggi della rete, aggiornando subito CPD e posteriori.
+    # --------------------------------------------------------------------------
+    def aggiorna_osservazioni(self, righe, metodo=None):
+        aggiorna_parametri(self, righe, metodo)
+
+    # --------------------------------------------------------------------------
+    # Metodo impara_file: apprende i parametri da uno o più file CSV (anche molto
+    # grandi) contandone le righe a blocchi in un pool di processi.
+    # --------------------------------------------------------------------------
+    def impara_file(self, percorsi, metodo="bayes", processi=None):
+        from src.ReteBayesiana import apprendimentoParallelo
+        apprendimentoParallelo.impara_file(self, percorsi, metodo, processi)
 
 # ==============================================================================
 # Funzione di supporto per ottenere i risultati dell'inferenza in formato DataFrame
+# Accetta sia la distribuzione restituita da inferenza() sia un fattore di pgmpy.
 # ==============================================================================
 def ottieni_risultato_query(query) -> pandas.DataFrame:
+    if isinstance(query, numpy.ndarray):
+        return pandas.DataFrame({'Consiglio': STATI, 'p': query})
     return bnlearn.bnlearn.query2df(query, verbose=0)
 
 # ==============================================================================
@@ -190,6 +431,8 @@ class BayesianaTempoLibero:
             ('Vento', 'Consiglio'),
             ('Pioggia', 'Consiglio')
         ]
+        # Ordine delle evidenze negli assi del tensore compilato
+        self.Evidenze = ['Attività', 'Vento', 'Pioggia']
 
         # ----------------------------------------------------------------------
         # CPD per Attività: distribuzione uniforme
@@ -238,35 +481,9 @@ class BayesianaTempoLibero:
 
         # ----------------------------------------------------------------------
         # CPD per Consiglio: calcola la distribuzione in base alle evidenze Attività, Vento e Pioggia.
-        # La logica è simile a quella usata per il ramo freddo:
+        # La logica è la stessa usata per il ramo freddo (vedi genera_cpd_consiglio):
         # si considera il massimo tra Attività, Vento e Pioggia per determinare il rischio.
         # ----------------------------------------------------------------------
-        def genera_cpd_consiglio():
-            values = [[], [], [], [], []]
-            for att in range(5):
-                for vento in range(5):
-                    for pioggia in range(5):
-                        massimo = max(att, vento, pioggia)
-                        if massimo == 0:
-                            rischio = 0.0
-                        elif massimo == 1:
-                            rischio = 0.25
-                        elif massimo == 2:
-                            rischio = 0.40
-                        elif massimo == 3:
-                            rischio = 0.60
-                        else:
-                            rischio = 0.80
-                        p3 = rischio / 2
-                        p4 = rischio / 2
-                        restante = 1 - rischio
-                        if restante < 0:
-                            restante = 0.0
-                        p0 = p1 = p2 = restante / 3 if restante > 0 else 0.0
-                        values[0].append(p0); values[1].append(p1); values[2].append(p2)
-                        values[3].append(p3); values[4].append(p4)
-            return values
-
         self.CPD_consiglio = TabularCPD(
             variable='Consiglio', variable_card=5,
             values=genera_cpd_consiglio(),
@@ -288,29 +505,109 @@ class BayesianaTempoLibero:
             CPD=[self.CPD_attivita, self.CPD_vento, self.CPD_pioggia, self.CPD_consiglio],
             verbose=0
         )
+        # Tensore delle distribuzioni a posteriori (compilato una volta per processo)
+        self.posteriori = _compila_predefinita(self)
+        # Conteggi e metodo dell'ultimo apprendimento (None finché si usano i CPD predefiniti)
+        self.conteggi = None
+        self.metodo_apprendimento = None
+        # Priore delle stime (CPD predefiniti) dopo un aggiornamento della rete predefinita
+        self.priore_parametri = None
 
     # --------------------------------------------------------------------------
-    # Metodo inferenza: esegue l'inferenza sul nodo "Consiglio" dato un dizionario di evidenze.
+    # Metodo inferenza: restituisce la distribuzione di "Consiglio" dato un dizionario
+    # di evidenze, leggendola dal tensore compilato (le evidenze mancanti sono marginalizzate).
     # --------------------------------------------------------------------------
     def inferenza(self, dati):
-        return bnlearn.inference.fit(self.DAG,
-                                     variables=['Consiglio'],
-                                     evidence=dati,
-                                     verbose=0)
+        return interroga_posteriori(self.posteriori, self.Evidenze, dati)
+
+    # --------------------------------------------------------------------------
+    # Metodo inferenza_batch: inferenza vettoriale su N righe di evidenze.
+    # Restituisce (distribuzioni N x 5, probabilità di rischio in percentuale).
+    # --------------------------------------------------------------------------
+    def inferenza_batch(self, righe):
+        return interroga_posteriori_batch(self.posteriori, self.Evidenze, righe)
 
     # --------------------------------------------------------------------------
     # Metodo impara_dataset: aggiorna i parametri della rete utilizzando un dataset,
     # applicando Laplace smoothing (α=1) per evitare probabilità estreme.
     # Se il dataset contiene la colonna 'Attività' (ramo caldo), la usa, altrimenti usa 'Freddo' (ramo freddo).
+    # Con usa_cache=False l'apprendimento viene sempre ripetuto.
     # --------------------------------------------------------------------------
-    def impara_dataset(self, dataset, metodo="bayes"):
+    def impara_dataset(self, dataset, metodo="bayes", usa_cache=True):
         if 'Attività' in dataset.columns:
             dataset = dataset[['Attività', 'Vento', 'Pioggia', 'Consiglio']]
         else:
             dataset = dataset[['Vento', 'Freddo', 'Pioggia', 'Consiglio']]
-        self.DAG = bnlearn.make_DAG(self.Bordi, verbose=0)
-        self.DAG = bnlearn.parameter_learning.fit(
-            self.DAG, dataset,
-            methodtype=metodo,
-            verbose=0
-        )
+        apprendi_parametri(self, dataset, metodo, usa_cache)
+
+    # --------------------------------------------------------------------------
+    # Metodo aggiorna_osservazioni: aggiunge nuove righe etichettate (DataFrame con
+    # le colonne delle evidenze e 'Consiglio', oppure array N x 4 nello stesso
+    # ordine) ai conteggi della rete, aggiornando subito CPD e posteriori.
+    # --------------------------------------------------------------------------
+    def aggiorna_osservazioni(self, righe, metodo=None):
+        aggiorna_parametri(self, righe, metodo)
+
+    # --------------------------------------------------------------------------
+    # Metodo impara_file: apprende i parametri da uno o più file CSV (anche molto
+    # grandi) contandone le righe a blocchi in un pool di processi.
+    # --------------------------------------------------------------------------
+    def impara_file(self, percorsi, metodo="bayes", processi=None):
+        from src.ReteBayesiana import apprendimentoParallelo
+        apprendimentoParallelo.impara_file(self, percorsi, metodo, processi)
+
+# ==============================================================================
+# Funzione: verifica_aggiornamenti()
+# Verifica che gli aggiornamenti incrementali di una rete con i CPD predefiniti
+# ne conservino l'influenza: senza righe la rete resta quella predefinita e ogni
+# riga sposta P(Consiglio | evidenze) della sua configurazione solo del proprio
+# peso rispetto alla dimensione equivalente per configurazione. Restituisce il
+# numero di controlli non superati.
+# ==============================================================================
+def verifica_aggiornamenti(tolleranza=1e-9):
+    fallite = 0
+    for classe in (BayesianaInsoddisfazione, BayesianaTempoLibero):
+        predefinita = rete_compilata_predefinita(classe.__name__)
+        numero_evidenze = len(predefinita.Evidenze)
+
+        rete = classe()
+        rete.aggiorna_osservazioni(numpy.empty((0, numero_evidenze + 1)))
+        if not numpy.allclose(rete.posteriori, predefinita.posteriori, rtol=0, atol=tolleranza):
+            fallite += 1
+
+        # Una riga con le evidenze peggiori e il consiglio più favorevole
+        configurazione, consiglio = (STATI[-1],) * numero_evidenze, STATI[0]
+        rete = classe()
+        rete.aggiorna_osservazioni(numpy.array([configurazione + (consiglio,)]))
+        peso = DIMENSIONE_EQUIVALENTE / len(STATI) ** numero_evidenze
+        attesa = peso * predefinita.condizionata[configurazione]
+        attesa[consiglio] += 1
+        attesa /= peso + 1
+        if not numpy.allclose(rete.posteriori[configurazione], attesa, rtol=0, atol=tolleranza):
+            fallite += 1
+
+        # La massima verosimiglianza ignorerebbe i CPD predefiniti
+        try:
+            classe().aggiorna_osservazioni(numpy.array([configurazione + (consiglio,)]), "maximumlikelihood")
+            fallite += 1
+        except ValueError:
+            pass
+    return fallite
+
+# ==============================================================================
+# Funzione: main()
+# Esegue le verifiche richieste da riga di comando.
+# ==============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reti bayesiane dei rami freddo e caldo")
+    parser.add_argument("--verifica", action="store_true",
+                        help="verifica gli aggiornamenti incrementali delle reti con i CPD predefiniti")
+    argomenti = parser.parse_args(argv)
+    if argomenti.verifica:
+        fallite = verifica_aggiornamenti()
+        print(f"Verifica: {fallite} controlli non superati sugli aggiornamenti", file=sys.stderr)
+        if fallite:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+# ==============================================================================
+# servizioConsigli.py
+#
+# Questo modulo espone il sistema di raccomandazione come servizio HTTP locale
+# (Flask). Reti bayesiane, dataset e ontologia vengono caricati una sola volta
+# all'avvio; le richieste sono elaborate da un pool configurabile di thread o
+# di processi.
+#
+# Endpoint:
+#   - GET  /salute    -> stato del servizio
+#   - POST /consiglio -> raccomandazione in formato JSON
+#
+# Il corpo di /consiglio contiene "attivita", "indoor" e "rete" e, in
+# alternativa:
+#   - "citta": nome della città, per recuperare il meteo online;
+#   - "fascia", "meteo", "temperatura" (°C) e facoltativamente "vento" (km/h),
+#     "indice_vento" (0-4) e "pioggia" (0-4), per i dati inseriti manualmente.
+#
+# Avvio:  python -m src.Servizio.servizioConsigli --porta 8080 --worker 4
+# Con --precarica-citta FILE (CSV citta,lat,lon o JSON) la cache delle
+# coordinate viene popolata all'avvio, evitando le ricerche su Nominatim.
+# Con --tabella FILE le raccomandazioni vengono lette dalla tabella decisionale
+# precalcolata (vedi tabellaConsigli), senza caricare reti bayesiane e ontologia.
+# ==============================================================================
+
+import argparse
+import math
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as TimeoutPool
+
+from flask import Flask, jsonify, request
+
+from src.ClassiSupporto import cacheGeocoding, calcoloConsiglio, previsioniMeteo
+from src.Ontologia.indiceOntologia import ATTIVITA, FASCE_ORARIE, METEO
+
+# Tabella decisionale usata dal processo (None: calcolo con reti e ontologia)
+_tabella = None
+
+# ==============================================================================
+# Classe RichiestaNonValida
+# Errore di validazione del corpo della richiesta (risposta HTTP 400).
+# ==============================================================================
+class RichiestaNonValida(ValueError):
+    pass
+
+# ==============================================================================
+# Funzione: _scelta()
+# Normalizza un campo testuale e verifica che appartenga ai valori ammessi.
+# ==============================================================================
+def _scelta(dati, campo, ammessi):
+    valore = dati.get(campo)
+    if not isinstance(valore, str) or valore.strip().lower() not in ammessi:
+        raise RichiestaNonValida(f"Campo '{campo}' non valido: valori ammessi {', '.join(ammessi)}")
+    return valore.strip().lower()
+
+# ==============================================================================
+# Funzione: _numero()
+# Legge un campo numerico (facoltativo se è indicato un valore predefinito).
+# ==============================================================================
+def _numero(dati, campo, predefinito=None, obbligatorio=False, minimo=None, massimo=None, intero=False):
+    valore = dati.get(campo)
+    if valore is None:
+        if obbligatorio:
+            raise RichiestaNonValida(f"Campo '{campo}' mancante")
+        return predefinito
+    if isinstance(valore, bool) or not isinstance(valore, (int, float)):
+        raise RichiestaNonValida(f"Campo '{campo}' non numerico")
+    # Il parser JSON accetta NaN e Infinity (e 1e400 diventa inf)
+    if not math.isfinite(valore):
+        raise RichiestaNonValida(f"Campo '{campo}' non numerico")
+    if intero and int(valore) != valore:
+        raise RichiestaNonValida(f"Campo '{campo}' deve essere un intero")
+    if (minimo is not None and valore < minimo) or (massimo is not None and valore > massimo):
+        raise RichiestaNonValida(f"Campo '{campo}' fuori dall'intervallo ammesso")
+    return int(valore) if intero else valore
+
+# ==============================================================================
+# Funzione: valida_richiesta()
+# Controlla il corpo JSON della richiesta e restituisce un dizionario normalizzato.
+# ==============================================================================
+def valida_richiesta(dati):
+    if not isinstance(dati, dict):
+        raise RichiestaNonValida("Il corpo della richiesta deve essere un oggetto JSON")
+    richiesta = {"attivita": _scelta(dati, "attivita", ATTIVITA)}
+
+    indoor = dati.get("indoor")
+    if isinstance(indoor, bool):
+        indoor = "si" if indoor else "no"
+    richiesta["indoor"] = _scelta({"indoor": indoor}, "indoor", ["si", "no"])
+    richiesta["rete"] = _scelta({"rete": str(dati.get("rete", "1"))}, "rete", ["1", "2"])
+
+    if "citta" in dati:
+        if not isinstance(dati["citta"], str) or not dati["citta"].strip():
+            raise RichiestaNonValida("Campo 'citta' non valido")
+        richiesta["citta"] = dati["citta"].strip()
+        return richiesta
+
+    richiesta["fascia"] = _scelta(dati, "fascia", FASCE_ORARIE)
+    richiesta["meteo"] = _scelta(dati, "meteo", METEO)
+    richiesta["temperatura"] = _numero(dati, "temperatura", obbligatorio=True)
+    richiesta["vento"] = _numero(dati, "vento", predefinito=0.0, minimo=0)
+    richiesta["indice_vento"] = _numero(dati, "indice_vento", minimo=0, massimo=4, intero=True)
+    richiesta["pioggia"] = _numero(dati, "pioggia", predefinito=0, minimo=0, massimo=4, intero=True)
+    return richiesta
+
+# ==============================================================================
+# Funzione: messaggio_rischio()
+# Restituisce il messaggio che stampa_rischio_finale mostrerebbe all'utente
+# (None se non c'è allerta e quindi il rischio finale non viene calcolato).
+# ==============================================================================
+def messaggio_rischio(risultato):
+    if not risultato.allerta:
+        return None
+    if risultato.rischio_annullato:
+        return "Avendo accesso ad una struttura indoor il rischio si annulla!"
+    return f"Il rischio di insoddisfazione è del {round(risultato.probabilita_rischio, 2)}% a causa del meteo."
+
+# ==============================================================================
+# Funzione: risultato_in_json()
+# Converte un RisultatoConsiglio in un dizionario serializzabile in JSON, con le
+# stesse informazioni stampate da stampa_risultato e stampa_rischio_finale.
+# ==============================================================================
+def risultato_in_json(risultato):
+    risoluzione = risultato.raccomandazione
+    corpo = {
+        "ramo": risultato.ramo,
+        "allerta": risultato.allerta,
+        "probabilita_rischio": risultato.probabilita_rischio,
+        "rischio_annullato": risultato.rischio_annullato,
+        "messaggio_rischio": messaggio_rischio(risultato),
+        "chiave": risoluzione.chiave,
+        "avvisi": [],
+        "raccomandazione": None,
+    }
+    if risoluzione.avviso_rovesci:
+        corpo["avvisi"].append("Nessuna attività specifica trovata per condizioni outdoor con rovesci. "
+                               "Verranno fornite raccomandazioni generali.")
+    if risoluzione.raccomandazione is None:
+        if risoluzione.luogo == "indoor":
+            corpo["avvisi"].append("Non sono state trovate alternative.")
+        else:
+            corpo["avvisi"].append("Non è stato possibile trovare l'individuo per la chiave: " + risoluzione.chiave)
+    else:
+        corpo["raccomandazione"] = risoluzione.raccomandazione._asdict()
+    return corpo
+
+# ==============================================================================
+# Funzione: esegui_richiesta()
+# Elabora una richiesta già validata nel worker del pool.
+# Restituisce la coppia (codice HTTP, corpo JSON).
+# ==============================================================================
+def esegui_richiesta(richiesta):
+    dati_meteo = None
+    if "citta" in richiesta:
+        try:
+            dati_meteo = previsioniMeteo.previsioni_citta(richiesta["citta"])
+        except Exception as e:
+            return 502, {"errore": "Errore nel recupero dei dati meteo online: " + str(e)}
+        if dati_meteo is None:
+            return 404, {"errore": "Città non trovata: " + richiesta["citta"]}
+        # Come nel percorso interattivo online, la pioggia non è disponibile (0)
+        richiesta = dict(richiesta, fascia=dati_meteo["fascia"], meteo=dati_meteo["meteo"],
+                         temperatura=dati_meteo["temperatura"], vento=dati_meteo["vento"], pioggia=0)
+        del richiesta["citta"]
+
+    if _tabella is not None:
+        corpo = risultato_in_json(_tabella.consiglio(richiesta))
+    else:
+        corpo = risultato_in_json(calcoloConsiglio.calcola_consiglio(richiesta))
+    if dati_meteo is not None:
+        corpo["dati_meteo"] = dati_meteo
+    return 200, corpo
+
+# ==============================================================================
+# Funzione: usa_tabella()
+# Carica la tabella decisionale del processo (nei worker del pool di processi
+# viene eseguita come inizializzazione).
+# ==============================================================================
+def usa_tabella(percorso):
+    global _tabella
+    from src.ClassiSupporto import tabellaConsigli
+    _tabella = tabellaConsigli.TabellaConsigli.carica(percorso)
+    return _tabella
+
+# ==============================================================================
+# Funzione: crea_pool()
+# Crea il pool di worker ("thread" o "process") e vi precarica le risorse
+# (oppure la sola tabella decisionale, se indicata).
+# ==============================================================================
+def crea_pool(worker=4, tipo_pool="thread", tabella=None):
+    inizializza, argomenti = (usa_tabella, (tabella,)) if tabella else (calcoloConsiglio.precarica_risorse, ())
+    if tipo_pool == "process":
+        return ProcessPoolExecutor(max_workers=worker, initializer=inizializza, initargs=argomenti)
+    if tipo_pool != "thread":
+        raise ValueError("Tipo di pool non valido: " + str(tipo_pool))
+    inizializza(*argomenti)
+    return ThreadPoolExecutor(max_workers=worker, thread_name_prefix="consiglio")
+
+# ==============================================================================
+# Funzione: crea_app()
+# Crea l'applicazione Flask che inoltra le richieste al pool di worker.
+# ==============================================================================
+def crea_app(worker=4, tipo_pool="thread", timeout=30, tabella=None):
+    app = Flask(__name__)
+    app.json.ensure_ascii = False
+    pool = crea_pool(worker, tipo_pool, tabella)
+    app.config["POOL_CONSIGLI"] = pool
+
+    @app.get("/salute")
+    def salute():
+        return jsonify({"stato": "ok", "worker": worker, "tipo_pool": tipo_pool, "tabella": bool(tabella)})
+
+    @app.post("/consiglio")
+    def consiglio():
+        try:
+            richiesta = valida_richiesta(request.get_json(silent=True))
+        except RichiestaNonValida as e:
+            return jsonify({"errore": str(e)}), 400
+        try:
+            codice, corpo = pool.submit(esegui_richiesta, richiesta).result(timeout=timeout)
+        except TimeoutPool:
+            return jsonify({"errore": "Tempo di elaborazione scaduto"}), 504
+        return jsonify(corpo), codice
+
+    return app
+
+# ==============================================================================
+# Funzione: main()
+# Avvia il servizio dalla riga di comando.
+# ==============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servizio HTTP di raccomandazione delle attività")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8080)
+    parser.add_argument("--worker", type=int, default=4, help="numero di worker del pool")
+    parser.add_argument("--tipo-pool", choices=["thread", "process"], default="thread")
+    parser.add_argument("--timeout", type=float, default=30, help="secondi massimi per richiesta")
+    parser.add_argument("--precarica-citta", metavar="FILE", help="file CSV o JSON con le coordinate delle città")
+    parser.add_argument("--tabella", metavar="FILE", help="risponde dalla tabella decisionale precalcolata")
+    argomenti = parser.parse_args(argv)
+    if argomenti.tabella:
+        from src.ClassiSupporto import tabellaConsigli
+        if tabellaConsigli.TabellaConsigli.carica(argomenti.tabella).aggiornata() is False:
+            print("Attenzione: la tabella non corrisponde ai sorgenti attuali, ricompilarla con "
+                  "python -m src.ClassiSupporto.tabellaConsigli --compila")
+    if argomenti.precarica_citta:
+        caricate = cacheGeocoding.cache_predefinita().precarica(argomenti.precarica_citta)
+        print(f"Precaricate le coordinate di {caricate} città")
+    app = crea_app(argomenti.worker, argomenti.tipo_pool, argomenti.timeout, argomenti.tabella)
+    app.run(host=argomenti.host, port=argomenti.porta, threaded=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+# ==============================================================================
+# riproduzioneSessioni.py
+#
+# Questo modulo esegue il motore ConsigliAttivita dall'inizio alla fine leggendo
+# le risposte dell'utente da una trascrizione invece che dalla tastiera, per i
+# test di regressione e di carico dell'intero flusso delle regole.
+#
+# Una trascrizione è un dizionario con:
+#   - "nome": identificativo della sessione (facoltativo)
+#   - "risposte": lista delle risposte, nell'ordine in cui vengono chieste
+#   - "citta": (facoltativo) città note al percorso online, nella forma
+#       {"Bari": {"coordinate": [41.12, 16.87], "meteo": {...}}, "Nessuna": null}
+#     dove "meteo" è la risposta JSON di OpenWeatherMap da restituire e null
+#     indica una città non trovata;
+#   - "atteso": (facoltativo) testi che devono comparire nell'output stampato.
+#
+# Il file può contenere una lista JSON, una trascrizione JSON per riga (.jsonl)
+# oppure una lista YAML (.yaml/.yml, richiede PyYAML).
+#
+# Nel percorso online la geocodifica usa solo le città delle trascrizioni e il
+# meteo viene servito da un server HTTP locale che sostituisce OpenWeatherMap:
+# nessuna richiesta esce dalla macchina. Le trascrizioni vengono distribuite
+# tra più processi; per ogni sessione si registrano l'output stampato, i fatti
+# finali del motore, la durata, l'eventuale errore e il profilo delle regole
+# eseguite (vedi strumentazione.py).
+#
+# Uso:
+#   python -m src.SistemaEsperto.riproduzioneSessioni trascrizioni.jsonl --processi 8 --output esiti.jsonl
+# ==============================================================================
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Numero di trascrizioni inviate insieme a ciascun processo
+DIMENSIONE_BLOCCO = 32
+
+# --------------------------------------------------------------------------
+# EsitoSessione: risultato della riproduzione di una trascrizione.
+#   - nome: nome della trascrizione
+#   - completata: True se il motore è terminato senza errori
+#   - esito: esito del RisultatoSessione (None in caso di errore)
+#   - uscita: testo stampato durante la sessione (domande e risposte comprese)
+#   - fatti: fatti presenti nel motore al termine, come dizionari
+#   - errore: messaggio d'errore, oppure None
+#   - durata: durata della sessione in secondi
+#   - mancanti: testi di "atteso" non presenti nell'uscita
+#   - regole: riepilogo della Strumentazione della sessione
+# --------------------------------------------------------------------------
+EsitoSessione = namedtuple("EsitoSessione", ["nome", "completata", "esito", "uscita", "fatti", "errore",
+                                             "durata", "mancanti", "regole"])
+
+# Motori del processo, riusati da tutte le sessioni (vedi sistemaEsperto.PoolMotori)
+_pool_motori = None
+
+# ==============================================================================
+# Classe RisposteEsaurite
+# La sessione ha chiesto più risposte di quelle presenti nella trascrizione
+# (l'equivalente della fine dell'input per input()).
+# ==============================================================================
+class RisposteEsaurite(EOFError):
+    pass
+
+# ==============================================================================
+# Funzione: carica_trascrizioni()
+# Legge le trascrizioni da un file JSON, JSONL o YAML e le restituisce come lista.
+# ==============================================================================
+def carica_trascrizioni(percorso):
+    with open(percorso, encoding="utf-8") as file:
+        if percorso.lower().endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("Per leggere trascrizioni YAML è necessario installare PyYAML")
+            dati = yaml.safe_load(file)
+        elif percorso.lower().endswith(".jsonl"):
+            dati = [json.loads(riga) for riga in file if riga.strip()]
+        else:
+            dati = json.load(file)
+    trascrizioni = [dati] if isinstance(dati, dict) else list(dati or [])
+    for i, trascrizione in enumerate(trascrizioni):
+        if not isinstance(trascrizione, dict) or not isinstance(trascrizione.get("risposte"), list):
+            raise ValueError(f"Trascrizione {i} non valida in {percorso}: manca la lista 'risposte'")
+        trascrizione.setdefault("nome", str(i))
+    return trascrizioni
+
+# ==============================================================================
+# Funzione: unisci_citta()
+# Raccoglie le città di tutte le trascrizioni in un unico dizionario
+# (a parità di nome prevale l'ultima trascrizione).
+# ==============================================================================
+def unisci_citta(trascrizioni):
+    citta = {}
+    for trascrizione in trascrizioni:
+        citta.update(trascrizione.get("citta") or {})
+    return citta
+
+# ==============================================================================
+# Funzione: _chiave_coordinate()
+# Chiave con cui il server locale associa le coordinate ai dati meteo.
+# ==============================================================================
+def _chiave_coordinate(lat, lon):
+    return f"{float(lat):.4f},{float(lon):.4f}"
+
+# ==============================================================================
+# Classe _GestoreMeteo
+# Risponde alle richieste "/weather" con i dati meteo delle trascrizioni
+# (404 se le coordinate non corrispondono a nessuna città).
+# ==============================================================================
+class _GestoreMeteo(BaseHTTPRequestHandler):
+    def do_GET(self):
+        parametri = parse_qs(urlparse(self.path).query)
+        try:
+            chiave = _chiave_coordinate(parametri["lat"][0], parametri["lon"][0])
+        except (KeyError, ValueError):
+            chiave = None
+        dati = self.server.meteo.get(chiave)
+        corpo = json.dumps(dati if dati is not None else {"cod": "404", "message": "city not found"}).encode()
+        self.send_response(200 if dati is not None else 404)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+# ==============================================================================
+# Funzione: avvia_server_meteo()
+# Avvia in un thread il server locale che sostituisce OpenWeatherMap per le città
+# indicate. Restituisce (server, url); il server si ferma con server.shutdown().
+# ==============================================================================
+def avvia_server_meteo(citta, host="127.0.0.1", porta=0):
+    server = ThreadingHTTPServer((host, porta), _GestoreMeteo)
+    server.daemon_threads = True
+    server.meteo = {_chiave_coordinate(*voce["coordinate"]): voce["meteo"]
+                    for voce in citta.values() if voce is not None and voce.get("meteo") is not None}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/data/2.5/weather"
+
+# Posizione restituita dal geolocatore delle trascrizioni (come quella di geopy)
+_Posizione = namedtuple("_Posizione", ["latitude", "longitude"])
+
+# ==============================================================================
+# Classe _GeolocatoreTrascrizioni
+# Sostituisce Nominatim: conosce solo le città delle trascrizioni.
+# ==============================================================================
+class _GeolocatoreTrascrizioni:
+    def __init__(self, citta):
+        from src.ClassiSupporto import cacheGeocoding
+        self.coordinate = {cacheGeocoding.normalizza_citta(nome): voce["coordinate"]
+                           for nome, voce in citta.items() if voce is not None}
+
+    def geocode(self, nome_citta):
+        from src.ClassiSupporto import cacheGeocoding
+        coordinate = self.coordinate.get(cacheGeocoding.normalizza_citta(nome_citta))
+        if coordinate is None:
+            return None
+        return _Posizione(float(coordinate[0]), float(coordinate[1]))
+
+# ==============================================================================
+# Funzione: prepara_processo()
+# Prepara il processo corrente alla riproduzione: geocodifica sulle città delle
+# trascrizioni (cache solo in memoria), meteo dal server locale senza cache,
+# log ridotti e risorse condivise già caricate.
+# ==============================================================================
+def prepara_processo(citta, url_meteo):
+    from src.ClassiSupporto import cacheGeocoding, cacheMeteo, calcoloConsiglio, previsioniMeteo
+    logging.getLogger("experta").setLevel(logging.WARNING)
+    logging.getLogger("pgmpy").setLevel(logging.ERROR)
+    cacheGeocoding.configura_cache()
+    # Ogni sessione online interroga il server locale (cache del meteo disattivata)
+    cacheMeteo.configura_cache(ttl=0)
+    previsioniMeteo.URL_METEO = url_meteo
+    previsioniMeteo._geolocator = _GeolocatoreTrascrizioni(citta)
+    with contextlib.redirect_stdout(io.StringIO()):
+        calcoloConsiglio.precarica_risorse()
+
+# ==============================================================================
+# Funzione: processo_preparato()
+# Context manager per riprodurre le sessioni nel processo corrente: applica
+# prepara_processo() e al termine ripristina URL del meteo, geolocalizzatore,
+# cache e livelli dei log del chiamante (le cache della riproduzione vengono chiuse).
+# ==============================================================================
+@contextlib.contextmanager
+def processo_preparato(citta, url_meteo):
+    from src.ClassiSupporto import cacheGeocoding, cacheMeteo, previsioniMeteo
+    logger = [logging.getLogger(nome) for nome in ["experta", "pgmpy"]]
+    originali = (previsioniMeteo.URL_METEO, previsioniMeteo._geolocator, [l.level for l in logger])
+    cache_originali = []
+    # Le cache del chiamante vengono solo scollegate: configura_cache chiuderebbe quelle in uso
+    for modulo in [cacheGeocoding, cacheMeteo]:
+        with modulo._lock_cache:
+            cache_originali.append(modulo._cache_predefinita)
+            modulo._cache_predefinita = None
+    try:
+        prepara_processo(citta, url_meteo)
+        yield
+    finally:
+        for modulo, cache in zip([cacheGeocoding, cacheMeteo], cache_originali):
+            with modulo._lock_cache:
+                riproduzione, modulo._cache_predefinita = modulo._cache_predefinita, cache
+            if riproduzione is not None:
+                riproduzione.chiudi()
+        previsioniMeteo.URL_METEO, previsioniMeteo._geolocator, livelli = originali
+        for l, livello in zip(logger, livelli):
+            l.setLevel(livello)
+
+# ==============================================================================
+# Funzione: _pool_processo()
+# Restituisce il pool (di un solo motore) del processo, creandolo se serve.
+# ==============================================================================
+def _pool_processo():
+    global _pool_motori
+    if _pool_motori is None:
+        from src.SistemaEsperto import sistemaEsperto
+        _pool_motori = sistemaEsperto.PoolMotori(1)
+    return _pool_motori
+
+# ==============================================================================
+# Funzione: esegui_trascrizione()
+# Esegue una sessione del motore con le risposte della trascrizione e ne
+# restituisce l'EsitoSessione. Il processo deve essere stato preparato con
+# prepara_processo() se la trascrizione usa il percorso online.
+# ==============================================================================
+def esegui_trascrizione(trascrizione):
+    from src.ClassiSupporto import interfacciaConUtente
+    from src.SistemaEsperto import strumentazione
+
+    risposte = iter(trascrizione["risposte"])
+    uscita = io.StringIO()
+
+    def leggi_risposta(messaggio):
+        try:
+            risposta = str(next(risposte))
+        except StopIteration:
+            raise RisposteEsaurite("Risposte terminate alla domanda: " + messaggio.strip())
+        # Riporta domanda e risposta nell'uscita, come apparirebbero sul terminale
+        print(messaggio + risposta)
+        return risposta
+
+    misure = strumentazione.Strumentazione()
+    esito = errore = None
+    inizio = time.perf_counter()
+    with _pool_processo().preleva() as motore, contextlib.redirect_stdout(uscita):
+        try:
+            esito = motore.esegui_sessione(interfacciaConUtente.SessioneUtente(leggi_risposta), misure).esito
+        except Exception as e:
+            errore = f"{type(e).__name__}: {e}"
+        # Fatti serializzabili in JSON (anche quelli rimasti dopo un errore)
+        fatti = json.loads(json.dumps(motore.fatti(), default=str))
+    durata = time.perf_counter() - inizio
+    testo = uscita.getvalue()
+    mancanti = [atteso for atteso in trascrizione.get("atteso", []) if atteso not in testo]
+    return EsitoSessione(trascrizione.get("nome"), errore is None, esito, testo, fatti,
+                         errore, durata, mancanti, misure.riepilogo())
+
+# ==============================================================================
+# Funzione: _esegui_blocco()
+# Esegue un blocco di trascrizioni (nei processi del pool).
+# ==============================================================================
+def _esegui_blocco(trascrizioni):
+    return [esegui_trascrizione(trascrizione) for trascrizione in trascrizioni]
+
+# ==============================================================================
+# Funzione: riproduci_trascrizioni()
+# Generatore: esegue tutte le trascrizioni distribuendole a blocchi tra
+# "processi" processi (None: uno per CPU) e restituisce gli EsitoSessione
+# nell'ordine delle trascrizioni. Con processi=1 le sessioni vengono eseguite
+# nel processo corrente, preparato con processo_preparato() e ripristinato al termine.
+# ==============================================================================
+def riproduci_trascrizioni(trascrizioni, processi=None, dimensione_blocco=DIMENSIONE_BLOCCO):
+    trascrizioni = list(trascrizioni)
+    citta = unisci_citta(trascrizioni)
+    server, url_meteo = avvia_server_meteo(citta)
+    try:
+        processi = processi or os.cpu_count() or 1
+        blocchi = [trascrizioni[i:i + dimensione_blocco] for i in range(0, len(trascrizioni), dimensione_blocco)]
+        if processi == 1 or len(blocchi) <= 1:
+            with processo_preparato(citta, url_meteo):
+                for blocco in blocchi:
+                    yield from _esegui_blocco(blocco)
+            return
+        with ProcessPoolExecutor(max_workers=min(processi, len(blocchi)), initializer=prepara_processo,
+                                 initargs=(citta, url_meteo)) as pool:
+            for esiti in pool.map(_esegui_blocco, blocchi):
+                yield from esiti
+    finally:
+        server.shutdown()
+        server.server_close()
+
+# ==============================================================================
+# Funzione: main()
+# Riproduce le trascrizioni di un file, scrive gli esiti (JSON, uno per riga) e
+# stampa un riepilogo. Termina con codice 1 se qualche sessione fallisce o non
+# stampa i testi attesi.
+# ==============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Riproduzione di sessioni del sistema esperto da trascrizioni")
+    parser.add_argument("file", help="trascrizioni in JSON, JSONL o YAML")
+    parser.add_argument("--processi", type=int, help="numero di processi (predefinito: uno per CPU)")
+    parser.add_argument("--blocco", type=int, default=DIMENSIONE_BLOCCO, help="trascrizioni inviate insieme a un processo")
+    parser.add_argument("--ripeti", type=int, default=1, help="esegue ogni trascrizione più volte (test di carico)")
+    parser.add_argument("--output", help="file JSONL in cui scrivere gli esiti")
+    parser.add_argument("--mostra-fallite", action="store_true", help="stampa l'uscita delle sessioni fallite")
+    argomenti = parser.parse_args(argv)
+
+    trascrizioni = carica_trascrizioni(argomenti.file) * argomenti.ripeti
+    output = open(argomenti.output, "w", encoding="utf-8") if argomenti.output else None
+    durate = []
+    fallite = 0
+    inizio = time.perf_counter()
+    try:
+        for esito in riproduci_trascrizioni(trascrizioni, argomenti.processi, argomenti.blocco):
+            durate.append(esito.durata)
+            if not esito.completata or esito.mancanti:
+                fallite += 1
+                print(f"FALLITA {esito.nome}: {esito.errore or 'testi mancanti ' + str(esito.mancanti)}")
+                if argomenti.mostra_fallite:
+                    print(esito.uscita)
+            if output is not None:
+                output.write(json.dumps(esito._asdict(), ensure_ascii=False) + "\n")
+    finally:
+        if output is not None:
+            output.close()
+    totale = time.perf_counter() - inizio
+
+    durate.sort()
+    print("\n======================= RIEPILOGO SESSIONI =========================")
+    print("Sessioni ->", len(durate), " completate ->", len(durate) - fallite, " fallite ->", fallite)
+    if durate:
+        print(f"Tempo totale -> {totale:.2f} s  ({len(durate) / totale:.1f} sessioni/s)")
+        print(f"Durata per sessione -> p50 {durate[len(durate) // 2] * 1000:.1f} ms  "
+              f"p99 {durate[min(len(durate) - 1, int(len(durate) * 0.99))] * 1000:.1f} ms")
+    print("====================================================================")
+    if fallite:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
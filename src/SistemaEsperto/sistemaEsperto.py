@@ -4,9 +4,43 @@
 # Questo modulo implementa il motore del sistema esperto usando la libreria
 # experta. Esso gestisce l'interazione con l'utente tramite l'ontologia e le
 # regole basate sui dati meteo e sull'attività scelta.
+#
+# Ogni motore possiede la propria SessioneUtente, passata alle funzioni di
+# interfacciaConUtente: più motori possono essere eseguiti nello stesso processo.
+# Con una Strumentazione (vedi strumentazione.py) ogni esecuzione di regola
+# viene misurata.
+#
+# Un motore può essere riusato per molte sessioni (esegui_sessione), senza
+# ricostruire la rete RETE: la memoria di lavoro viene azzerata tra una sessione
+# e l'altra. PoolMotori mantiene alcuni motori già costruiti, prelevati da una
+# sessione alla volta.
 # ==============================================================================
+import queue
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
 from experta import *
+from experta.agenda import Agenda
+from experta.factlist import FactList
 from src.ClassiSupporto import interfacciaConUtente
+from src.SistemaEsperto import strumentazione as misure
+
+# Esiti di una sessione
+ESITO_COMPLETATA = "completata"    # Raccomandazione stampata
+ESITO_INTERROTTA = "interrotta"    # L'utente ha scelto di non inserire i dati
+ESITO_INCOMPLETA = "incompleta"    # Nessuna regola applicabile prima della fine
+
+# Fatti riportati nei dati del RisultatoSessione
+CAMPI_RISULTATO = ("fascia_oraria", "meteo", "temperatura", "pioggia", "vento", "attivita", "indoor", "rete")
+
+# --------------------------------------------------------------------------
+# RisultatoSessione: risultato di una sessione del motore.
+#   - esito: ESITO_COMPLETATA, ESITO_INTERROTTA o ESITO_INCOMPLETA
+#   - dati: valori dei fatti in CAMPI_RISULTATO (solo quelli dichiarati)
+#   - fatti: tutti i fatti della memoria di lavoro al termine, come dizionari
+# --------------------------------------------------------------------------
+RisultatoSessione = namedtuple("RisultatoSessione", ["esito", "dati", "fatti"])
 
 # ==============================================================================
 # Classe ConsigliAttivita
@@ -14,6 +48,80 @@ from src.ClassiSupporto import interfacciaConUtente
 # ==============================================================================
 class ConsigliAttivita(KnowledgeEngine):
 
+    def __init__(self, sessione=None, strumentazione=None):
+        """
+        Crea il motore:
+          - sessione: sessione utente (se non indicata, ne viene creata una nuova)
+          - strumentazione: Strumentazione facoltativa che misura le regole eseguite
+            e le attese di input e servizi della sessione
+        """
+        super().__init__()
+        self.sessione = sessione if sessione is not None else interfacciaConUtente.SessioneUtente()
+        self.strumentazione = strumentazione
+        self.sessione.strumentazione = strumentazione
+        self.esito = ESITO_INCOMPLETA
+
+    # --------------------------------------------------------------------------
+    # Metodo esegui_sessione: esegue una sessione completa con la sessione utente
+    # indicata (nuova se None), partendo da una memoria di lavoro azzerata, e ne
+    # restituisce il RisultatoSessione. Le eccezioni delle regole sono propagate.
+    # --------------------------------------------------------------------------
+    def esegui_sessione(self, sessione=None, strumentazione=None):
+        self.sessione = sessione if sessione is not None else interfacciaConUtente.SessioneUtente()
+        self.strumentazione = strumentazione
+        self.sessione.strumentazione = strumentazione
+        self.esito = ESITO_INCOMPLETA
+        self.reset()
+        self.run()
+        return self.risultato()
+
+    # --------------------------------------------------------------------------
+    # Metodo fatti: fatti della memoria di lavoro come dizionari (senza il
+    # fatto iniziale).
+    # --------------------------------------------------------------------------
+    def fatti(self):
+        return [fatto.as_dict() for fatto in self.facts.values() if len(fatto)]
+
+    # --------------------------------------------------------------------------
+    # Metodo risultato: RisultatoSessione della sessione corrente.
+    # --------------------------------------------------------------------------
+    def risultato(self):
+        fatti = self.fatti()
+        dati = {campo: valore for fatto in fatti for campo, valore in fatto.items() if campo in CAMPI_RISULTATO}
+        return RisultatoSessione(self.esito, dati, fatti)
+
+    # --------------------------------------------------------------------------
+    # Metodo azzera: svuota memoria di lavoro e agenda e scollega sessione e
+    # strumentazione, così che il motore inattivo non trattenga i fatti (né i
+    # riferimenti) dell'ultima sessione.
+    # --------------------------------------------------------------------------
+    def azzera(self):
+        self.agenda = Agenda()
+        self.facts = FactList()
+        self.matcher.reset()
+        self.sessione = interfacciaConUtente.SessioneUtente()
+        self.strumentazione = None
+        self.esito = ESITO_INCOMPLETA
+
+    # --------------------------------------------------------------------------
+    # Metodo run: esegue le regole, misurando l'esecuzione se richiesto.
+    # --------------------------------------------------------------------------
+    def run(self, steps=float("inf")):
+        if self.strumentazione is None:
+            return super().run(steps)
+        with self.strumentazione.esecuzione():
+            return super().run(steps)
+
+    # --------------------------------------------------------------------------
+    # Metodo declare: dichiara i fatti, misurando l'aggiornamento della rete
+    # RETE se richiesto.
+    # --------------------------------------------------------------------------
+    def declare(self, *facts):
+        if self.strumentazione is None:
+            return super().declare(*facts)
+        with self.strumentazione.dichiarazione():
+            return super().declare(*facts)
+
     # --------------------------------------------------------------------------
     # Definizione dei fatti iniziali
     # --------------------------------------------------------------------------
@@ -27,29 +135,33 @@ class ConsigliAttivita(KnowledgeEngine):
 
     # Regola per la richiesta della modalità di ricerca (online)
     @Rule(Fact(azione="chiedereOnline"), salience=1)
+    @misure.misura_regola
     def chiedere_online(self):
         # Chiede all'utente se vuole cercare i dati meteo online e dichiara il fatto
         # corrispondente.
-        self.declare(Fact(azione=interfacciaConUtente.chiedi_online()))
+        self.declare(Fact(azione=interfacciaConUtente.chiedi_online(self.sessione)))
 
     # Regola per la ricerca delle informazioni meteo online
     @Rule(Fact(azione='trovareInformazioniOnline'),
           NOT(Fact(risultato=W())), salience=1)
+    @misure.misura_regola
     def ricerca_informazioni(self):
         # Se l'azione è quella di trovare informazioni online, effettua la ricerca
         # ed estrae il risultato.
-        self.declare(Fact(risultato=interfacciaConUtente.risultati_previsioni()))
+        self.declare(Fact(risultato=interfacciaConUtente.risultati_previsioni(self.sessione)))
 
     # Gestione dell'errore: città non trovata
     @Rule(Fact(risultato="trovareInformazioniOffline"), salience=0)
+    @misure.misura_regola
     def errore_citta_non_trovata(self):
         # Se non si trovano informazioni online, chiede all'utente se vuole inserire
         # manualmente i dati.
-        self.declare(Fact(scelta=interfacciaConUtente.chiedi_inserimento_manuale()))
+        self.declare(Fact(scelta=interfacciaConUtente.chiedi_inserimento_manuale(self.sessione)))
 
     # Regola per passare alle informazioni offline se non ci sono dati online
     @Rule(AND(NOT(Fact(risultato="trovareInformazioniOffline"))),
           Fact(risultato=MATCH.risultato), salience=0)
+    @misure.misura_regola
     def greet(self, risultato):
         # Se i dati online sono stati trovati, estrae fascia oraria, meteo e temperatura
         # e passa all'azione successiva.
@@ -60,41 +172,45 @@ class ConsigliAttivita(KnowledgeEngine):
 
     # Regola per terminare il sistema se l'utente decide di non procedere
     @Rule(Fact(scelta="no"), salience=0)
+    @misure.misura_regola
     def fine_elaborazione(self):
+        self.esito = ESITO_INTERROTTA
         self.declare(Fact(azione="terminaAnalisi"))
         print("Fine del sistema esperto")
 
     # Regola per acquisire informazioni in modalità offline
     @Rule(OR(Fact(scelta="si"), Fact(azione="trovareInformazioniOffline")), salience=0)
+    @misure.misura_regola
     def chiedere_informazioni_offline(self):
         # Chiede all'utente la fascia oraria
-        fascia = interfacciaConUtente.chiedi_fascia_oraria()
+        fascia = interfacciaConUtente.chiedi_fascia_oraria(self.sessione)
         # Chiede all'utente le condizioni del meteo
-        meteo = interfacciaConUtente.chiedi_meteo()
+        meteo = interfacciaConUtente.chiedi_meteo(self.sessione)
         self.declare(Fact(fascia_oraria=fascia))
         self.declare(Fact(meteo=meteo))
         # Se le condizioni meteo sono "rovesci", chiede anche l'intensità della pioggia.
         if meteo.strip().lower() == "rovesci":
-            self.declare(Fact(pioggia=interfacciaConUtente.chiedi_pioggia()))
+            self.declare(Fact(pioggia=interfacciaConUtente.chiedi_pioggia(self.sessione)))
         # Chiede all'utente la temperatura
-        self.declare(Fact(temperatura=interfacciaConUtente.chiedi_temperatura()))
+        self.declare(Fact(temperatura=interfacciaConUtente.chiedi_temperatura(self.sessione)))
         # Chiede all'utente il vento
-        self.declare(Fact(vento=interfacciaConUtente.chiedi_vento()))
+        self.declare(Fact(vento=interfacciaConUtente.chiedi_vento(self.sessione)))
         # Passa all'azione successiva, cioè la richiesta del tipo di attività.
         self.declare(Fact(azione="chiediAttivita"))
 
     # Regola per acquisire il tipo di attività e l'accesso a strutture indoor,
     # quindi valutare l'allerta meteo tramite rete bayesiana.
     @Rule(Fact(azione="chiediAttivita"), salience=0)
+    @misure.misura_regola
     def chiedere_attivita(self):
         # Chiede al'utente il tipo di attività preferita
-        attivita = interfacciaConUtente.chiedi_attivita()
+        attivita = interfacciaConUtente.chiedi_attivita(self.sessione)
         self.declare(Fact(attivita=attivita))
         # Chiede all'utente se ha accesso a strutture indoor
-        indoor_risposta = interfacciaConUtente.chiedi_indoor()
+        indoor_risposta = interfacciaConUtente.chiedi_indoor(self.sessione)
         self.declare(Fact(indoor=indoor_risposta))
         # Valuta il rischio meteo attraverso la rete bayesiana.
-        rischio_alto = interfacciaConUtente.stampa_allerta_meteo()
+        rischio_alto = interfacciaConUtente.stampa_allerta_meteo(self.sessione)
         if rischio_alto:
             # Se viene rilevata un'anomalia meteo, chiede all'utente di scegliere la rete bayesiana.
             self.declare(Fact(azione="chiediTipoRete"))
@@ -104,13 +220,13 @@ class ConsigliAttivita(KnowledgeEngine):
 
     # Regola per la scelta della rete bayesiana da utilizzare in caso di allerta meteo.
     @Rule(Fact(azione="chiediTipoRete"), salience=1)
+    @misure.misura_regola
     def chiedere_tipo_rete(self):
-        rete_choice = input("Rilevata anomalia meteorologica, seleziona il tipo di rete bayesiana da utilizzare:\n(1) Rete bayesiana data\n(2) Rete bayesiana con apprendimento dal dataset\nRisposta: ")
+        rete_choice = self.sessione.chiedi("Rilevata anomalia meteorologica, seleziona il tipo di rete bayesiana da utilizzare:\n(1) Rete bayesiana data\n(2) Rete bayesiana con apprendimento dal dataset\nRisposta: ")
         self.declare(Fact(rete=rete_choice))
         # Dopo la scelta, si stampa il rischio finale utilizzando la rete aggiornata.
-        from src.ClassiSupporto import interfacciaConUtente
-        interfacciaConUtente.rete = rete_choice
-        interfacciaConUtente.stampa_rischio_finale()
+        self.sessione.rete = rete_choice
+        interfacciaConUtente.stampa_rischio_finale(self.sessione)
         self.declare(Fact(azione="stampaAttivita"))
 
     # Regola per stampare le attività consigliate in base alle informazioni raccolte.
@@ -121,22 +237,82 @@ class ConsigliAttivita(KnowledgeEngine):
           Fact(temperatura=MATCH.temperatura),
           Fact(meteo=MATCH.meteo),
           salience=0)
+    @misure.misura_regola
     def stampare_attivita(self, attivita, indoor, fascia_oraria, temperatura, meteo):
         # Chiamata alla funzione di stampa dei risultati
         interfacciaConUtente.stampa_risultato(attivita, indoor, fascia_oraria, temperatura, meteo)
         # Dopo la stampa, passa all'azione finale per evitare di ripetere l'inferenza.
         self.declare(Fact(azione="stampaAccessorio"))
 
-    # Regola finale per terminare il sistema, stampando un separatore e terminando l'esecuzione.
+    # Regola finale per terminare il sistema, stampando un separatore e fermando il
+    # motore (run() ritorna al chiamante, che può leggere i fatti finali).
     @Rule(Fact(azione="stampaAccessorio"), salience=0)
+    @misure.misura_regola
     def stampare_accessorio(self):
         print("\n============ !!! ESECUZIONE TERMINATA CON SUCCESSO !!! =============")
-        exit(0)
+        self.esito = ESITO_COMPLETATA
+        self.halt()
+
+# ==============================================================================
+# Classe PoolMotori
+# Insieme di motori ConsigliAttivita già costruiti: ogni sessione preleva un
+# motore libero e lo restituisce (azzerato) al termine. I motori possono essere
+# usati da thread diversi, uno per sessione.
+# ==============================================================================
+class PoolMotori:
+    def __init__(self, dimensione=4):
+        """
+        Crea il pool:
+          - dimensione: numero di motori costruiti subito (sessioni contemporanee)
+        """
+        self.dimensione = dimensione
+        # LIFO: viene riusato per primo il motore usato più di recente
+        self._liberi = queue.LifoQueue()
+        for _ in range(dimensione):
+            self._liberi.put(ConsigliAttivita())
+        self.sessioni_eseguite = 0
+        self._lock = threading.Lock()
+
+    # --------------------------------------------------------------------------
+    # Metodo preleva: context manager che fornisce un motore libero, attendendo
+    # al più "timeout" secondi (None: senza limite; TimeoutError se scade).
+    # --------------------------------------------------------------------------
+    @contextmanager
+    def preleva(self, timeout=None):
+        try:
+            motore = self._liberi.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"Nessun motore libero entro {timeout} secondi")
+        try:
+            yield motore
+        finally:
+            with self._lock:
+                self.sessioni_eseguite += 1
+            motore.azzera()
+            self._liberi.put(motore)
+
+    # --------------------------------------------------------------------------
+    # Metodo esegui: esegue una sessione su un motore del pool e ne restituisce
+    # il RisultatoSessione.
+    # --------------------------------------------------------------------------
+    def esegui(self, sessione=None, strumentazione=None, timeout=None):
+        with self.preleva(timeout) as motore:
+            return motore.esegui_sessione(sessione, strumentazione)
+
+    # --------------------------------------------------------------------------
+    # Metodo statistiche: motori totali, motori liberi e sessioni eseguite.
+    # --------------------------------------------------------------------------
+    def statistiche(self):
+        return {"motori": self.dimensione, "liberi": self._liberi.qsize(), "sessioni": self.sessioni_eseguite}
 
 # ==============================================================================
-# Funzione per avviare il sistema esperto.
+# Funzione per avviare il sistema esperto: esegue una sessione interattiva e ne
+# restituisce il RisultatoSessione. Con "profilo" stampa al termine il
+# riepilogo delle regole eseguite; con "traccia" le registra nel file JSONL.
 # ==============================================================================
-def avvia_sistema_esperto():
-    sistema = ConsigliAttivita()
-    sistema.reset()
-    sistema.run()
+def avvia_sistema_esperto(profilo=False, traccia=None):
+    strumentazione = misure.Strumentazione(traccia) if profilo or traccia else None
+    risultato = ConsigliAttivita().esegui_sessione(strumentazione=strumentazione)
+    if profilo:
+        strumentazione.stampa_riepilogo()
+    return risultato
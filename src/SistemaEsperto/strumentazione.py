@@ -0,0 +1,196 @@
+# ==============================================================================
+# strumentazione.py
+#
+# Questo modulo misura l'esecuzione delle regole del sistema esperto. Per ogni
+# regola eseguita da ConsigliAttivita registra:
+#
+# - nome della regola e salience;
+# - durata totale (wall time) dell'esecuzione;
+# - tempo di attesa dell'input dell'utente e delle chiamate ai servizi esterni
+#   (geocodifica e meteo), separati dal tempo di calcolo;
+# - tempo speso nelle dichiarazioni dei fatti (aggiornamento della rete RETE);
+# - numero di fatti nella memoria di lavoro al termine della regola.
+#
+# Il tempo di run() non speso nelle regole è attribuito all'agenda del motore.
+# Al termine della sessione è disponibile un riepilogo per regola e, se
+# richiesto, una traccia JSONL con una riga per ogni regola eseguita.
+# ==============================================================================
+
+import functools
+import json
+import sys
+import time
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
+
+# Tipi di attesa registrati separatamente dal calcolo
+TIPI_ATTESA = ("input", "servizi")
+
+# --------------------------------------------------------------------------
+# RegolaEseguita: misura di una singola esecuzione di regola (tempi in secondi).
+#   - sequenza: posizione dell'esecuzione nella sessione (da 1)
+#   - regola / salience: nome e priorità della regola
+#   - inizio: istante di inizio rispetto all'avvio della sessione
+#   - durata: tempo totale della regola
+#   - input / servizi: attesa dell'utente e dei servizi esterni
+#   - dichiarazioni: tempo speso in declare() (aggiornamento della rete RETE)
+#   - calcolo: durata al netto di attese e dichiarazioni
+#   - fatti: numero di fatti nella memoria di lavoro al termine
+#   - errore: nome dell'eccezione sollevata dalla regola, oppure None
+# --------------------------------------------------------------------------
+RegolaEseguita = namedtuple("RegolaEseguita", ["sequenza", "regola", "salience", "inizio", "durata", "input",
+                                               "servizi", "dichiarazioni", "calcolo", "fatti", "errore"])
+
+# ==============================================================================
+# Classe Strumentazione
+# Raccoglie le misure delle regole eseguite in una sessione del motore.
+# ==============================================================================
+class Strumentazione:
+    def __init__(self, percorso_traccia=None):
+        """
+        Crea una raccolta vuota:
+          - percorso_traccia: file JSONL a cui aggiungere le esecuzioni al
+            termine di ogni run() (None: nessuna traccia)
+        """
+        self.percorso_traccia = percorso_traccia
+        self.identificativo = uuid.uuid4().hex[:12]
+        self.esecuzioni = []
+        self.tempo_esecuzione = 0.0
+        self.attese_esterne = dict.fromkeys(TIPI_ATTESA, 0.0)
+        self._avvio = time.perf_counter()
+        self._corrente = None
+
+    # --------------------------------------------------------------------------
+    # Metodo attesa: context manager che attribuisce il tempo trascorso al tipo
+    # di attesa indicato ("input" o "servizi") della regola in corso.
+    # --------------------------------------------------------------------------
+    @contextmanager
+    def attesa(self, tipo):
+        inizio = time.perf_counter()
+        try:
+            yield
+        finally:
+            destinazione = self._corrente if self._corrente is not None else self.attese_esterne
+            destinazione[tipo] += time.perf_counter() - inizio
+
+    # --------------------------------------------------------------------------
+    # Metodo dichiarazione: context manager per il tempo speso in declare().
+    # --------------------------------------------------------------------------
+    @contextmanager
+    def dichiarazione(self):
+        inizio = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self._corrente is not None:
+                self._corrente["dichiarazioni"] += time.perf_counter() - inizio
+
+    # --------------------------------------------------------------------------
+    # Metodo esecuzione: context manager per un'intera chiamata a run(); al
+    # termine aggiunge le nuove esecuzioni alla traccia (se indicata).
+    # --------------------------------------------------------------------------
+    @contextmanager
+    def esecuzione(self):
+        gia_registrate = len(self.esecuzioni)
+        inizio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.tempo_esecuzione += time.perf_counter() - inizio
+            if self.percorso_traccia:
+                self.scrivi_traccia(self.percorso_traccia, self.esecuzioni[gia_registrate:])
+
+    # --------------------------------------------------------------------------
+    # Metodo esegui_regola: esegue la regola e ne registra la RegolaEseguita.
+    # --------------------------------------------------------------------------
+    def esegui_regola(self, nome, salience, motore, funzione, *args, **kwargs):
+        corrente = self._corrente = dict.fromkeys(TIPI_ATTESA + ("dichiarazioni",), 0.0)
+        errore = None
+        inizio = time.perf_counter()
+        try:
+            return funzione(motore, *args, **kwargs)
+        except BaseException as e:
+            errore = type(e).__name__
+            raise
+        finally:
+            durata = time.perf_counter() - inizio
+            self._corrente = None
+            calcolo = durata - sum(corrente.values())
+            self.esecuzioni.append(RegolaEseguita(len(self.esecuzioni) + 1, nome, salience, inizio - self._avvio,
+                                                  durata, corrente["input"], corrente["servizi"],
+                                                  corrente["dichiarazioni"], calcolo, len(motore.facts), errore))
+
+    # --------------------------------------------------------------------------
+    # Metodo riepilogo: totali della sessione e, per ogni regola, numero di
+    # esecuzioni e tempi complessivi in millisecondi.
+    # --------------------------------------------------------------------------
+    def riepilogo(self):
+        regole = {}
+        for esecuzione in self.esecuzioni:
+            voce = regole.setdefault(esecuzione.regola, {
+                "salience": esecuzione.salience, "esecuzioni": 0, "totale_ms": 0.0, "max_ms": 0.0,
+                "input_ms": 0.0, "servizi_ms": 0.0, "dichiarazioni_ms": 0.0, "calcolo_ms": 0.0})
+            voce["esecuzioni"] += 1
+            voce["totale_ms"] += esecuzione.durata * 1000
+            voce["max_ms"] = max(voce["max_ms"], esecuzione.durata * 1000)
+            for campo in ("input", "servizi", "dichiarazioni", "calcolo"):
+                voce[campo + "_ms"] += getattr(esecuzione, campo) * 1000
+        tempo_regole = sum(e.durata for e in self.esecuzioni)
+        return {
+            "sessione": self.identificativo,
+            "regole_eseguite": len(self.esecuzioni),
+            "fatti_finali": self.esecuzioni[-1].fatti if self.esecuzioni else 0,
+            "esecuzione_ms": self.tempo_esecuzione * 1000,
+            "input_ms": sum(e.input for e in self.esecuzioni) * 1000,
+            "servizi_ms": sum(e.servizi for e in self.esecuzioni) * 1000,
+            "dichiarazioni_ms": sum(e.dichiarazioni for e in self.esecuzioni) * 1000,
+            "calcolo_ms": sum(e.calcolo for e in self.esecuzioni) * 1000,
+            # Tempo di run() fuori dalle regole: aggiornamento e scelta dall'agenda
+            "agenda_ms": max(0.0, self.tempo_esecuzione - tempo_regole) * 1000,
+            "regole": regole,
+        }
+
+    # --------------------------------------------------------------------------
+    # Metodo stampa_riepilogo: stampa il riepilogo in forma di tabella.
+    # --------------------------------------------------------------------------
+    def stampa_riepilogo(self, file=None):
+        file = file if file is not None else sys.stdout
+        riepilogo = self.riepilogo()
+        print("\n====================== PROFILO DELLE REGOLE ========================", file=file)
+        print(f"{'regola':32s} {'sal':>3s} {'n':>3s} {'totale':>9s} {'input':>9s} {'servizi':>9s} "
+              f"{'declare':>9s} {'calcolo':>9s}", file=file)
+        for nome, voce in sorted(riepilogo["regole"].items(), key=lambda v: -v[1]["totale_ms"]):
+            print(f"{nome:32s} {voce['salience']:3d} {voce['esecuzioni']:3d} {voce['totale_ms']:9.2f} "
+                  f"{voce['input_ms']:9.2f} {voce['servizi_ms']:9.2f} {voce['dichiarazioni_ms']:9.2f} "
+                  f"{voce['calcolo_ms']:9.2f}", file=file)
+        print(f"Regole eseguite -> {riepilogo['regole_eseguite']}  fatti -> {riepilogo['fatti_finali']}  "
+              f"tempi (ms): run {riepilogo['esecuzione_ms']:.2f}, input {riepilogo['input_ms']:.2f}, "
+              f"servizi {riepilogo['servizi_ms']:.2f}, declare {riepilogo['dichiarazioni_ms']:.2f}, "
+              f"calcolo {riepilogo['calcolo_ms']:.2f}, agenda {riepilogo['agenda_ms']:.2f}", file=file)
+        print("====================================================================", file=file)
+
+    # --------------------------------------------------------------------------
+    # Metodo scrivi_traccia: aggiunge al file JSONL una riga per esecuzione
+    # (tutte, se non indicate), con l'identificativo della sessione.
+    # --------------------------------------------------------------------------
+    def scrivi_traccia(self, percorso, esecuzioni=None):
+        esecuzioni = self.esecuzioni if esecuzioni is None else esecuzioni
+        with open(percorso, "a", encoding="utf-8") as file:
+            file.write("".join(json.dumps(dict(esecuzione._asdict(), sessione=self.identificativo)) + "\n"
+                               for esecuzione in esecuzioni))
+
+# ==============================================================================
+# Funzione: misura_regola()
+# Decoratore per le regole del motore (da applicare sotto @Rule): se il motore
+# ha una Strumentazione, l'esecuzione della regola viene misurata.
+# ==============================================================================
+def misura_regola(funzione):
+    @functools.wraps(funzione)
+    def regola(motore, *args, **kwargs):
+        strumentazione = getattr(motore, "strumentazione", None)
+        if strumentazione is None:
+            return funzione(motore, *args, **kwargs)
+        salience = getattr(type(motore), funzione.__name__).salience
+        return strumentazione.esegui_regola(funzione.__name__, salience, motore, funzione, *args, **kwargs)
+    return regola
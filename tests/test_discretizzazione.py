@@ -0,0 +1,49 @@
+# ==============================================================================
+# test_discretizzazione.py
+#
+# Verifica che il Discretizzatore (versione vettoriale) dia gli stessi rami e
+# indici delle conversioni scalari di calcoloConsiglio (determina_ramo,
+# indice_temperatura_freddo/caldo, indice_vento, indice_pioggia), anche sui
+# valori delle soglie.
+# ==============================================================================
+
+import itertools
+
+import numpy
+
+from src.ClassiSupporto import calcoloConsiglio
+from src.ClassiSupporto.discretizzazione import METEO, RAMI, Discretizzatore
+
+# Valori di prova: griglie regolari più le soglie e i loro immediati dintorni
+TEMPERATURE = sorted(set(numpy.arange(-15, 50.5, 0.5).tolist() +
+                         [s + d for s in calcoloConsiglio.SOGLIE_TEMPERATURA_FREDDO +
+                          calcoloConsiglio.SOGLIE_TEMPERATURA_CALDO +
+                          [calcoloConsiglio.LIMITE_FREDDO, calcoloConsiglio.LIMITE_CALDO]
+                          for d in (-0.01, 0, 0.01)]))
+VENTI = sorted(set(numpy.arange(0, 40, 0.5).tolist() +
+                   [s + d for s in calcoloConsiglio.SOGLIE_VENTO for d in (-0.01, 0, 0.01)]))
+PIOGGE = sorted(set([0.0, 0.1, 1, 2.5, 2.51, 5, 7.6, 7.61, 20, 50, 50.1, 80])) + [numpy.nan]
+
+def test_indici_vento_e_pioggia_come_scalari():
+    discretizzatore = Discretizzatore()
+    assert discretizzatore.indici_vento(VENTI).tolist() == [calcoloConsiglio.indice_vento(v) for v in VENTI]
+    assert discretizzatore.indici_vento(numpy.array(VENTI) / 3.6, unita="m/s").tolist() == \
+        [calcoloConsiglio.indice_vento(v) for v in VENTI]
+    assert discretizzatore.indici_pioggia(PIOGGE).tolist() == [calcoloConsiglio.indice_pioggia(p) for p in PIOGGE]
+
+def test_rami_e_indici_temperatura_come_scalari():
+    combinazioni = list(itertools.product(TEMPERATURE, METEO, PIOGGE))
+    temperatura, meteo, pioggia = (numpy.array(colonna) for colonna in zip(*combinazioni))
+    evidenze = Discretizzatore().discretizza(temperatura, numpy.zeros(len(combinazioni)), pioggia, meteo)
+    for posizione, (t, m, p) in enumerate(combinazioni):
+        ramo = calcoloConsiglio.determina_ramo(t, m, calcoloConsiglio.indice_pioggia(p))
+        assert RAMI[evidenze.ramo[posizione]] == ramo, (t, m, p)
+        if ramo == "freddo":
+            atteso = calcoloConsiglio.indice_temperatura_freddo(t)
+        elif ramo == "caldo":
+            atteso = calcoloConsiglio.indice_temperatura_caldo(t)
+        else:
+            atteso = 0
+        assert evidenze.indice_temperatura[posizione] == atteso, (t, m, p)
+        assert evidenze.indice_pioggia[posizione] == calcoloConsiglio.indice_pioggia(p)
+        assert METEO[evidenze.meteo[posizione]] == m
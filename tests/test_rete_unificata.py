@@ -0,0 +1,45 @@
+# ==============================================================================
+# test_rete_unificata.py
+#
+# Verifiche della rete unificata (albero di giunzione):
+#
+# - con il Ramo osservato dà le stesse distribuzioni di "Consiglio" delle reti
+#   dei rami, predefinite e apprese, con evidenze anche parziali;
+# - nel ramo "normale" il rischio è nullo;
+# - evidenze impossibili e valori booleani sono rifiutati.
+# ==============================================================================
+
+import itertools
+
+import numpy
+import pytest
+
+from src.ClassiSupporto import calcoloConsiglio
+from src.ReteBayesiana.posteriori import STATI
+from src.ReteBayesiana.reteUnificata import RUOLI_EVIDENZE
+
+@pytest.mark.parametrize("parametri", ["predefiniti", "appresi"])
+@pytest.mark.parametrize("ramo", ["freddo", "caldo"])
+def test_rete_unificata_come_reti_dei_rami(parametri, ramo):
+    unificata = calcoloConsiglio.rete_unificata(parametri)
+    rete = calcoloConsiglio.rete_compilata(ramo) if parametri == "predefiniti" else calcoloConsiglio.rete_appresa(ramo)
+    for valori in itertools.product(STATI + [None], repeat=len(rete.Evidenze)):
+        evidenza = {nome: valore for nome, valore in zip(rete.Evidenze, valori) if valore is not None}
+        evidenza_unificata = {RUOLI_EVIDENZE[ramo][nome]: valore for nome, valore in evidenza.items()}
+        evidenza_unificata["Ramo"] = ramo
+        numpy.testing.assert_allclose(unificata.interroga("Consiglio", evidenza_unificata), rete.inferenza(evidenza),
+                                      rtol=0, atol=1e-12, err_msg=str(evidenza))
+
+def test_ramo_normale_senza_rischio():
+    unificata = calcoloConsiglio.rete_unificata()
+    for meteo in ["nuvoloso", "scoperto"]:
+        assert unificata.rischio_effettivo({"Ramo": "normale", "Meteo": meteo, "Indoor": "no"}) == 0.0
+
+def test_evidenze_impossibili_rifiutate():
+    with pytest.raises(ValueError):
+        calcoloConsiglio.rete_unificata().rischio_effettivo({"Ramo": "normale", "Meteo": "rovesci"})
+
+@pytest.mark.parametrize("valore", [True, False, numpy.bool_(True)])
+def test_valori_booleani_rifiutati(valore):
+    with pytest.raises(ValueError):
+        calcoloConsiglio.rete_unificata().interroga("Consiglio", {"Temperatura": valore})
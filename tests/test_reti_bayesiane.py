@@ -0,0 +1,105 @@
+# ==============================================================================
+# test_reti_bayesiane.py
+#
+# Verifiche di equivalenza delle reti bayesiane dei rami:
+#
+# - tensore delle posteriori compilato e inferenza di pgmpy (VariableElimination),
+#   per le reti predefinite e apprese, con evidenze anche parziali;
+# - inferenza vettoriale (inferenza_batch) e inferenza per singola evidenza;
+# - apprendimento a blocchi da più file (apprendimentoParallelo) e impara_dataset;
+# - aggiornamenti incrementali e apprendimento sull'intero dataset.
+# ==============================================================================
+
+import itertools
+
+import numpy
+import pandas
+import pytest
+from pgmpy.inference import VariableElimination
+
+from src.ClassiSupporto import calcoloConsiglio
+from src.ReteBayesiana import apprendimentoParallelo, retiBayesiane
+
+CLASSI = [retiBayesiane.BayesianaInsoddisfazione, retiBayesiane.BayesianaTempoLibero]
+RAMI = {retiBayesiane.BayesianaInsoddisfazione: "freddo", retiBayesiane.BayesianaTempoLibero: "caldo"}
+METODI = ["bayes", "maximumlikelihood"]
+
+# --------------------------------------------------------------------------
+# Funzione dataset: dataset CSV del ramo della rete, con le sole colonne usate.
+# --------------------------------------------------------------------------
+def dataset(classe):
+    righe = pandas.read_csv(calcoloConsiglio.PERCORSI_DATASET[RAMI[classe]])
+    return righe[list(classe().Evidenze) + ["Consiglio"]]
+
+# --------------------------------------------------------------------------
+# Funzione rete_appresa: rete della classe appresa dal suo dataset (senza cache).
+# --------------------------------------------------------------------------
+def rete_appresa(classe, metodo):
+    rete = classe()
+    rete.impara_dataset(dataset(classe), metodo, usa_cache=False)
+    return rete
+
+# --------------------------------------------------------------------------
+# Funzione evidenze_parziali: tutte le combinazioni di evidenze, con ciascuna
+# evidenza osservata (0-4) oppure assente.
+# --------------------------------------------------------------------------
+def evidenze_parziali(evidenze):
+    for valori in itertools.product(retiBayesiane.STATI + [None], repeat=len(evidenze)):
+        yield {nome: valore for nome, valore in zip(evidenze, valori) if valore is not None}
+
+@pytest.mark.parametrize("classe", CLASSI)
+@pytest.mark.parametrize("parametri", ["predefiniti"] + METODI)
+def test_posteriori_come_variable_elimination(classe, parametri):
+    rete = classe() if parametri == "predefiniti" else rete_appresa(classe, parametri)
+    inferenza = VariableElimination(rete.DAG["model"])
+    for evidenza in evidenze_parziali(rete.Evidenze):
+        fattore = inferenza.query(["Consiglio"], evidence=evidenza, show_progress=False)
+        attesa = numpy.zeros(len(retiBayesiane.STATI))
+        attesa[[int(stato) for stato in fattore.state_names["Consiglio"]]] = fattore.values
+        numpy.testing.assert_allclose(rete.inferenza(evidenza), attesa, rtol=0, atol=1e-12, err_msg=str(evidenza))
+
+@pytest.mark.parametrize("classe", CLASSI)
+def test_inferenza_batch_come_scalare(classe):
+    rete = rete_appresa(classe, "bayes")
+    generatore = numpy.random.default_rng(0)
+    righe = generatore.integers(0, len(retiBayesiane.STATI), size=(500, 3)).astype(float)
+    righe[generatore.random(righe.shape) < 0.2] = numpy.nan
+    distribuzioni, rischio = rete.inferenza_batch(righe)
+    for riga, distribuzione, percentuale in zip(righe, distribuzioni, rischio):
+        evidenza = {nome: None if numpy.isnan(valore) else int(valore) for nome, valore in zip(rete.Evidenze, riga)}
+        attesa = rete.inferenza(evidenza)
+        numpy.testing.assert_allclose(distribuzione, attesa, rtol=0, atol=1e-15)
+        assert percentuale == pytest.approx((attesa[3] + attesa[4]) * 100, abs=1e-12)
+
+@pytest.mark.parametrize("valore", [3.7, 5, -1])
+def test_inferenza_batch_e_scalare_rifiutano_gli_stessi_valori(valore):
+    rete = retiBayesiane.BayesianaInsoddisfazione()
+    with pytest.raises(ValueError):
+        rete.inferenza({rete.Evidenze[0]: valore})
+    with pytest.raises(ValueError):
+        rete.inferenza_batch([[valore, 0, 0]])
+
+@pytest.mark.parametrize("classe", CLASSI)
+@pytest.mark.parametrize("metodo", METODI)
+def test_apprendimento_a_blocchi_come_impara_dataset(classe, metodo, tmp_path):
+    righe = dataset(classe)
+    for numero, parte in enumerate(numpy.array_split(numpy.arange(len(righe)), 3)):
+        righe.iloc[parte].to_csv(tmp_path / f"parte_{numero}.csv", index=False)
+    rete = classe()
+    # Blocchi piccoli: più intervalli per file, distribuiti tra due processi
+    apprendimentoParallelo.impara_file(rete, str(tmp_path / "parte_*.csv"), metodo, processi=2,
+                                       dimensione_blocco=1024)
+    numpy.testing.assert_allclose(rete.posteriori, rete_appresa(classe, metodo).posteriori, rtol=0, atol=1e-12)
+
+@pytest.mark.parametrize("classe", CLASSI)
+@pytest.mark.parametrize("metodo", METODI)
+def test_aggiornamento_incrementale_come_apprendimento_completo(classe, metodo):
+    righe = dataset(classe)
+    meta = len(righe) // 2
+    rete = classe()
+    rete.impara_dataset(righe.iloc[:meta], metodo, usa_cache=False)
+    rete.aggiorna_osservazioni(righe.iloc[meta:])
+    numpy.testing.assert_allclose(rete.posteriori, rete_appresa(classe, metodo).posteriori, rtol=0, atol=1e-12)
+
+def test_aggiornamento_rete_predefinita_conserva_i_cpd_predefiniti():
+    assert retiBayesiane.verifica_aggiornamenti() == 0
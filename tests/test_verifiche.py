@@ -0,0 +1,22 @@
+# ==============================================================================
+# test_verifiche.py
+#
+# Esegue le verifiche disponibili da riga di comando (--verifica):
+#
+# - griglie del rischio e inferenza delle reti, per entrambi i metodi di stima;
+# - tabella decisionale precalcolata e calcola_consiglio.
+# ==============================================================================
+
+import pytest
+
+from src.ClassiSupporto import grigliaRischio, tabellaConsigli
+
+@pytest.mark.parametrize("metodo", ["bayes", "maximumlikelihood"])
+def test_griglie_come_inferenza_delle_reti(metodo):
+    assert grigliaRischio.verifica_griglie(grigliaRischio.calcola_griglie(metodo), metodo) == 0
+
+def test_tabella_come_calcola_consiglio(tmp_path):
+    tabella = tabellaConsigli.compila_tabella(str(tmp_path / "tabellaConsigli.npz"))
+    confrontate, differenze = tabellaConsigli.verifica_tabella(tabella)
+    assert confrontate > 0
+    assert differenze == []